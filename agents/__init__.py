@@ -2,6 +2,7 @@
 
 from .planner import create_planner_prompt
 from .specialist import create_specialist_agents
+from .pool import AgentPool
 from .prompts import get_agent_system_prompts, get_tool_error_handler
 
-__all__ = ['create_planner_prompt', 'create_specialist_agents', 'get_agent_system_prompts', 'get_tool_error_handler']
+__all__ = ['create_planner_prompt', 'create_specialist_agents', 'AgentPool', 'get_agent_system_prompts', 'get_tool_error_handler']
@@ -0,0 +1,30 @@
+"""
+Conversation memory bounded by a token budget
+"""
+
+from typing import Any, Dict
+
+from langchain.memory import ConversationBufferMemory
+
+from backends.tokens import estimate_tokens, truncate_to_tokens
+
+
+class BudgetedConversationMemory(ConversationBufferMemory):
+	"""ConversationBufferMemory that only exposes the most recent history that fits the budget"""
+	
+	max_tokens: int = 1000
+	
+	def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+		variables = super().load_memory_variables(inputs)
+		history = variables.get(self.memory_key)
+		
+		if isinstance(history, str):
+			variables[self.memory_key] = truncate_to_tokens(history, self.max_tokens, keep="tail")
+		elif isinstance(history, list):
+			# Message list: drop the oldest messages until the rest fits
+			messages = list(history)
+			while messages and sum(estimate_tokens(str(m.content)) for m in messages) > self.max_tokens:
+				messages.pop(0)
+			variables[self.memory_key] = messages
+		
+		return variables
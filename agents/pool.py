@@ -0,0 +1,167 @@
+"""
+Pools of agent executors so parallel tasks never share memory or scratchpad
+"""
+
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List
+
+from core.async_wait import AsyncLock, AsyncWaiters
+
+
+def _forget(executor: Any):
+	memory = getattr(executor, "memory", None)
+	if memory is not None:
+		memory.clear()
+
+
+class AgentPool:
+	"""Executors of one agent type, built on demand from a shared prompt/tool definition
+	
+	checkout() hands a task its own executor and clears that executor's memory
+	when it is returned, so two parallel tasks for the same agent never see
+	each other's history. conversation is a single long-lived executor whose
+	memory is kept, for queries routed straight to the agent; converse()
+	hands it out.
+	
+	lock, when given, is held while any of the pool's executors runs. Pools
+	whose tools drive the same resource (e.g. one Selenium driver) share it.
+	"""
+	
+	def __init__(self, name: str, factory: Callable[[], Any], max_size: int = 4, lock: AsyncLock = None):
+		self.name = name
+		self.factory = factory
+		self.max_size = max(1, max_size)
+		self.lock = lock
+		self._idle: List[Any] = []
+		self._size = 0
+		self._available = threading.Condition()
+		self._async_waiters = AsyncWaiters()
+		self._conversation = None
+		self._conversation_lock = threading.Lock()
+		self._stats = {"checkouts": 0, "created": 0, "waits": 0}
+	
+	def _try_acquire(self):
+		"""An idle executor, or a slot to build a new one (None), or False when the pool is exhausted"""
+		with self._available:
+			if self._idle:
+				self._stats["checkouts"] += 1
+				return self._idle.pop()
+			if self._size < self.max_size:
+				self._size += 1
+				self._stats["checkouts"] += 1
+				self._stats["created"] += 1
+				return None
+			return False
+	
+	def _build(self):
+		try:
+			return self.factory()
+		except BaseException:
+			with self._available:
+				self._size -= 1
+				self._available.notify()
+			self._async_waiters.notify_all()
+			raise
+	
+	def acquire(self):
+		"""Take an executor, growing the pool up to max_size and waiting beyond it"""
+		executor = self._try_acquire()
+		while executor is False:
+			with self._available:
+				self._stats["waits"] += 1
+				self._available.wait_for(lambda: self._idle or self._size < self.max_size)
+			executor = self._try_acquire()
+		return executor if executor is not None else self._build()
+	
+	async def aacquire(self):
+		"""Async version of acquire; awaits a released executor instead of blocking the event loop"""
+		executor = self._try_acquire()
+		if executor is False:
+			with self._available:
+				self._stats["waits"] += 1
+			executor = await self._async_waiters.wait_for(self._try_acquire)
+		return executor if executor is not None else self._build()
+	
+	def release(self, executor: Any):
+		"""Return an executor with its memory cleared"""
+		_forget(executor)
+		with self._available:
+			self._idle.append(executor)
+			self._available.notify()
+		self._async_waiters.notify_all()
+	
+	@contextmanager
+	def _exclusive(self) -> Iterator[None]:
+		if self.lock is None:
+			yield
+			return
+		with self.lock:
+			yield
+	
+	@asynccontextmanager
+	async def _aexclusive(self) -> AsyncIterator[None]:
+		if self.lock is None:
+			yield
+			return
+		async with self.lock:
+			yield
+	
+	@contextmanager
+	def checkout(self) -> Iterator[Any]:
+		with self._exclusive():
+			executor = self.acquire()
+			try:
+				yield executor
+			finally:
+				self.release(executor)
+	
+	@asynccontextmanager
+	async def acheckout(self) -> AsyncIterator[Any]:
+		async with self._aexclusive():
+			executor = await self.aacquire()
+			try:
+				yield executor
+			finally:
+				self.release(executor)
+	
+	@contextmanager
+	def converse(self) -> Iterator[Any]:
+		"""Hand out the conversation executor, holding the pool's lock while it runs"""
+		with self._exclusive():
+			yield self.conversation
+	
+	@asynccontextmanager
+	async def aconverse(self) -> AsyncIterator[Any]:
+		async with self._aexclusive():
+			yield self.conversation
+	
+	@property
+	def conversation(self) -> Any:
+		"""The executor that keeps its conversation memory between queries"""
+		with self._conversation_lock:
+			if self._conversation is None:
+				self._conversation = self.factory()
+			return self._conversation
+	
+	def forget_conversation(self):
+		"""Clear the conversation executor's memory, as if no query had been routed to the agent"""
+		with self._conversation_lock:
+			conversation = self._conversation
+		if conversation is not None:
+			_forget(conversation)
+	
+	def executors(self) -> List[Any]:
+		"""Every executor built so far, idle ones and the conversational one"""
+		with self._available:
+			executors = list(self._idle)
+		if self._conversation is not None:
+			executors.append(self._conversation)
+		return executors
+	
+	def stats(self) -> Dict[str, Any]:
+		with self._available:
+			stats = dict(self._stats)
+			stats["size"] = self._size
+			stats["idle"] = len(self._idle)
+		return stats
@@ -2,10 +2,9 @@
 Specialist agents for specific tasks
 """
 
-from typing import Dict, Any
+from typing import Callable, Dict, Any
 from langchain.agents import Tool, initialize_agent, AgentType
 from langchain_core.language_models.llms import LLM
-from langchain.memory import ConversationBufferMemory
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
 from langchain.agents import AgentExecutor
@@ -13,7 +12,11 @@ from langchain.agents import AgentExecutor
 from tools.file_operations import read_file, write_file, list_files
 from tools.web_browser import search_web
 from browser_tool import BrowserTool
+from backends.tokens import PromptBudget, truncate_to_tokens
 from core.thinking_log import AgentThinkingLog
+from core.async_wait import AsyncLock
+from .memory import BudgetedConversationMemory
+from .pool import AgentPool
 from .prompts import get_agent_system_prompts, get_tool_error_handler
 
 
@@ -30,12 +33,16 @@ class ToolErrorHandler(BaseCallbackHandler):
 		return self.last_error
 
 
-def create_agent_with_system_prompt(tools, llm, agent_type, memory, system_prompt, agent_name, thinking_log):
+def create_agent_with_system_prompt(tools, llm, agent_type, memory, system_prompt, agent_name, thinking_log, prompt_budget=None, max_iterations=5):
 	"""Create an agent with a system prompt and error handling"""
 	
 	# Create error handler
 	error_handler = get_tool_error_handler(agent_name)
 	
+	# Keep the system prompt inside its share of the context window
+	if prompt_budget is not None:
+		system_prompt = truncate_to_tokens(system_prompt, prompt_budget.system_tokens)
+	
 	# Initialize the agent with system message
 	agent = initialize_agent(
 		tools=tools,
@@ -44,7 +51,7 @@ def create_agent_with_system_prompt(tools, llm, agent_type, memory, system_promp
 		memory=memory,
 		verbose=True,
 		handle_parsing_errors=True,
-		max_iterations=5,
+		max_iterations=max_iterations,
 		early_stopping_method="generate"
 	)
 	
@@ -58,34 +65,87 @@ def create_agent_with_system_prompt(tools, llm, agent_type, memory, system_promp
 		except:
 			pass  # If we can't modify the prompt, continue anyway
 	
-	# Wrap the agent's step method to catch tool errors
+	# Wrap the agent's step methods to catch tool errors
 	original_step = agent._take_next_step
+	original_astep = agent._atake_next_step
+	
+	def handle_step_error(e: Exception):
+		error_msg = str(e)
+		if "not found" in error_msg.lower() or "no tool" in error_msg.lower():
+			handled_error = error_handler(error_msg)
+			thinking_log.log(handled_error, "error")
+			# Return a message about the missing tool
+			return [{
+				"action": "Final Answer",
+				"action_input": handled_error
+			}]
+		raise e
 	
 	def wrapped_step(*args, **kwargs):
 		try:
 			result = original_step(*args, **kwargs)
 			return result
 		except Exception as e:
-			error_msg = str(e)
-			if "not found" in error_msg.lower() or "no tool" in error_msg.lower():
-				handled_error = error_handler(error_msg)
-				thinking_log.log(handled_error, "error")
-				# Return a message about the missing tool
-				return [{
-					"action": "Final Answer",
-					"action_input": handled_error
-				}]
-			raise
+			return handle_step_error(e)
+	
+	async def wrapped_astep(*args, **kwargs):
+		try:
+			return await original_astep(*args, **kwargs)
+		except Exception as e:
+			return handle_step_error(e)
 	
 	agent._take_next_step = wrapped_step
+	agent._atake_next_step = wrapped_astep
 	
 	return agent
 
 
-def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_driver=None) -> Dict[str, Any]:
-	"""Create specialized agents with thinking visualization and self-awareness"""
+def create_specialist_agents(
+	llm: LLM,
+	thinking_log: AgentThinkingLog,
+	browser_driver=None,
+	prompt_budget: PromptBudget = None,
+	pool_size: int = 4,
+	max_iterations: int = 5,
+	on_side_effect: Callable[[str], None] = None,
+	browser_lock: AsyncLock = None
+) -> Dict[str, AgentPool]:
+	"""Create specialized agents with thinking visualization and self-awareness
+	
+	Each agent type is a pool of up to pool_size executors, so parallel tasks
+	for the same agent each run on their own executor. The browser pool holds
+	a single executor: all of them would drive the same Selenium session.
+	Orchestrators sharing the driver pass the same browser_lock, so only one
+	browser task or conversation drives it at a time.
+	on_side_effect receives the name of every tool that changes something
+	(a file, a web form) before it runs.
+	"""
 	agents = {}
 	system_prompts = get_agent_system_prompts()
+	prompt_budget = prompt_budget or PromptBudget()
+	
+	def side_effect(tool_name: str):
+		if on_side_effect is not None:
+			on_side_effect(tool_name)
+	
+	def new_memory():
+		return BudgetedConversationMemory(memory_key="chat_history", max_tokens=prompt_budget.memory_tokens)
+	
+	def define_agent(agent_name: str, tools, agent_type, max_size: int = pool_size, lock: AsyncLock = None):
+		# Tools and prompts are shared; each pooled executor gets its own memory and scratchpad
+		def build():
+			return create_agent_with_system_prompt(
+				tools=tools,
+				llm=llm,
+				agent_type=agent_type,
+				memory=new_memory(),
+				system_prompt=system_prompts[agent_name],
+				agent_name=agent_name,
+				thinking_log=thinking_log,
+				prompt_budget=prompt_budget,
+				max_iterations=max_iterations
+			)
+		agents[agent_name] = AgentPool(agent_name, build, max_size, lock)
 	
 	# Browser Agent with Selenium
 	if browser_driver:
@@ -104,12 +164,14 @@ def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_d
 			return result
 		
 		def log_fill_form(data: str) -> str:
+			side_effect("FillForm")
 			thinking_log.log(f"Filling form with: {data}", "action")
 			result = browser_tool.fill_form(data)
 			thinking_log.log("Form filled", "success")
 			return result
 		
 		def log_click(element: str) -> str:
+			side_effect("Click")
 			thinking_log.log(f"Clicking element: {element}", "action")
 			result = browser_tool.click_element(element)
 			thinking_log.log("Click successful", "success")
@@ -123,6 +185,7 @@ def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_d
 		]
 		
 		def log_screenshot(filename: str = "") -> str:
+			side_effect("Screenshot")
 			thinking_log.log("Taking screenshot", "action")
 			if filename:
 				result = browser_tool.take_screenshot(filename)
@@ -135,14 +198,10 @@ def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_d
 			Tool(name="Screenshot", func=log_screenshot, description="Take a screenshot. Input is optional filename (leave empty for auto-generated name).")
 		)
 		
-		agents["browser"] = create_agent_with_system_prompt(
-			tools=browser_tools,
-			llm=llm,
-			agent_type=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-			memory=ConversationBufferMemory(memory_key="chat_history"),
-			system_prompt=system_prompts["browser"],
-			agent_name="browser",
-			thinking_log=thinking_log
+		# One driver, one page: parallel browser tasks wait for each other instead of sharing it
+		define_agent(
+			"browser", browser_tools, AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
+			max_size=1, lock=browser_lock or AsyncLock()
 		)
 	
 	# File Agent
@@ -157,6 +216,7 @@ def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_d
 		if len(parts) != 2:
 			return "Error: Use format 'filepath|content'"
 		filepath, content = parts
+		side_effect("WriteFile")
 		thinking_log.log(f"Writing to file: {filepath}", "action")
 		result = write_file(data)
 		thinking_log.log("Write complete", "success")
@@ -175,15 +235,7 @@ def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_d
 		Tool(name="ListFiles", func=log_list_files, description="List files in a directory. Input should be the directory path.")
 	]
 	
-	agents["file"] = create_agent_with_system_prompt(
-		tools=file_tools,
-		llm=llm,
-		agent_type=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-		memory=ConversationBufferMemory(memory_key="chat_history"),
-		system_prompt=system_prompts["file"],
-		agent_name="file",
-		thinking_log=thinking_log
-	)
+	define_agent("file", file_tools, AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION)
 	
 	# Search Agent
 	def log_search(query: str) -> str:
@@ -196,15 +248,7 @@ def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_d
 		Tool(name="WebSearch", func=log_search, description="Search the web for information. Input should be your search query.")
 	]
 	
-	agents["search"] = create_agent_with_system_prompt(
-		tools=search_tools,
-		llm=llm,
-		agent_type=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-		memory=ConversationBufferMemory(memory_key="chat_history"),
-		system_prompt=system_prompts["search"],
-		agent_name="search",
-		thinking_log=thinking_log
-	)
+	define_agent("search", search_tools, AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION)
 	
 	# Coder Agent
 	def log_write_code(request: str) -> str:
@@ -217,25 +261,9 @@ def create_specialist_agents(llm: LLM, thinking_log: AgentThinkingLog, browser_d
 		Tool(name="WriteCode", func=log_write_code, description="Generate code based on requirements. Input should describe what code you need.")
 	]
 	
-	agents["coder"] = create_agent_with_system_prompt(
-		tools=coder_tools,
-		llm=llm,
-		agent_type=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
-		memory=ConversationBufferMemory(memory_key="chat_history"),
-		system_prompt=system_prompts["coder"],
-		agent_name="coder",
-		thinking_log=thinking_log
-	)
+	define_agent("coder", coder_tools, AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION)
 	
 	# Casual Agent (conversation and summary) - No tools
-	agents["casual"] = create_agent_with_system_prompt(
-		tools=[],  # No tools for casual agent
-		llm=llm,
-		agent_type=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-		memory=ConversationBufferMemory(memory_key="chat_history"),
-		system_prompt=system_prompts["casual"],
-		agent_name="casual",
-		thinking_log=thinking_log
-	)
+	define_agent("casual", [], AgentType.CONVERSATIONAL_REACT_DESCRIPTION)
 	
 	return agents
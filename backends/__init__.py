@@ -0,0 +1,35 @@
+"""HTTP backends and client utilities for the LLM providers"""
+
+from .budget import BudgetExceeded, RunBudget, current_budget
+from .cache import CompletionCache
+from .chat import PrefixReuseTracker, split_prompt
+from .http_client import HttpSettings, get_session, get_async_client, aclose_async_client, close_sessions
+from .providers import ProviderSpec, PROVIDERS, LLMSettings, get_provider
+from .provider_pool import Endpoint, ProviderPool
+from .replay import RecordingLLM, ReplayLLM, ReplayMissError, Transcript
+from .resilience import (
+	LLMCallError, CircuitOpenError, CircuitBreaker, RetryPolicy, LatencyTracker, ResilientCaller
+)
+from .singleflight import SingleFlight
+from .stop import StopDetector, enforce_stop
+from .tokens import (
+	PromptBudget, TokenUsage, MODEL_CONTEXT_SIZES, estimate_tokens, context_window, truncate_to_tokens
+)
+from .warmup import ModelWarmer
+from .streaming import parse_ollama_line, parse_sse_line
+
+__all__ = [
+	'BudgetExceeded', 'RunBudget', 'current_budget',
+	'CompletionCache',
+	'PrefixReuseTracker', 'split_prompt',
+	'HttpSettings', 'get_session', 'get_async_client', 'aclose_async_client', 'close_sessions',
+	'ProviderSpec', 'PROVIDERS', 'LLMSettings', 'get_provider',
+	'Endpoint', 'ProviderPool',
+	'RecordingLLM', 'ReplayLLM', 'ReplayMissError', 'Transcript',
+	'LLMCallError', 'CircuitOpenError', 'CircuitBreaker', 'RetryPolicy', 'LatencyTracker', 'ResilientCaller',
+	'SingleFlight',
+	'StopDetector', 'enforce_stop',
+	'PromptBudget', 'TokenUsage', 'MODEL_CONTEXT_SIZES', 'estimate_tokens', 'context_window', 'truncate_to_tokens',
+	'ModelWarmer',
+	'parse_ollama_line', 'parse_sse_line'
+]
@@ -0,0 +1,181 @@
+"""
+Per-run limits on wall time, LLM calls and tokens
+
+A RunBudget is activated for the duration of one run. The LLM client reads
+it from a context variable, so every backend call made for the run (by agent
+executors, scheduler threads or coroutines) is checked and charged without
+threading it through LangChain. Once any limit is reached, new calls raise
+BudgetExceeded and streaming calls stop at the next token.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+_current_budget = contextvars.ContextVar("run_budget", default=None)
+_current_task = contextvars.ContextVar("run_budget_task", default=None)
+
+
+class BudgetExceeded(RuntimeError):
+	"""Raised when a run has used up its deadline, LLM calls or tokens"""
+
+
+def current_budget() -> Optional["RunBudget"]:
+	"""The budget of the run this code executes for, if any"""
+	return _current_budget.get()
+
+
+class RunBudget:
+	"""Deadline, LLM-call and token limits of one run, with per-task consumption"""
+	
+	def __init__(
+		self,
+		deadline_seconds: Optional[float] = None,
+		max_llm_calls: Optional[int] = None,
+		max_tokens: Optional[int] = None
+	):
+		self.deadline_seconds = deadline_seconds
+		self.max_llm_calls = max_llm_calls
+		self.max_tokens = max_tokens
+		self.started = time.monotonic()
+		self.llm_calls = 0
+		self.tokens = 0
+		self.exhausted_reason: Optional[str] = None
+		self._tasks: Dict[str, Dict[str, Any]] = {}
+		self._lock = threading.Lock()
+	
+	@classmethod
+	def from_config(cls, config) -> Optional["RunBudget"]:
+		"""Build the limits from the [RUN_BUDGET] section of config.ini (None when all are 0)"""
+		deadline = config.getfloat('RUN_BUDGET', 'deadline_seconds', fallback=0)
+		max_llm_calls = config.getint('RUN_BUDGET', 'max_llm_calls', fallback=0)
+		max_tokens = config.getint('RUN_BUDGET', 'max_tokens', fallback=0)
+		if not (deadline > 0 or max_llm_calls > 0 or max_tokens > 0):
+			return None
+		return cls(
+			deadline_seconds=deadline if deadline > 0 else None,
+			max_llm_calls=max_llm_calls if max_llm_calls > 0 else None,
+			max_tokens=max_tokens if max_tokens > 0 else None
+		)
+	
+	def renew(self) -> "RunBudget":
+		"""A fresh budget with the same limits, for the next run"""
+		return RunBudget(self.deadline_seconds, self.max_llm_calls, self.max_tokens)
+	
+	def elapsed(self) -> float:
+		return time.monotonic() - self.started
+	
+	def remaining_seconds(self) -> Optional[float]:
+		if self.deadline_seconds is None:
+			return None
+		return max(0.0, self.deadline_seconds - self.elapsed())
+	
+	def timeout(self, default: float) -> float:
+		"""default, shortened to what is left of the deadline"""
+		remaining = self.remaining_seconds()
+		return default if remaining is None else min(default, remaining)
+	
+	def _update_exhausted(self):
+		# Caller holds the lock
+		if self.exhausted_reason is not None:
+			return
+		if self.deadline_seconds is not None and self.elapsed() >= self.deadline_seconds:
+			self.exhausted_reason = f"deadline of {self.deadline_seconds:g}s passed"
+		elif self.max_tokens is not None and self.tokens >= self.max_tokens:
+			self.exhausted_reason = f"{self.tokens} of {self.max_tokens} tokens used"
+	
+	def _calls_reason(self) -> Optional[str]:
+		# Caller holds the lock
+		if self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls:
+			return f"all {self.max_llm_calls} LLM calls used"
+		return None
+	
+	@property
+	def exhausted(self) -> Optional[str]:
+		"""Why no further LLM call can be made, or None while one can"""
+		with self._lock:
+			self._update_exhausted()
+			return self.exhausted_reason or self._calls_reason()
+	
+	def check(self):
+		"""
+		Raise BudgetExceeded once the deadline or token limit is reached.
+		
+		Calls already in flight check this between tokens; reaching the call
+		limit only stops new calls, since the running ones were counted.
+		"""
+		with self._lock:
+			self._update_exhausted()
+			reason = self.exhausted_reason
+		if reason is not None:
+			raise BudgetExceeded(f"Run budget exhausted: {reason}")
+	
+	def _task_entry(self) -> Optional[Dict[str, Any]]:
+		# Caller holds the lock
+		task_id = _current_task.get()
+		if task_id is None:
+			return None
+		return self._tasks.setdefault(task_id, {"llm_calls": 0, "tokens": 0, "seconds": 0.0})
+	
+	def begin_call(self):
+		"""Count one backend call, raising BudgetExceeded instead when no budget is left"""
+		with self._lock:
+			self._update_exhausted()
+			reason = self.exhausted_reason or self._calls_reason()
+			if reason is not None:
+				raise BudgetExceeded(f"Run budget exhausted: {reason}")
+			self.llm_calls += 1
+			entry = self._task_entry()
+			if entry is not None:
+				entry["llm_calls"] += 1
+	
+	def charge_tokens(self, tokens: int):
+		"""Count prompt + completion tokens of a finished call"""
+		with self._lock:
+			self.tokens += tokens
+			entry = self._task_entry()
+			if entry is not None:
+				entry["tokens"] += tokens
+	
+	@contextmanager
+	def activate(self) -> Iterator["RunBudget"]:
+		"""Make this the budget of every LLM call made in the current context"""
+		token = _current_budget.set(self)
+		try:
+			yield self
+		finally:
+			_current_budget.reset(token)
+	
+	@contextmanager
+	def track(self, task_id: str) -> Iterator[Dict[str, Any]]:
+		"""Attribute the calls made in the current context to a task; yields its usage"""
+		with self._lock:
+			entry = self._tasks.setdefault(task_id, {"llm_calls": 0, "tokens": 0, "seconds": 0.0})
+		token = _current_task.set(task_id)
+		started = time.monotonic()
+		try:
+			yield entry
+		finally:
+			_current_task.reset(token)
+			with self._lock:
+				entry["seconds"] += time.monotonic() - started
+	
+	def report(self) -> Dict[str, Any]:
+		"""Totals, limits and per-task consumption"""
+		with self._lock:
+			self._update_exhausted()
+			return {
+				"elapsed_seconds": self.elapsed(),
+				"llm_calls": self.llm_calls,
+				"tokens": self.tokens,
+				"limits": {
+					"deadline_seconds": self.deadline_seconds,
+					"max_llm_calls": self.max_llm_calls,
+					"max_tokens": self.max_tokens
+				},
+				"exhausted": self.exhausted_reason or self._calls_reason(),
+				"tasks": {task_id: dict(usage) for task_id, usage in self._tasks.items()}
+			}
@@ -0,0 +1,169 @@
+"""
+Completion cache for LLM calls
+
+Two tiers: an in-memory LRU for the hot set and an optional SQLite file that
+survives restarts. Entries are keyed by a hash of everything that influences
+the completion (provider, model, prompt, temperature, stop, max_tokens).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class CompletionCache:
+	"""Two-tier (memory LRU + optional SQLite) cache of LLM completions"""
+	
+	def __init__(
+		self,
+		max_entries: int = 1024,
+		ttl_seconds: Optional[float] = None,
+		disk_path: Optional[str] = None,
+		max_disk_entries: int = 100000,
+		cache_nondeterministic: bool = False
+	):
+		self.max_entries = max_entries
+		self.ttl_seconds = ttl_seconds
+		self.disk_path = disk_path
+		self.max_disk_entries = max_disk_entries
+		self.cache_nondeterministic = cache_nondeterministic
+		
+		self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+		self._lock = threading.Lock()
+		self._db = None
+		self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+		
+		if disk_path:
+			self._db = sqlite3.connect(disk_path, check_same_thread=False)
+			self._db.execute(
+				"CREATE TABLE IF NOT EXISTS completions ("
+				"key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+			)
+			self._db.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions(last_access)")
+			self._db.commit()
+	
+	@classmethod
+	def from_config(cls, config) -> Optional["CompletionCache"]:
+		"""Build the cache from the [CACHE] section of config.ini (None when disabled)"""
+		if not config.getboolean('CACHE', 'enabled', fallback=True):
+			return None
+		ttl = config.getfloat('CACHE', 'ttl_seconds', fallback=0)
+		return cls(
+			max_entries=config.getint('CACHE', 'max_entries', fallback=1024),
+			ttl_seconds=ttl if ttl > 0 else None,
+			disk_path=config.get('CACHE', 'disk_path', fallback='') or None,
+			max_disk_entries=config.getint('CACHE', 'max_disk_entries', fallback=100000),
+			cache_nondeterministic=config.getboolean('CACHE', 'cache_nondeterministic', fallback=False)
+		)
+	
+	@staticmethod
+	def make_key(
+		provider: str,
+		model: str,
+		prompt: str,
+		temperature: float,
+		stop: Optional[List[str]],
+		max_tokens: int,
+		schema: Optional[dict] = None
+	) -> str:
+		"""Hash every parameter that influences the completion into a cache key"""
+		parameters = [provider, model, prompt, temperature, list(stop or []), max_tokens]
+		if schema is not None:
+			# Appended only when set so keys of unconstrained calls stay stable
+			parameters.append(schema)
+		material = json.dumps(parameters, ensure_ascii=False, sort_keys=True)
+		return hashlib.sha256(material.encode('utf-8')).hexdigest()
+	
+	def is_cacheable(self, temperature: float) -> bool:
+		"""Deterministic calls are always cacheable; sampled ones need the opt-in"""
+		return temperature == 0 or self.cache_nondeterministic
+	
+	def _expired(self, created: float, now: float) -> bool:
+		return self.ttl_seconds is not None and now - created > self.ttl_seconds
+	
+	def get(self, key: str) -> Optional[str]:
+		"""Return the cached completion for key, or None on a miss"""
+		now = time.time()
+		with self._lock:
+			entry = self._memory.get(key)
+			if entry is not None:
+				value, created = entry
+				if not self._expired(created, now):
+					self._memory.move_to_end(key)
+					self._stats["hits"] += 1
+					self._stats["memory_hits"] += 1
+					return value
+				del self._memory[key]
+			
+			if self._db is not None:
+				row = self._db.execute("SELECT value, created FROM completions WHERE key = ?", (key,)).fetchone()
+				if row is not None:
+					value, created = row
+					if not self._expired(created, now):
+						self._db.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+						self._db.commit()
+						self._remember(key, value, created)
+						self._stats["hits"] += 1
+						self._stats["disk_hits"] += 1
+						return value
+					self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+					self._db.commit()
+			
+			self._stats["misses"] += 1
+			return None
+	
+	def put(self, key: str, value: str):
+		"""Store a completion in both tiers"""
+		now = time.time()
+		with self._lock:
+			self._remember(key, value, now)
+			if self._db is not None:
+				self._db.execute(
+					"INSERT OR REPLACE INTO completions (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+					(key, value, now, now)
+				)
+				self._evict_disk(now)
+				self._db.commit()
+	
+	def _remember(self, key: str, value: str, created: float):
+		self._memory[key] = (value, created)
+		self._memory.move_to_end(key)
+		while len(self._memory) > self.max_entries:
+			self._memory.popitem(last=False)
+			self._stats["evictions"] += 1
+	
+	def _evict_disk(self, now: float):
+		if self.ttl_seconds is not None:
+			self._db.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl_seconds,))
+		(count,) = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()
+		overflow = count - self.max_disk_entries
+		if overflow > 0:
+			self._db.execute(
+				"DELETE FROM completions WHERE key IN "
+				"(SELECT key FROM completions ORDER BY last_access ASC LIMIT ?)",
+				(overflow,)
+			)
+			self._stats["evictions"] += overflow
+	
+	def clear(self):
+		"""Drop every cached completion from both tiers"""
+		with self._lock:
+			self._memory.clear()
+			if self._db is not None:
+				self._db.execute("DELETE FROM completions")
+				self._db.commit()
+	
+	def stats(self) -> Dict[str, Any]:
+		"""Hit/miss counters and current sizes"""
+		with self._lock:
+			stats = dict(self._stats)
+			stats["memory_entries"] = len(self._memory)
+			if self._db is not None:
+				stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+		lookups = stats["hits"] + stats["misses"]
+		stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+		return stats
@@ -0,0 +1,103 @@
+"""
+Chat message construction and prefix (KV cache) reuse tracking
+
+Model servers keep the KV cache of the previous request and only prefill the
+tokens after the longest common prefix. To benefit, every request built from
+the same template must start with byte-identical text. split_prompt() cuts a
+flat LangChain prompt at a fixed marker into a static system message and the
+dynamic remainder, so the system message never changes between ReAct steps
+and plan tasks.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+# Where the static part of each prompt template ends, in order of preference:
+# stringified chat prompts (structured chat agents), the conversational
+# agent's history section and the planner's task line.
+PREFIX_MARKERS = (
+	"\nHuman: ",
+	"\nPrevious conversation history:",
+	"\nTask: ",
+)
+
+
+def split_prompt(prompt: str) -> List[Dict[str, str]]:
+	"""Turn a flat prompt into [system, user] messages with a stable system prefix"""
+	for marker in PREFIX_MARKERS:
+		index = prompt.find(marker)
+		if index > 0:
+			system = prompt[:index]
+			if system.startswith("System: "):
+				system = system[len("System: "):]
+			user = prompt[index + 1:]
+			if user.startswith("Human: "):
+				user = user[len("Human: "):]
+			return [
+				{"role": "system", "content": system},
+				{"role": "user", "content": user}
+			]
+	return [{"role": "user", "content": prompt}]
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+	limit = min(len(a), len(b))
+	index = 0
+	while index < limit and a[index] == b[index]:
+		index += 1
+	return index
+
+
+class PrefixReuseTracker:
+	"""
+	Measures how much of each request repeats the previous request to the same
+	endpoint, and records the prefill statistics the server reports back.
+	"""
+	
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._last: Dict[str, str] = {}
+		self._stats = {
+			"requests": 0,
+			"prefix_hits": 0,
+			"prompt_chars": 0,
+			"reused_chars": 0,
+			"prefill_samples": 0,
+			"prefill_ms": 0.0,
+			"prefill_tokens": 0,
+			"cached_tokens": 0
+		}
+	
+	def observe(self, address: str, messages: List[Dict[str, str]]):
+		"""Record a request about to be sent to address"""
+		rendered = "\x00".join(f"{m['role']}:{m['content']}" for m in messages)
+		with self._lock:
+			previous = self._last.get(address, "")
+			self._last[address] = rendered
+			shared = _common_prefix_length(previous, rendered)
+			
+			self._stats["requests"] += 1
+			self._stats["prompt_chars"] += len(rendered)
+			self._stats["reused_chars"] += shared
+			# A hit means at least the whole system message can come from the cache
+			if messages[0]["role"] == "system" and shared >= len(messages[0]["content"]):
+				self._stats["prefix_hits"] += 1
+	
+	def record_prefill(self, prefill: Optional[Dict[str, Any]]):
+		"""Record the server-reported prefill statistics of a finished request"""
+		if not prefill:
+			return
+		with self._lock:
+			self._stats["prefill_samples"] += 1
+			self._stats["prefill_ms"] += prefill.get("prompt_eval_ms") or 0.0
+			self._stats["prefill_tokens"] += prefill.get("prompt_eval_tokens") or 0
+			self._stats["cached_tokens"] += prefill.get("cached_tokens") or 0
+	
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			stats = dict(self._stats)
+		stats["hit_rate"] = stats["prefix_hits"] / stats["requests"] if stats["requests"] else 0.0
+		stats["reused_ratio"] = stats["reused_chars"] / stats["prompt_chars"] if stats["prompt_chars"] else 0.0
+		samples = stats["prefill_samples"]
+		stats["avg_prefill_ms"] = stats["prefill_ms"] / samples if samples else None
+		return stats
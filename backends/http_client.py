@@ -0,0 +1,126 @@
+"""
+Shared, connection-pooled HTTP sessions for the LLM providers
+"""
+
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+	"""Connection pool and timeout settings for provider HTTP clients"""
+	pool_connections: int = 4
+	pool_size: int = 16
+	connect_timeout: float = 5.0
+	read_timeout: float = 300.0
+	keep_alive: bool = True
+	async_pool_size: int = 256
+	
+	@property
+	def timeout(self) -> Tuple[float, float]:
+		"""(connect, read) timeout tuple as expected by requests"""
+		return (self.connect_timeout, self.read_timeout)
+	
+	@classmethod
+	def from_config(cls, config) -> "HttpSettings":
+		"""Build settings from the [HTTP] section of config.ini"""
+		return cls(
+			pool_connections=config.getint('HTTP', 'pool_connections', fallback=cls.pool_connections),
+			pool_size=config.getint('HTTP', 'pool_size', fallback=cls.pool_size),
+			connect_timeout=config.getfloat('HTTP', 'connect_timeout', fallback=cls.connect_timeout),
+			read_timeout=config.getfloat('HTTP', 'read_timeout', fallback=cls.read_timeout),
+			keep_alive=config.getboolean('HTTP', 'keep_alive', fallback=cls.keep_alive),
+			async_pool_size=config.getint('HTTP', 'async_pool_size', fallback=cls.async_pool_size)
+		)
+
+
+_sessions: Dict[Tuple[str, str, HttpSettings], object] = {}
+_sessions_lock = threading.Lock()
+
+# One async client per event loop; httpx connections cannot cross loops
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _create_session(settings: HttpSettings):
+	import requests
+	from requests.adapters import HTTPAdapter
+	
+	session = requests.Session()
+	adapter = HTTPAdapter(
+		pool_connections=settings.pool_connections,
+		pool_maxsize=settings.pool_size,
+		pool_block=False
+	)
+	session.mount("http://", adapter)
+	session.mount("https://", adapter)
+	
+	if settings.keep_alive:
+		session.headers["Connection"] = "keep-alive"
+	else:
+		session.headers["Connection"] = "close"
+	
+	return session
+
+
+def get_session(provider: str, address: str, settings: HttpSettings = HttpSettings()):
+	"""
+	Get the shared requests.Session for a provider/address pair.
+	
+	Sessions are created once and reused by every caller, so connections to the
+	model server are kept alive across ReAct iterations and agents.
+	"""
+	key = (provider, address.rstrip('/'), settings)
+	session = _sessions.get(key)
+	if session is not None:
+		return session
+	
+	with _sessions_lock:
+		session = _sessions.get(key)
+		if session is None:
+			session = _create_session(settings)
+			_sessions[key] = session
+		return session
+
+
+def _create_async_client(settings: HttpSettings):
+	import httpx
+	
+	limits = httpx.Limits(
+		max_connections=settings.async_pool_size,
+		max_keepalive_connections=settings.async_pool_size if settings.keep_alive else 0
+	)
+	timeout = httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout)
+	return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def get_async_client(settings: HttpSettings = HttpSettings()):
+	"""
+	Get the httpx.AsyncClient shared by every provider on the running event loop.
+	
+	All async LLM calls made from one loop draw from the same connection pool,
+	sized by ``async_pool_size``.
+	"""
+	loop = asyncio.get_running_loop()
+	client = _async_clients.get(loop)
+	if client is None or client.is_closed:
+		client = _create_async_client(settings)
+		_async_clients[loop] = client
+	return client
+
+
+async def aclose_async_client():
+	"""Close the async client bound to the running event loop"""
+	client = _async_clients.pop(asyncio.get_running_loop(), None)
+	if client is not None:
+		await client.aclose()
+
+
+def close_sessions():
+	"""Close every pooled session (used on shutdown)"""
+	with _sessions_lock:
+		for session in _sessions.values():
+			session.close()
+		_sessions.clear()
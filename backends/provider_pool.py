@@ -0,0 +1,188 @@
+"""
+Load balancing across several model servers of the same provider
+
+Each request goes to the available endpoint with the fewest outstanding
+requests. Every endpoint has a circuit breaker: endpoints that fail
+repeatedly (requests or background health checks alike) are ejected and a
+probe request is let through again once their cooldown has passed.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .budget import BudgetExceeded, current_budget
+from .http_client import HttpSettings, get_session
+from .providers import ProviderSpec
+from .resilience import CircuitBreaker, CircuitOpenError, is_endpoint_failure
+
+
+def _cut_short_by_budget(error: BaseException) -> bool:
+	"""Whether a call failed because its run's budget ran out rather than because of the endpoint"""
+	if isinstance(error, BudgetExceeded):
+		return True
+	# e.g. a read timeout that was shortened to what was left of the deadline
+	budget = current_budget()
+	remaining = budget.remaining_seconds() if budget is not None else None
+	return remaining is not None and remaining <= 0
+
+
+class Endpoint:
+	"""One model server and its load/health bookkeeping"""
+	def __init__(self, address: str, breaker: CircuitBreaker):
+		self.address = address
+		self.breaker = breaker
+		self.outstanding = 0
+		self.requests = 0
+		self.failures = 0
+
+
+class ProviderPool:
+	"""Least-outstanding-requests balancer with passive and active health checks"""
+	
+	def __init__(
+		self,
+		provider: ProviderSpec,
+		addresses: Sequence[str],
+		http_settings: HttpSettings = HttpSettings(),
+		health_check_interval: float = 10.0,
+		cooldown: float = 30.0,
+		failure_threshold: int = 3,
+		health_check_timeout: float = 10.0
+	):
+		if not addresses:
+			raise ValueError("ProviderPool needs at least one endpoint")
+		self.provider = provider
+		self.http_settings = http_settings
+		self.health_check_interval = health_check_interval
+		self.cooldown = cooldown
+		self.failure_threshold = failure_threshold
+		self.health_check_timeout = health_check_timeout
+		self.endpoints: List[Endpoint] = [
+			Endpoint(address, CircuitBreaker(failure_threshold, cooldown)) for address in addresses
+		]
+		
+		self._lock = threading.Lock()
+		self._stop = threading.Event()
+		self._health_thread = None
+	
+	def acquire(self, exclude: Optional[Sequence[Endpoint]] = None) -> Endpoint:
+		"""
+		Pick the available endpoint with the fewest outstanding requests.
+		
+		Endpoints in ``exclude`` (e.g. ones a retry already failed on) are only
+		used when nothing else is available. Raises CircuitOpenError when every
+		endpoint's breaker is open.
+		"""
+		exclude = exclude or ()
+		with self._lock:
+			available = [e for e in self.endpoints if e.breaker.available()]
+			candidates = [e for e in available if e not in exclude] or available
+			if not candidates:
+				raise CircuitOpenError(f"All {self.provider.display_name} endpoints are unavailable (circuit open)")
+			endpoint = min(candidates, key=lambda e: e.outstanding)
+			endpoint.breaker.allow()
+			endpoint.outstanding += 1
+			endpoint.requests += 1
+			return endpoint
+	
+	def release(self, endpoint: Endpoint, success: Optional[bool]):
+		"""Return an endpoint after a request; success=None records no outcome"""
+		with self._lock:
+			endpoint.outstanding -= 1
+			if success is None:
+				endpoint.breaker.release_probe()
+			elif success:
+				endpoint.breaker.record_success()
+			else:
+				endpoint.failures += 1
+				endpoint.breaker.record_failure()
+	
+	@contextmanager
+	def endpoint(self, exclude: Optional[Sequence[Endpoint]] = None) -> Iterator[Endpoint]:
+		"""Context manager that acquires an endpoint and releases it with the outcome"""
+		endpoint = self.acquire(exclude)
+		try:
+			yield endpoint
+		except Exception as e:
+			# Errors that say nothing about the endpoint's health release it without an outcome
+			healthy = not is_endpoint_failure(e) or _cut_short_by_budget(e)
+			self.release(endpoint, success=None if healthy else False)
+			raise
+		except BaseException:
+			# Closed or cancelled by the caller; not the endpoint's fault
+			self.release(endpoint, success=None)
+			raise
+		else:
+			self.release(endpoint, success=True)
+	
+	def check_health(self):
+		"""
+		Probe every endpoint once. A failed probe counts towards the breaker's
+		failure threshold like a failed request; a passing one closes it.
+		"""
+		for endpoint in self.endpoints:
+			if endpoint.breaker.state == CircuitBreaker.OPEN:
+				# Still cooling down; it is probed again once the cooldown expires
+				continue
+			session = get_session(self.provider.name, endpoint.address, self.http_settings)
+			try:
+				response = session.get(
+					f"{endpoint.address}{self.provider.health_path}",
+					timeout=(self.http_settings.connect_timeout, self.health_check_timeout)
+				)
+				response.raise_for_status()
+			except Exception:
+				with self._lock:
+					endpoint.failures += 1
+					last_usable = not any(
+						other.breaker.available() for other in self.endpoints if other is not endpoint
+					)
+				# Never let probes alone eject the last usable endpoint; failing requests still can
+				if not last_usable:
+					endpoint.breaker.record_failure()
+			else:
+				endpoint.breaker.record_success()
+	
+	def _health_loop(self):
+		while not self._stop.wait(self.health_check_interval):
+			self.check_health()
+	
+	def start_health_checks(self):
+		"""Start the background health-check thread (no-op if already running)"""
+		if self.health_check_interval <= 0 or (self._health_thread and self._health_thread.is_alive()):
+			return
+		self._stop.clear()
+		self._health_thread = threading.Thread(target=self._health_loop, name="provider-health", daemon=True)
+		self._health_thread.start()
+	
+	def stop_health_checks(self):
+		self._stop.set()
+	
+	def stats(self) -> List[Dict[str, Any]]:
+		"""Per-endpoint load and health counters"""
+		with self._lock:
+			return [
+				{
+					"address": e.address,
+					"available": e.breaker.available(),
+					"circuit": e.breaker.state,
+					"outstanding": e.outstanding,
+					"requests": e.requests,
+					"failures": e.failures
+				}
+				for e in self.endpoints
+			]
+	
+	@classmethod
+	def from_config(cls, config, llm_settings, http_settings: HttpSettings) -> "ProviderPool":
+		"""Build a pool for the configured endpoints using the [POOL] section of config.ini"""
+		return cls(
+			llm_settings.provider,
+			llm_settings.addresses,
+			http_settings,
+			health_check_interval=config.getfloat('POOL', 'health_check_interval', fallback=10.0),
+			cooldown=config.getfloat('POOL', 'cooldown', fallback=30.0),
+			failure_threshold=config.getint('POOL', 'failure_threshold', fallback=3),
+			health_check_timeout=config.getfloat('POOL', 'health_check_timeout', fallback=10.0)
+		)
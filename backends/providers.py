@@ -0,0 +1,134 @@
+"""
+Wire-level description of the supported LLM providers
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from .streaming import (
+	Usage, ollama_prefill, ollama_usage, openai_prefill, openai_usage, parse_ollama_line, parse_sse_line
+)
+from .tokens import DEFAULT_CONTEXT_SIZE, context_window
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+	"""Endpoint paths and response parsers for one provider"""
+	name: str
+	display_name: str
+	default_address: str
+	default_model: str
+	chat_path: str
+	health_path: str
+	parse_response: Callable[[dict], str]
+	parse_usage: Callable[[dict], Optional[Usage]]
+	parse_prefill: Callable[[dict], Optional[dict]]
+	parse_stream_line: Callable[[Union[bytes, str]], Tuple[str, bool, Optional[dict]]]
+
+
+PROVIDERS: Dict[str, ProviderSpec] = {
+	'ollama': ProviderSpec(
+		name='ollama',
+		display_name='Ollama',
+		default_address='http://localhost:11434',
+		default_model='deepseek-coder:33b',
+		chat_path='/api/chat',
+		health_path='/api/tags',
+		parse_response=lambda data: data['message']['content'],
+		parse_usage=ollama_usage,
+		parse_prefill=ollama_prefill,
+		parse_stream_line=parse_ollama_line
+	),
+	'lm_studio': ProviderSpec(
+		name='lm_studio',
+		display_name='LM Studio',
+		default_address='http://localhost:1234',
+		default_model='',
+		chat_path='/v1/chat/completions',
+		health_path='/v1/models',
+		parse_response=lambda data: data['choices'][0]['message']['content'],
+		parse_usage=openai_usage,
+		parse_prefill=openai_prefill,
+		parse_stream_line=parse_sse_line
+	),
+}
+
+
+def get_provider(name: str) -> ProviderSpec:
+	"""Look up a provider by its config name"""
+	if name not in PROVIDERS:
+		raise ValueError(f"Unknown provider: {name}")
+	return PROVIDERS[name]
+
+
+def parse_keep_alive(value: str):
+	"""Ollama accepts durations ("30m") or seconds (-1 keeps the model loaded forever)"""
+	value = (value or "").strip()
+	if not value:
+		return None
+	try:
+		return int(value)
+	except ValueError:
+		return value
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+	"""Snapshot of the [LLM] section, read once instead of on every call"""
+	provider: ProviderSpec
+	model: str
+	addresses: Tuple[str, ...]
+	temperature: float
+	max_tokens: int
+	context_size: int = DEFAULT_CONTEXT_SIZE
+	keep_alive: Optional[Union[int, str]] = None
+	num_ctx: int = 0
+	max_context: int = 8192
+	
+	def context_size_for(self, model: str) -> int:
+		"""
+		num_ctx to send with requests for model. Other models than the main one
+		(summary, warm-up) get their own window under the same cap, never more
+		than they support.
+		"""
+		if not model or model == self.model:
+			return self.context_size
+		if self.num_ctx > 0:
+			return min(self.num_ctx, context_window(model))
+		return min(context_window(model), self.max_context)
+	
+	@classmethod
+	def from_config(cls, config) -> "LLMSettings":
+		"""
+		Build settings from config.ini.
+		
+		Several model servers can be listed in ``<provider>_addresses``
+		(comma or newline separated); otherwise the single
+		``<provider>_address`` is used.
+		"""
+		provider = get_provider(config.get('LLM', 'provider', fallback='ollama'))
+		addresses = config.get('LLM', f'{provider.name}_addresses', fallback='')
+		if addresses.strip():
+			address_list = [a.strip().rstrip('/') for a in re.split(r'[,\s]+', addresses) if a.strip()]
+		else:
+			address_list = [config.get('LLM', f'{provider.name}_address', fallback=provider.default_address).rstrip('/')]
+		
+		model = config.get('LLM', f'{provider.name}_model', fallback=provider.default_model)
+		
+		# num_ctx overrides the model's native window; otherwise cap it to spare VRAM
+		num_ctx = config.getint('LLM', 'num_ctx', fallback=0)
+		max_context = config.getint('LLM', 'max_context', fallback=8192)
+		context_size = num_ctx if num_ctx > 0 else min(context_window(model), max_context)
+		
+		return cls(
+			provider=provider,
+			model=model,
+			addresses=tuple(address_list),
+			temperature=config.getfloat('LLM', 'temperature', fallback=0.7),
+			max_tokens=config.getint('LLM', 'max_tokens', fallback=4096),
+			context_size=context_size,
+			keep_alive=parse_keep_alive(config.get('LLM', 'keep_alive', fallback='')),
+			num_ctx=num_ctx,
+			max_context=max_context
+		)
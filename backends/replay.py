@@ -0,0 +1,182 @@
+"""
+Deterministic record/replay of LLM calls
+
+RecordingLLM wraps a real LLM and appends every (prompt, stop) → completion
+pair with its latency to a JSONL transcript. ReplayLLM serves a transcript
+back, optionally sleeping for the recorded (scaled) latency, so a full
+multi-agent session can be rerun offline to benchmark the orchestrator or
+catch regressions without a GPU.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+
+
+class ReplayMissError(KeyError):
+	"""Raised when a replayed prompt is not in the transcript"""
+
+
+def transcript_key(prompt: str, stop: Optional[List[str]]) -> str:
+	"""Stable key of one LLM call"""
+	material = json.dumps([prompt, list(stop or [])], ensure_ascii=False)
+	return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class Transcript:
+	"""
+	JSONL transcript of LLM calls.
+	
+	One compact JSON object per line: key, completion, latency and, unless
+	store_prompts is off, the prompt and call parameters for inspection.
+	"""
+	
+	def __init__(self, path: str, store_prompts: bool = True):
+		self.path = path
+		self.store_prompts = store_prompts
+		self._lock = threading.Lock()
+		self._entries: Optional[Dict[str, deque]] = None
+		self._last: Dict[str, Dict[str, Any]] = {}
+	
+	def append(self, prompt: str, stop: Optional[List[str]], completion: str, latency: float, params: Dict[str, Any] = None):
+		"""Append one recorded call"""
+		entry = {
+			"key": transcript_key(prompt, stop),
+			"completion": completion,
+			"latency": round(latency, 4)
+		}
+		if self.store_prompts:
+			entry["prompt"] = prompt
+			entry["stop"] = list(stop or [])
+			entry["params"] = params or {}
+		
+		line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+		with self._lock:
+			directory = os.path.dirname(self.path)
+			if directory:
+				os.makedirs(directory, exist_ok=True)
+			with open(self.path, 'a', encoding='utf-8') as f:
+				f.write(line + "\n")
+	
+	def _load(self):
+		entries = defaultdict(deque)
+		with open(self.path, 'r', encoding='utf-8') as f:
+			for line in f:
+				line = line.strip()
+				if line:
+					entry = json.loads(line)
+					entries[entry["key"]].append(entry)
+		self._entries = entries
+	
+	def next_entry(self, prompt: str, stop: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+		"""
+		Next recorded entry for this call.
+		
+		Repeated identical calls are served in recording order; once exhausted
+		the last entry keeps being returned.
+		"""
+		key = transcript_key(prompt, stop)
+		with self._lock:
+			if self._entries is None:
+				self._load()
+			queue = self._entries.get(key)
+			if queue:
+				self._last[key] = queue.popleft()
+			return self._last.get(key)
+
+
+class RecordingLLM(LLM):
+	"""Wraps an LLM and records every call to a transcript"""
+	
+	inner: Any
+	transcript: Any
+	
+	@property
+	def _llm_type(self) -> str:
+		return "recording"
+	
+	@property
+	def _identifying_params(self) -> Dict[str, Any]:
+		return {"inner": self.inner._llm_type, **getattr(self.inner, '_identifying_params', {})}
+	
+	def _call(
+		self,
+		prompt: str,
+		stop: List[str] = None,
+		run_manager: CallbackManagerForLLMRun = None,
+		**kwargs
+	) -> str:
+		started = time.perf_counter()
+		completion = self.inner._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+		self.transcript.append(prompt, stop, completion, time.perf_counter() - started, self._identifying_params)
+		return completion
+	
+	async def _acall(
+		self,
+		prompt: str,
+		stop: List[str] = None,
+		run_manager: AsyncCallbackManagerForLLMRun = None,
+		**kwargs
+	) -> str:
+		started = time.perf_counter()
+		completion = await self.inner._acall(prompt, stop=stop, run_manager=run_manager, **kwargs)
+		self.transcript.append(prompt, stop, completion, time.perf_counter() - started, self._identifying_params)
+		return completion
+
+
+class ReplayLLM(LLM):
+	"""Serves completions from a recorded transcript"""
+	
+	transcript: Any
+	latency_scale: float = 0.0
+	"""Sleep for the recorded latency times this factor (0 = answer instantly)"""
+	strict: bool = True
+	"""Raise ReplayMissError for unknown prompts instead of returning an empty completion"""
+	
+	@property
+	def _llm_type(self) -> str:
+		return "replay"
+	
+	def _lookup(self, prompt: str, stop: Optional[List[str]]) -> Dict[str, Any]:
+		entry = self.transcript.next_entry(prompt, stop)
+		if entry is None:
+			if self.strict:
+				raise ReplayMissError(f"No recorded completion for prompt: {prompt[:80]!r}...")
+			return {"completion": "", "latency": 0.0}
+		return entry
+	
+	def _call(
+		self,
+		prompt: str,
+		stop: List[str] = None,
+		run_manager: CallbackManagerForLLMRun = None,
+		**kwargs
+	) -> str:
+		entry = self._lookup(prompt, stop)
+		if self.latency_scale > 0:
+			time.sleep(entry["latency"] * self.latency_scale)
+		if run_manager:
+			run_manager.on_llm_new_token(entry["completion"])
+		return entry["completion"]
+	
+	async def _acall(
+		self,
+		prompt: str,
+		stop: List[str] = None,
+		run_manager: AsyncCallbackManagerForLLMRun = None,
+		**kwargs
+	) -> str:
+		entry = self._lookup(prompt, stop)
+		if self.latency_scale > 0:
+			await asyncio.sleep(entry["latency"] * self.latency_scale)
+		if run_manager:
+			await run_manager.on_llm_new_token(entry["completion"])
+		return entry["completion"]
@@ -0,0 +1,396 @@
+"""
+Resilience layer for LLM calls: retries, hedged requests and circuit breakers
+
+Backend failures are raised as LLMCallError once retries are exhausted, so
+they surface as task errors instead of being fed back to an agent as if
+they were model output.
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from .budget import BudgetExceeded
+
+T = TypeVar('T')
+
+
+class LLMCallError(RuntimeError):
+	"""Raised when an LLM backend call fails after all retries"""
+
+
+class CircuitOpenError(LLMCallError):
+	"""Raised when every endpoint's circuit breaker is open"""
+
+
+class CircuitBreaker:
+	"""
+	Classic three-state breaker.
+	
+	closed → open after ``failure_threshold`` consecutive failures; open →
+	half-open once ``reset_timeout`` has passed, letting a single probe
+	through; the probe's outcome closes or re-opens the circuit.
+	"""
+	
+	CLOSED = "closed"
+	OPEN = "open"
+	HALF_OPEN = "half_open"
+	
+	def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.consecutive_failures = 0
+		self.opened_at = 0.0
+		self._state = self.CLOSED
+		self._probe_in_flight = False
+		self._lock = threading.Lock()
+	
+	@property
+	def state(self) -> str:
+		with self._lock:
+			if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+				return self.HALF_OPEN
+			return self._state
+	
+	def available(self) -> bool:
+		"""Whether a request could be sent now, without claiming the probe slot"""
+		with self._lock:
+			if self._state == self.CLOSED:
+				return True
+			return time.monotonic() - self.opened_at >= self.reset_timeout and not self._probe_in_flight
+	
+	def allow(self) -> bool:
+		"""Whether a request may be sent now (claims the probe slot when half-open)"""
+		with self._lock:
+			if self._state == self.CLOSED:
+				return True
+			if time.monotonic() - self.opened_at < self.reset_timeout:
+				return False
+			if self._probe_in_flight:
+				return False
+			self._state = self.HALF_OPEN
+			self._probe_in_flight = True
+			return True
+	
+	def record_success(self):
+		with self._lock:
+			self.consecutive_failures = 0
+			self._probe_in_flight = False
+			self._state = self.CLOSED
+	
+	def record_failure(self):
+		with self._lock:
+			self.consecutive_failures += 1
+			self._probe_in_flight = False
+			if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+				self._trip()
+	
+	def release_probe(self):
+		"""Give back a claimed probe slot without recording an outcome"""
+		with self._lock:
+			self._probe_in_flight = False
+	
+	def trip(self):
+		"""Open the circuit immediately (e.g. after a failed health check)"""
+		with self._lock:
+			self._probe_in_flight = False
+			self._trip()
+	
+	def _trip(self):
+		self._state = self.OPEN
+		self.opened_at = time.monotonic()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+	"""Bounded retries with full-jitter exponential backoff"""
+	max_attempts: int = 3
+	base_delay: float = 0.5
+	max_delay: float = 8.0
+	
+	def delay(self, attempt: int) -> float:
+		"""Backoff before retry number ``attempt`` (1-based)"""
+		return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+def is_retryable(error: BaseException) -> bool:
+	"""Connection errors, timeouts, 408/429 and 5xx are worth retrying; other 4xx are not"""
+	if isinstance(error, (CircuitOpenError, BudgetExceeded)):
+		return False
+	response = getattr(error, 'response', None)
+	status = getattr(response, 'status_code', None)
+	if status is not None and 400 <= status < 500 and status not in (408, 429):
+		return False
+	return True
+
+
+def _transport_errors() -> tuple:
+	errors = [ConnectionError, TimeoutError, asyncio.TimeoutError]
+	try:
+		import requests
+		errors += [requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError]
+	except ImportError:
+		pass
+	try:
+		import httpx
+		errors.append(httpx.TransportError)
+	except ImportError:
+		pass
+	return tuple(errors)
+
+
+TRANSPORT_ERRORS = _transport_errors()
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+	"""
+	Whether an error says the endpoint is unhealthy and counts against its
+	circuit breaker: transport errors, timeouts, 408/429 and 5xx. A 400 for
+	a bad request or an unknown model is the caller's problem, not the server's.
+	"""
+	response = getattr(error, 'response', None)
+	status = getattr(response, 'status_code', None)
+	if status is not None:
+		return status in (408, 429) or status >= 500
+	return isinstance(error, TRANSPORT_ERRORS)
+
+
+class LatencyTracker:
+	"""Rolling window of call latencies used to pick the hedge delay"""
+	
+	def __init__(self, window: int = 200):
+		self._samples = deque(maxlen=window)
+		self._lock = threading.Lock()
+	
+	def record(self, seconds: float):
+		with self._lock:
+			self._samples.append(seconds)
+	
+	def __len__(self) -> int:
+		return len(self._samples)
+	
+	def quantile(self, q: float) -> Optional[float]:
+		with self._lock:
+			if not self._samples:
+				return None
+			ordered = sorted(self._samples)
+		return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+	"""
+	Runs provider calls through a ProviderPool with retries, optional hedging
+	and the pool's per-endpoint circuit breakers.
+	
+	Each call function receives the Endpoint it should talk to.
+	"""
+	
+	def __init__(
+		self,
+		pool,
+		retry: RetryPolicy = RetryPolicy(),
+		hedge: bool = False,
+		hedge_quantile: float = 0.95,
+		hedge_min_samples: int = 20,
+		max_hedge_workers: int = 32
+	):
+		self.pool = pool
+		self.retry = retry
+		self.hedge = hedge
+		self.hedge_quantile = hedge_quantile
+		self.hedge_min_samples = hedge_min_samples
+		self.latency = LatencyTracker()
+		self._executor = ThreadPoolExecutor(max_workers=max_hedge_workers, thread_name_prefix="llm-hedge") if hedge else None
+		self._stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+		self._lock = threading.Lock()
+	
+	@classmethod
+	def from_config(cls, config, pool) -> "ResilientCaller":
+		"""Build from the [RESILIENCE] section of config.ini"""
+		return cls(
+			pool,
+			retry=RetryPolicy(
+				max_attempts=config.getint('RESILIENCE', 'max_attempts', fallback=3),
+				base_delay=config.getfloat('RESILIENCE', 'backoff_base', fallback=0.5),
+				max_delay=config.getfloat('RESILIENCE', 'backoff_max', fallback=8.0)
+			),
+			hedge=config.getboolean('RESILIENCE', 'hedge', fallback=False),
+			hedge_quantile=config.getfloat('RESILIENCE', 'hedge_quantile', fallback=0.95),
+			hedge_min_samples=config.getint('RESILIENCE', 'hedge_min_samples', fallback=20)
+		)
+	
+	def _count(self, name: str, amount: int = 1):
+		with self._lock:
+			self._stats[name] += amount
+	
+	def hedge_delay(self) -> Optional[float]:
+		"""Delay before a duplicate request is sent, or None when hedging is off"""
+		if not self.hedge or len(self.pool.endpoints) < 2 or len(self.latency) < self.hedge_min_samples:
+			return None
+		return self.latency.quantile(self.hedge_quantile)
+	
+	def _attempt(self, fn: Callable[[Any], T], exclude: List[Any]) -> T:
+		with self.pool.endpoint(exclude=exclude) as endpoint:
+			exclude.append(endpoint)
+			started = time.monotonic()
+			result = fn(endpoint)
+			self.latency.record(time.monotonic() - started)
+			return result
+	
+	def _hedged_attempt(self, fn: Callable[[Any], T], exclude: List[Any]) -> T:
+		delay = self.hedge_delay()
+		if delay is None:
+			return self._attempt(fn, exclude)
+		
+		# Hedge threads see the caller's context (e.g. its run budget)
+		primary = self._executor.submit(contextvars.copy_context().run, self._attempt, fn, exclude)
+		done, _ = wait([primary], timeout=delay)
+		if done:
+			return primary.result()
+		
+		self._count("hedges")
+		backup = self._executor.submit(contextvars.copy_context().run, self._attempt, fn, exclude)
+		pending = {primary, backup}
+		error = None
+		while pending:
+			done, pending = wait(pending, return_when=FIRST_COMPLETED)
+			for future in done:
+				if future.exception() is None:
+					if future is backup:
+						self._count("hedge_wins")
+					# The losing request finishes in the background and is discarded
+					return future.result()
+				error = future.exception()
+		raise error
+	
+	def call(self, fn: Callable[[Any], T]) -> T:
+		"""Run fn(endpoint) with retries and hedging; raise LLMCallError on failure"""
+		self._count("calls")
+		tried: List[Any] = []
+		for attempt in range(1, self.retry.max_attempts + 1):
+			try:
+				return self._hedged_attempt(fn, tried)
+			except Exception as e:
+				if attempt == self.retry.max_attempts or not is_retryable(e):
+					self._count("failures")
+					raise _as_call_error(e)
+				self._count("retries")
+				time.sleep(self.retry.delay(attempt))
+	
+	def stream(self, fn: Callable[[Any], Iterator[T]]) -> Iterator[T]:
+		"""
+		Yield from fn(endpoint) with retries.
+		
+		A stream is only retried if it fails before producing anything; once
+		tokens have reached the caller a failure is raised as is.
+		"""
+		self._count("calls")
+		tried: List[Any] = []
+		for attempt in range(1, self.retry.max_attempts + 1):
+			produced = False
+			try:
+				with self.pool.endpoint(exclude=tried) as endpoint:
+					tried.append(endpoint)
+					for item in fn(endpoint):
+						produced = True
+						yield item
+				return
+			except Exception as e:
+				if produced or attempt == self.retry.max_attempts or not is_retryable(e):
+					self._count("failures")
+					raise _as_call_error(e)
+				self._count("retries")
+				time.sleep(self.retry.delay(attempt))
+	
+	async def _aattempt(self, fn: Callable[[Any], Awaitable[T]], exclude: List[Any]) -> T:
+		with self.pool.endpoint(exclude=exclude) as endpoint:
+			exclude.append(endpoint)
+			started = time.monotonic()
+			result = await fn(endpoint)
+			self.latency.record(time.monotonic() - started)
+			return result
+	
+	async def _ahedged_attempt(self, fn: Callable[[Any], Awaitable[T]], exclude: List[Any]) -> T:
+		delay = self.hedge_delay()
+		if delay is None:
+			return await self._aattempt(fn, exclude)
+		
+		primary = asyncio.ensure_future(self._aattempt(fn, exclude))
+		done, _ = await asyncio.wait({primary}, timeout=delay)
+		if done:
+			return primary.result()
+		
+		self._count("hedges")
+		backup = asyncio.ensure_future(self._aattempt(fn, exclude))
+		pending = {primary, backup}
+		error = None
+		try:
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					if task.exception() is None:
+						if task is backup:
+							self._count("hedge_wins")
+						return task.result()
+					error = task.exception()
+			raise error
+		finally:
+			# Unlike threads, the losing async request can really be cancelled
+			for task in pending:
+				task.cancel()
+	
+	async def acall(self, fn: Callable[[Any], Awaitable[T]]) -> T:
+		"""Async counterpart of call"""
+		self._count("calls")
+		tried: List[Any] = []
+		for attempt in range(1, self.retry.max_attempts + 1):
+			try:
+				return await self._ahedged_attempt(fn, tried)
+			except Exception as e:
+				if attempt == self.retry.max_attempts or not is_retryable(e):
+					self._count("failures")
+					raise _as_call_error(e)
+				self._count("retries")
+				await asyncio.sleep(self.retry.delay(attempt))
+	
+	async def astream(self, fn):
+		"""Async counterpart of stream; fn(endpoint) returns an async iterator"""
+		self._count("calls")
+		tried: List[Any] = []
+		for attempt in range(1, self.retry.max_attempts + 1):
+			produced = False
+			try:
+				with self.pool.endpoint(exclude=tried) as endpoint:
+					tried.append(endpoint)
+					async for item in fn(endpoint):
+						produced = True
+						yield item
+				return
+			except Exception as e:
+				if produced or attempt == self.retry.max_attempts or not is_retryable(e):
+					self._count("failures")
+					raise _as_call_error(e)
+				self._count("retries")
+				await asyncio.sleep(self.retry.delay(attempt))
+	
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			stats = dict(self._stats)
+		stats["p95_latency"] = self.latency.quantile(0.95)
+		stats["hedge_delay"] = self.hedge_delay()
+		return stats
+
+
+def _as_call_error(error: Exception) -> Exception:
+	# An exhausted run budget is not a backend failure and surfaces as itself
+	if isinstance(error, (LLMCallError, BudgetExceeded)):
+		return error
+	wrapped = LLMCallError(f"LLM backend call failed: {error}")
+	wrapped.__cause__ = error
+	return wrapped
@@ -0,0 +1,144 @@
+"""
+Single-flight coalescing of identical in-flight calls
+
+The first caller for a key (the leader) runs the work; callers that arrive
+with the same key while it is still running wait for the leader and share
+its result or exception instead of starting their own backend call. An
+error that only reflects the leader's own run budget is not shared: the
+followers retry under their own budgets. Neither is a result the caller's
+share predicate rejects (e.g. an answer that only held for the leader's run).
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from .budget import BudgetExceeded, current_budget
+
+
+class _Call:
+	"""A call in flight on a worker thread"""
+	def __init__(self):
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+		self.shareable = True
+		self.waiters = 0
+
+
+def _shareable(error: BaseException) -> bool:
+	"""Whether followers may receive the leader's error; not when the leader's run budget caused it"""
+	if isinstance(error, BudgetExceeded):
+		return False
+	# e.g. a timeout cut to what was left of the leader's deadline
+	budget = current_budget()
+	return budget is None or budget.exhausted is None
+
+
+class SingleFlight:
+	"""Coalesces concurrent identical calls, for threads and for asyncio"""
+	
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._calls: Dict[Any, _Call] = {}
+		self._tasks: Dict[Tuple[int, Any], Tuple[asyncio.Future, _Call]] = {}
+		self._stats = {"calls": 0, "executions": 0, "deduplicated": 0, "max_waiters": 0}
+	
+	def do(self, key: Any, fn: Callable[[], Any], share: Callable[[Any], bool] = None) -> Tuple[Any, bool]:
+		"""
+		Run fn once for all concurrent callers with the same key.
+		
+		Returns (result, shared) where shared is True for callers that received
+		another caller's result. share, evaluated by the leader, decides whether
+		its result may be handed to the others; when not, they run fn themselves.
+		"""
+		with self._lock:
+			self._stats["calls"] += 1
+		while True:
+			with self._lock:
+				call = self._calls.get(key)
+				if call is not None:
+					call.waiters += 1
+					self._stats["deduplicated"] += 1
+					self._stats["max_waiters"] = max(self._stats["max_waiters"], call.waiters)
+					leader = False
+				else:
+					call = _Call()
+					self._calls[key] = call
+					self._stats["executions"] += 1
+					leader = True
+			
+			if leader:
+				break
+			call.done.wait()
+			if call.shareable:
+				if call.error is None:
+					return call.result, True
+				raise call.error
+			# The leader ran out of its own budget or kept its result; try again under ours
+		
+		try:
+			call.result = fn()
+			call.shareable = share is None or share(call.result)
+		except BaseException as e:
+			call.error = e
+			call.shareable = _shareable(e)
+			raise
+		finally:
+			with self._lock:
+				del self._calls[key]
+			call.done.set()
+		return call.result, False
+	
+	async def ado(self, key: Any, fn: Callable[[], Awaitable[Any]], share: Callable[[Any], bool] = None) -> Tuple[Any, bool]:
+		"""Async counterpart of do; coalesces callers on the same event loop"""
+		task_key = (id(asyncio.get_running_loop()), key)
+		with self._lock:
+			self._stats["calls"] += 1
+		while True:
+			with self._lock:
+				entry = self._tasks.get(task_key)
+				if entry is not None:
+					self._stats["deduplicated"] += 1
+					task, call = entry
+					shared = True
+				else:
+					call = _Call()
+					task = asyncio.ensure_future(self._alead(fn, call, share))
+					self._tasks[task_key] = (task, call)
+					self._stats["executions"] += 1
+					task.add_done_callback(lambda _: self._forget(task_key))
+					shared = False
+			
+			try:
+				# Shield so one cancelled waiter does not cancel the call for the others
+				result = await asyncio.shield(task)
+			except Exception:
+				if not shared or call.shareable:
+					raise
+			else:
+				if not shared or call.shareable:
+					return result, shared
+			# The leader ran out of its own budget or kept its result; try again under ours
+	
+	async def _alead(self, fn: Callable[[], Awaitable[Any]], call: _Call, share: Callable[[Any], bool] = None) -> Any:
+		# Runs in the leader's context, so its budget and state decide whether the outcome is shared
+		try:
+			result = await fn()
+		except BaseException as e:
+			call.shareable = _shareable(e)
+			raise
+		call.shareable = share is None or share(result)
+		return result
+	
+	def _forget(self, task_key):
+		with self._lock:
+			self._tasks.pop(task_key, None)
+	
+	def stats(self) -> Dict[str, Any]:
+		"""How many calls were made, executed and deduplicated"""
+		with self._lock:
+			stats = dict(self._stats)
+			stats["in_flight"] = len(self._calls) + len(self._tasks)
+		stats["dedup_rate"] = stats["deduplicated"] / stats["calls"] if stats["calls"] else 0.0
+		return stats
@@ -0,0 +1,98 @@
+"""
+Stop-sequence handling for LLM output
+
+The ReAct agents pass stop sequences such as "Observation:" so the model does
+not invent tool results. StopDetector applies them to a token stream and also
+ends the stream as soon as a complete structured-chat action blob has been
+written, so the backend request can be cancelled right away.
+"""
+
+import re
+from typing import Optional, Sequence
+
+# Structured chat agents emit their action as a fenced JSON blob after "Action:"
+ACTION_BLOB_PATTERN = re.compile(r'Action:\s*```(?:json)?\s*\{.*?\}\s*```', re.DOTALL)
+
+
+def enforce_stop(text: str, stop: Optional[Sequence[str]]) -> str:
+	"""Cut text at the first occurrence of any stop sequence"""
+	if not stop:
+		return text
+	cut = len(text)
+	for sequence in stop:
+		index = text.find(sequence)
+		if index != -1:
+			cut = min(cut, index)
+	return text[:cut]
+
+
+class StopDetector:
+	"""
+	Incrementally applies stop sequences to streamed tokens.
+	
+	feed() returns the text that is safe to emit; text that could be the start
+	of a stop sequence is held back until it is resolved. Once ``stopped`` is
+	True the caller should stop reading and close the backend stream.
+	"""
+	
+	def __init__(self, stop: Optional[Sequence[str]] = None, stop_after_action: bool = True):
+		self.stop = [s for s in (stop or []) if s]
+		self.stop_after_action = stop_after_action
+		self.stopped = False
+		self._buffer = ""
+		self._emitted = 0
+		self._longest = max((len(s) for s in self.stop), default=0)
+	
+	def feed(self, token: str) -> str:
+		"""Add a token and return the text that can be emitted now"""
+		if self.stopped:
+			return ""
+		self._buffer += token
+		
+		cut = self._find_cut()
+		if cut is not None:
+			self.stopped = True
+			return self._emit(cut)
+		
+		return self._emit(len(self._buffer) - self._held_back())
+	
+	def flush(self) -> str:
+		"""Return any held-back text at the end of the stream"""
+		if self.stopped:
+			return ""
+		return self._emit(len(self._buffer))
+	
+	@property
+	def text(self) -> str:
+		"""Everything emitted so far"""
+		return self._buffer[:self._emitted]
+	
+	def _emit(self, end: int) -> str:
+		end = max(end, self._emitted)
+		piece = self._buffer[self._emitted:end]
+		self._emitted = end
+		return piece
+	
+	def _find_cut(self) -> Optional[int]:
+		cut = None
+		start = max(0, self._emitted - self._longest)
+		for sequence in self.stop:
+			index = self._buffer.find(sequence, start)
+			if index != -1 and (cut is None or index < cut):
+				cut = index
+		
+		if self.stop_after_action:
+			action_start = self._buffer.rfind("Action:", 0, cut)
+			if action_start != -1:
+				match = ACTION_BLOB_PATTERN.search(self._buffer, action_start, cut if cut is not None else len(self._buffer))
+				if match:
+					cut = match.end()
+		return cut
+	
+	def _held_back(self) -> int:
+		"""Length of the buffer suffix that could still grow into a stop sequence"""
+		for length in range(min(self._longest - 1, len(self._buffer) - self._emitted), 0, -1):
+			suffix = self._buffer[-length:]
+			if any(sequence.startswith(suffix) for sequence in self.stop):
+				return length
+		return 0
@@ -0,0 +1,94 @@
+"""
+Parsers for the streaming wire formats of the LLM providers
+
+Ollama streams newline-delimited JSON objects, LM Studio streams OpenAI-style
+server-sent events. Both parsers take a single raw line and return the text
+delta it carries, whether the stream has finished and the raw object when it
+carries usage/timing statistics (None otherwise).
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple, Union
+
+# (prompt_tokens, completion_tokens)
+Usage = Tuple[int, int]
+
+
+def ollama_usage(data: dict) -> Optional[Usage]:
+	"""Token counts from an Ollama response (only present on the final object)"""
+	if 'prompt_eval_count' not in data and 'eval_count' not in data:
+		return None
+	return data.get('prompt_eval_count', 0), data.get('eval_count', 0)
+
+
+def openai_usage(data: dict) -> Optional[Usage]:
+	"""Token counts from an OpenAI-compatible response"""
+	usage = data.get('usage')
+	if not usage:
+		return None
+	return usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0)
+
+
+def ollama_prefill(data: dict) -> Optional[Dict[str, Any]]:
+	"""Prefill statistics from an Ollama response"""
+	if 'prompt_eval_duration' not in data and 'prompt_eval_count' not in data:
+		return None
+	return {
+		"prompt_eval_tokens": data.get('prompt_eval_count'),
+		"prompt_eval_ms": data.get('prompt_eval_duration', 0) / 1e6,
+		"cached_tokens": None
+	}
+
+
+def openai_prefill(data: dict) -> Optional[Dict[str, Any]]:
+	"""Prefill statistics from an OpenAI-compatible response (llama.cpp-style timings if present)"""
+	usage = data.get('usage') or {}
+	timings = data.get('timings') or {}
+	if not usage and not timings:
+		return None
+	details = usage.get('prompt_tokens_details') or {}
+	return {
+		"prompt_eval_tokens": timings.get('prompt_n', usage.get('prompt_tokens')),
+		"prompt_eval_ms": timings.get('prompt_ms'),
+		"cached_tokens": details.get('cached_tokens', timings.get('cache_n'))
+	}
+
+
+def _decode(line: Union[bytes, str]) -> str:
+	if isinstance(line, bytes):
+		line = line.decode('utf-8', errors='replace')
+	return line.strip()
+
+
+def parse_ollama_line(line: Union[bytes, str]) -> Tuple[str, bool, Optional[dict]]:
+	"""Parse one NDJSON line from Ollama's /api/chat stream"""
+	line = _decode(line)
+	if not line:
+		return "", False, None
+	
+	data = json.loads(line)
+	if data.get('error'):
+		raise RuntimeError(data['error'])
+	done = bool(data.get('done'))
+	text = (data.get('message') or {}).get('content', "")
+	return text, done, data if done else None
+
+
+def parse_sse_line(line: Union[bytes, str]) -> Tuple[str, bool, Optional[dict]]:
+	"""Parse one server-sent event line from LM Studio's /v1/chat/completions stream"""
+	line = _decode(line)
+	if not line or not line.startswith('data:'):
+		return "", False, None
+	
+	payload = line[len('data:'):].strip()
+	if payload == '[DONE]':
+		return "", True, None
+	
+	data = json.loads(payload)
+	if data.get('error'):
+		raise RuntimeError(data['error'])
+	choices = data.get('choices') or [{}]
+	text = (choices[0].get('delta') or {}).get('content') or ""
+	# The usage chunk follows the finish_reason chunk, so only [DONE] ends the stream
+	has_stats = bool(data.get('usage') or data.get('timings'))
+	return text, False, data if has_stats else None
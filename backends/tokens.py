@@ -0,0 +1,163 @@
+"""
+Token estimation, context-window sizes and prompt budgeting
+
+The estimate is a deliberately simple characters-per-token heuristic: it is
+deterministic, needs no tokenizer download and errs on the high side for
+English text and code, which is what a budget needs.
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+CHARS_PER_TOKEN = 3.5
+
+# Native context windows by model family (longest matching prefix wins)
+MODEL_CONTEXT_SIZES = {
+	'llama2': 4096,
+	'llama3': 8192,
+	'llama3.1': 131072,
+	'llama3.2': 131072,
+	'codellama': 16384,
+	'mistral': 32768,
+	'mixtral': 32768,
+	'qwen2': 32768,
+	'qwen2.5': 32768,
+	'qwen2.5-coder': 32768,
+	'deepseek-coder': 16384,
+	'deepseek-coder-v2': 163840,
+	'deepseek-r1': 131072,
+	'phi3': 4096,
+	'gemma': 8192,
+	'gemma2': 8192,
+}
+
+DEFAULT_CONTEXT_SIZE = 4096
+
+TRUNCATION_MARKER = "\n...[truncated]...\n"
+
+
+def estimate_tokens(text: str) -> int:
+	"""Estimate the number of tokens in text"""
+	if not text:
+		return 0
+	return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def context_window(model: str) -> int:
+	"""Native context window of a model, matched on its family prefix"""
+	name = (model or "").lower().split('/')[-1]
+	best = None
+	for prefix in MODEL_CONTEXT_SIZES:
+		if name.startswith(prefix) and (best is None or len(prefix) > len(best)):
+			best = prefix
+	return MODEL_CONTEXT_SIZES[best] if best else DEFAULT_CONTEXT_SIZE
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+	"""
+	Deterministically cut text to roughly max_tokens.
+	
+	keep="head" keeps the beginning, "tail" keeps the end (e.g. the most recent
+	conversation turns) and "middle" keeps both ends and drops the middle.
+	"""
+	if estimate_tokens(text) <= max_tokens:
+		return text
+	max_chars = max(0, int(max_tokens * CHARS_PER_TOKEN) - len(TRUNCATION_MARKER))
+	if max_chars == 0:
+		return ""
+	if keep == "tail":
+		return TRUNCATION_MARKER.lstrip() + text[-max_chars:]
+	if keep == "middle":
+		head = max_chars // 2
+		return text[:head] + TRUNCATION_MARKER + text[-(max_chars - head):]
+	return text[:max_chars] + TRUNCATION_MARKER.rstrip()
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+	"""
+	Token budget per prompt section.
+	
+	The usable window is the context size minus the tokens reserved for the
+	completion; each section gets a fixed share of it.
+	"""
+	context_size: int = DEFAULT_CONTEXT_SIZE
+	completion_reserve: int = 1024
+	system_share: float = 0.25
+	memory_share: float = 0.15
+	context_share: float = 0.4
+	task_share: float = 0.2
+	
+	@property
+	def prompt_tokens(self) -> int:
+		return max(0, self.context_size - self.completion_reserve)
+	
+	@property
+	def system_tokens(self) -> int:
+		return int(self.prompt_tokens * self.system_share)
+	
+	@property
+	def memory_tokens(self) -> int:
+		return int(self.prompt_tokens * self.memory_share)
+	
+	@property
+	def context_tokens(self) -> int:
+		return int(self.prompt_tokens * self.context_share)
+	
+	@property
+	def task_tokens(self) -> int:
+		return int(self.prompt_tokens * self.task_share)
+	
+	@classmethod
+	def from_config(cls, config, context_size: int, max_tokens: Optional[int] = None) -> "PromptBudget":
+		"""
+		Build from the [BUDGET] section of config.ini. The completion reserve
+		defaults to max_tokens (at most half the window), so the prompt never
+		crowds out the completion the backend is asked for.
+		"""
+		reserve = cls.completion_reserve if max_tokens is None else min(max_tokens, context_size // 2)
+		return cls(
+			context_size=context_size,
+			completion_reserve=config.getint('BUDGET', 'completion_reserve', fallback=reserve),
+			system_share=config.getfloat('BUDGET', 'system_share', fallback=cls.system_share),
+			memory_share=config.getfloat('BUDGET', 'memory_share', fallback=cls.memory_share),
+			context_share=config.getfloat('BUDGET', 'context_share', fallback=cls.context_share),
+			task_share=config.getfloat('BUDGET', 'task_share', fallback=cls.task_share)
+		)
+
+
+class TokenUsage:
+	"""Thread-safe totals of the prompt/completion tokens reported by the backends"""
+	
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._by_model: Dict[str, Dict[str, int]] = {}
+		self.last: Optional[Dict[str, Any]] = None
+	
+	def record(self, model: str, prompt_tokens: int, completion_tokens: int, estimated: bool = False):
+		with self._lock:
+			totals = self._by_model.setdefault(
+				model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_calls": 0}
+			)
+			totals["calls"] += 1
+			totals["prompt_tokens"] += prompt_tokens
+			totals["completion_tokens"] += completion_tokens
+			if estimated:
+				totals["estimated_calls"] += 1
+			self.last = {
+				"model": model,
+				"prompt_tokens": prompt_tokens,
+				"completion_tokens": completion_tokens,
+				"estimated": estimated
+			}
+	
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			by_model = {model: dict(totals) for model, totals in self._by_model.items()}
+		return {
+			"prompt_tokens": sum(t["prompt_tokens"] for t in by_model.values()),
+			"completion_tokens": sum(t["completion_tokens"] for t in by_model.values()),
+			"by_model": by_model
+		}
@@ -0,0 +1,159 @@
+"""
+Model preloading and keep-warm pings
+
+Loading a model into GPU memory can take longer than the generation itself.
+ModelWarmer sends a one-token generation for every configured model to every
+endpoint at startup, optionally repeats it periodically so the server never
+unloads the model while idle, and reports per-endpoint readiness for the UI.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from .http_client import HttpSettings, get_session
+from .providers import ProviderSpec
+
+COLD = "cold"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelWarmer:
+	"""Preloads models on every endpoint and keeps them warm"""
+	
+	def __init__(
+		self,
+		provider: ProviderSpec,
+		addresses: Sequence[str],
+		models: Sequence[str],
+		http_settings: HttpSettings = HttpSettings(),
+		keep_alive=None,
+		ping_interval: float = 0,
+		context_sizes: Optional[Dict[str, int]] = None
+	):
+		self.provider = provider
+		self.addresses = list(addresses)
+		self.models = list(models)
+		self.http_settings = http_settings
+		self.keep_alive = keep_alive
+		self.ping_interval = ping_interval
+		# Ollama reloads a model whose num_ctx changes, so warm each with the one its requests send
+		self.context_sizes = dict(context_sizes or {})
+		
+		self._status: Dict[str, Dict[str, Any]] = {
+			self._target(address, model): {"address": address, "model": model, "state": COLD}
+			for address in self.addresses for model in self.models
+		}
+		self._lock = threading.Lock()
+		self._stop = threading.Event()
+		self._ping_thread = None
+	
+	@staticmethod
+	def _target(address: str, model: str) -> str:
+		return f"{address}|{model}"
+	
+	def _payload(self, model: str) -> Dict[str, Any]:
+		messages = [{"role": "user", "content": "Hi"}]
+		if self.provider.name == 'ollama':
+			options = {"num_predict": 1}
+			if self.context_sizes.get(model):
+				options["num_ctx"] = self.context_sizes[model]
+			payload = {"model": model, "messages": messages, "stream": False, "options": options}
+			if self.keep_alive is not None:
+				payload["keep_alive"] = self.keep_alive
+			return payload
+		payload = {"messages": messages, "max_tokens": 1, "stream": False}
+		if model:
+			payload["model"] = model
+		return payload
+	
+	def _set(self, address: str, model: str, **fields):
+		with self._lock:
+			self._status[self._target(address, model)].update(fields)
+	
+	def warm(self, address: str, model: str) -> bool:
+		"""Send one tiny generation to load model on address"""
+		first_load = self._status[self._target(address, model)]["state"] != READY
+		if first_load:
+			self._set(address, model, state=WARMING, error=None)
+		
+		session = get_session(self.provider.name, address, self.http_settings)
+		started = time.monotonic()
+		try:
+			response = session.post(
+				f"{address}{self.provider.chat_path}",
+				json=self._payload(model),
+				timeout=self.http_settings.timeout
+			)
+			response.raise_for_status()
+		except Exception as e:
+			self._set(address, model, state=FAILED, error=str(e))
+			return False
+		
+		elapsed = time.monotonic() - started
+		fields = {"state": READY, "error": None, "last_ping": time.time()}
+		if first_load:
+			fields["load_seconds"] = round(elapsed, 2)
+		self._set(address, model, **fields)
+		return True
+	
+	def warm_up(self) -> bool:
+		"""Warm every (endpoint, model) pair concurrently; True if any became ready"""
+		targets = [(address, model) for address in self.addresses for model in self.models]
+		if not targets:
+			return False
+		with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="llm-warmup") as executor:
+			results = list(executor.map(lambda target: self.warm(*target), targets))
+		return any(results)
+	
+	def _ping_loop(self):
+		while not self._stop.wait(self.ping_interval):
+			self.warm_up()
+	
+	def start(self, blocking: bool = False):
+		"""
+		Run the warm-up (in the background unless blocking) and start the
+		keep-warm pings when ping_interval is set.
+		"""
+		if blocking:
+			self.warm_up()
+		else:
+			threading.Thread(target=self.warm_up, name="llm-warmup", daemon=True).start()
+		
+		if self.ping_interval > 0 and not (self._ping_thread and self._ping_thread.is_alive()):
+			self._stop.clear()
+			self._ping_thread = threading.Thread(target=self._ping_loop, name="llm-keep-warm", daemon=True)
+			self._ping_thread.start()
+	
+	def stop(self):
+		self._stop.set()
+	
+	def readiness(self) -> Dict[str, Any]:
+		"""Overall readiness plus the state of every endpoint/model pair"""
+		with self._lock:
+			targets: List[Dict[str, Any]] = [dict(status) for status in self._status.values()]
+		states = [t["state"] for t in targets]
+		return {
+			"ready": READY in states,
+			"warming": WARMING in states,
+			"targets": targets
+		}
+	
+	@classmethod
+	def from_config(cls, config, llm_settings, http_settings: HttpSettings) -> Optional["ModelWarmer"]:
+		"""Build from the [WARMUP] section of config.ini (None when disabled)"""
+		if not config.getboolean('WARMUP', 'enabled', fallback=True):
+			return None
+		models = [m.strip() for m in config.get('WARMUP', 'models', fallback='').split(',') if m.strip()] or [llm_settings.model]
+		return cls(
+			llm_settings.provider,
+			llm_settings.addresses,
+			models,
+			http_settings,
+			keep_alive=llm_settings.keep_alive,
+			ping_interval=config.getfloat('WARMUP', 'ping_interval', fallback=0),
+			context_sizes={model: llm_settings.context_size_for(model) for model in models}
+		)
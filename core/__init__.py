@@ -1,6 +1,21 @@
 """Core components for the multi-agent system"""
 
 from .thinking_log import AgentThinkingLog
-from .task_plan import TaskPlan
+from .task_plan import TaskPlan, ExecutionPlan, plan_json_schema
+from .scheduler import TaskScheduler, PlanRun, AsyncPlanRun, PlanValidationError, build_dependency_graph
+from .plan_parser import PlanParseError, parse_plan_text, repair_json, task_from_dict
+from .plan_stream import IncrementalPlanParser, PlanStreamError
+from .plan_cache import PlanCache, fingerprint_query
+from .context_compaction import ContextCompactor, extract_relevant
+from .checkpoint import CheckpointStore
+from .sessions import SessionManager
+from .answer_cache import AnswerCache, normalize_query
 
-__all__ = ['AgentThinkingLog', 'TaskPlan']
+__all__ = [
+    'AgentThinkingLog', 'TaskPlan', 'ExecutionPlan', 'plan_json_schema',
+    'TaskScheduler', 'PlanRun', 'AsyncPlanRun', 'PlanValidationError', 'build_dependency_graph',
+    'PlanParseError', 'parse_plan_text', 'repair_json', 'task_from_dict',
+    'IncrementalPlanParser', 'PlanStreamError', 'PlanCache', 'fingerprint_query',
+    'ContextCompactor', 'extract_relevant', 'CheckpointStore', 'SessionManager',
+    'AnswerCache', 'normalize_query'
+]
@@ -0,0 +1,193 @@
+"""
+End-to-end cache of final answers, keyed by normalized query and route
+
+Verbatim repeats ("what's the weather", "read config.ini") are answered
+without routing them through any agent again. Each route has its own TTL so
+answers that depend on the outside world (files, search, browser) expire
+quickly while casual and code answers live longer. Concurrent identical
+queries share one execution, unless its answer is not cacheable (a failed
+run, a side effect): then each caller runs its own. An answer that depends
+on one session (e.g. on its conversation memory) is stored under that
+session's scope and only reused by it; answers stored with the default
+scope are shared.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from backends.singleflight import SingleFlight
+
+
+# Seconds an answer stays valid per route (0 = never cache that route)
+DEFAULT_ROUTE_TTLS = {
+    "file": 60,
+    "browser": 60,
+    "search": 300,
+    "planner": 300,
+    "casual": 3600,
+    "coder": 3600
+}
+
+# Paths and URLs keep their case; everything else is case-folded
+CASE_SENSITIVE_PATTERN = re.compile(r"[/\\]|\w\.\w")
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace, drop trailing punctuation and case-fold all but paths and URLs"""
+    words = query.strip().rstrip("?!.").split()
+    return " ".join(word if CASE_SENSITIVE_PATTERN.search(word) else word.casefold() for word in words)
+
+
+class AnswerCache:
+    """LRU cache of final answers with per-route TTLs and request coalescing"""
+    
+    def __init__(
+        self,
+        max_entries: int = 512,
+        route_ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 300
+    ):
+        self.max_entries = max_entries
+        self.route_ttls = dict(DEFAULT_ROUTE_TTLS if route_ttls is None else route_ttls)
+        self.default_ttl = default_ttl
+        # (route, scope, normalized query) -> (answer, stored at)
+        self._entries: "OrderedDict[Tuple[str, str, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = SingleFlight()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "shared": 0, "invalidations": 0, "evictions": 0}
+    
+    @classmethod
+    def from_config(cls, config) -> Optional["AnswerCache"]:
+        """Build the cache from the [ANSWER_CACHE] section of config.ini (None when disabled)"""
+        if not config.getboolean('ANSWER_CACHE', 'enabled', fallback=True):
+            return None
+        route_ttls = {
+            route: config.getfloat('ANSWER_CACHE', f'ttl_{route}', fallback=ttl)
+            for route, ttl in DEFAULT_ROUTE_TTLS.items()
+        }
+        return cls(
+            max_entries=config.getint('ANSWER_CACHE', 'max_entries', fallback=512),
+            route_ttls=route_ttls,
+            default_ttl=config.getfloat('ANSWER_CACHE', 'default_ttl', fallback=300)
+        )
+    
+    def ttl(self, route: str) -> float:
+        return self.route_ttls.get(route, self.default_ttl)
+    
+    def get(self, query: str, route: str, scope: str = "") -> Optional[str]:
+        """Return the cached answer, or None on a miss or when it has expired"""
+        key = (route, scope, normalize_query(query))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.ttl(route):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+    
+    def put(self, query: str, route: str, answer: str, scope: str = "") -> bool:
+        """Store an answer; routes with a TTL of 0 are never stored"""
+        if self.ttl(route) <= 0:
+            return False
+        key = (route, scope, normalize_query(query))
+        with self._lock:
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return True
+    
+    def get_or_compute(
+        self,
+        query: str,
+        route: str,
+        compute: Callable[[], str],
+        cacheable: Callable[[str], bool] = lambda answer: True,
+        scope: str = ""
+    ) -> Tuple[str, bool]:
+        """
+        Return (answer, reused), reused being True when the answer came from
+        the cache or from an identical call already in flight. On a miss,
+        concurrent callers share one compute(), whose answer is stored when
+        cacheable(answer) is true. An answer that is not cacheable is not
+        shared either: the callers that waited for it compute their own.
+        """
+        answer = self.get(query, route, scope)
+        if answer is not None:
+            return answer, True
+        
+        def compute_and_store():
+            result = compute()
+            if cacheable(result):
+                self.put(query, route, result, scope)
+            return result
+        
+        answer, shared = self._inflight.do((route, scope, normalize_query(query)), compute_and_store, cacheable)
+        if shared:
+            with self._lock:
+                self._stats["shared"] += 1
+        return answer, shared
+    
+    async def aget_or_compute(
+        self,
+        query: str,
+        route: str,
+        compute: Callable[[], Awaitable[str]],
+        cacheable: Callable[[str], bool] = lambda answer: True,
+        scope: str = ""
+    ) -> Tuple[str, bool]:
+        """Async version of get_or_compute"""
+        answer = self.get(query, route, scope)
+        if answer is not None:
+            return answer, True
+        
+        async def compute_and_store():
+            result = await compute()
+            if cacheable(result):
+                self.put(query, route, result, scope)
+            return result
+        
+        answer, shared = await self._inflight.ado((route, scope, normalize_query(query)), compute_and_store, cacheable)
+        if shared:
+            with self._lock:
+                self._stats["shared"] += 1
+        return answer, shared
+    
+    def invalidate(self, query: Optional[str] = None, route: Optional[str] = None) -> int:
+        """
+        Drop cached answers matching a query, a route, or both, in every
+        scope; with neither, drop everything. Returns how many were dropped.
+        """
+        normalized = normalize_query(query) if query is not None else None
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if (route is None or key[0] == route) and (normalized is None or key[2] == normalized)
+            ]
+            for key in keys:
+                del self._entries[key]
+            self._stats["invalidations"] += len(keys)
+        return len(keys)
+    
+    def clear(self):
+        """Drop every cached answer"""
+        self.invalidate()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
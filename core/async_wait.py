@@ -0,0 +1,89 @@
+"""
+Waiting in a coroutine for a resource that threads and other coroutines release
+
+A threading.Lock or Condition cannot be awaited, and blocking on it would
+stall the event loop. Coroutines instead register a future, and whoever
+releases the resource (from any thread or loop) resolves every registered
+future so the waiters try again.
+"""
+
+import asyncio
+import threading
+from typing import Any, Callable, List, Tuple
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AsyncWaiters:
+    """Coroutines waiting for a resource guarded by a threading primitive"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiting: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+    
+    def notify_all(self):
+        """Wake every waiting coroutine; call after releasing the resource"""
+        with self._lock:
+            waiting, self._waiting = self._waiting, []
+        for loop, future in waiting:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The waiter's loop is closed; nobody is left to wake
+                pass
+    
+    async def wait_for(self, attempt: Callable[[], Any], failed: Any = False) -> Any:
+        """Call attempt() until it returns something other than failed, waiting for notify_all() in between
+        
+        The waiter is registered before each attempt, so a release between a
+        failed attempt and the wait still wakes it.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            woken = loop.create_future()
+            with self._lock:
+                self._waiting.append((loop, woken))
+            try:
+                result = attempt()
+                if result is not failed:
+                    return result
+                await woken
+            finally:
+                with self._lock:
+                    if (loop, woken) in self._waiting:
+                        self._waiting.remove((loop, woken))
+
+
+class AsyncLock:
+    """A lock that threads hold with `with` and coroutines with `async with`, without blocking their loop"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = AsyncWaiters()
+    
+    def acquire(self):
+        self._lock.acquire()
+    
+    async def aacquire(self):
+        await self._waiters.wait_for(lambda: self._lock.acquire(blocking=False))
+    
+    def release(self):
+        self._lock.release()
+        self._waiters.notify_all()
+    
+    def __enter__(self) -> "AsyncLock":
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+    
+    async def __aenter__(self) -> "AsyncLock":
+        await self.aacquire()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self.release()
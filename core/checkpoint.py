@@ -0,0 +1,191 @@
+"""
+SQLite checkpoints of plan execution
+
+Every planned run gets a row with its query and status, and every task a row
+with its definition, status, result and timings, written as the task starts
+and finishes. A crashed or partly failed run can then be resumed, or a single
+task re-run, without repeating the finished LLM and browser steps.
+
+Old runs are pruned as new ones start: only the max_runs most recent are
+kept, and none older than max_age seconds.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from .task_plan import TaskPlan
+
+
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+
+
+class CheckpointStore:
+    """Persists plans, per-task status, results and timings to SQLite"""
+    
+    def __init__(self, path: str = ".checkpoints.sqlite", max_runs: int = 200, max_age: float = 7 * 86400):
+        self.path = path
+        self.max_runs = max_runs
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, query TEXT NOT NULL, status TEXT NOT NULL, summary TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "run_id TEXT NOT NULL, task_id TEXT NOT NULL, position INTEGER, agent TEXT NOT NULL, "
+            "need TEXT NOT NULL, task TEXT NOT NULL, status TEXT NOT NULL, result TEXT, "
+            "started REAL, finished REAL, PRIMARY KEY (run_id, task_id));"
+        )
+        self._db.commit()
+    
+    @classmethod
+    def from_config(cls, config) -> Optional["CheckpointStore"]:
+        """Build the store from the [CHECKPOINT] section of config.ini (None when disabled)"""
+        if not config.getboolean('CHECKPOINT', 'enabled', fallback=True):
+            return None
+        return cls(
+            config.get('CHECKPOINT', 'path', fallback='.checkpoints.sqlite'),
+            max_runs=config.getint('CHECKPOINT', 'max_runs', fallback=200),
+            max_age=config.getfloat('CHECKPOINT', 'max_age_days', fallback=7) * 86400
+        )
+    
+    def _execute(self, sql: str, parameters: Iterable[Any] = ()):
+        with self._lock:
+            self._db.execute(sql, tuple(parameters))
+            self._db.commit()
+    
+    def start_run(self, query: str) -> str:
+        """Create a run and return its id, pruning runs past the retention limits"""
+        run_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._execute(
+            "INSERT INTO runs (run_id, query, status, created, updated) VALUES (?, ?, ?, ?, ?)",
+            (run_id, query, RUN_RUNNING, now, now)
+        )
+        self.prune(now)
+        return run_id
+    
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Delete runs (and their tasks) beyond the max_runs most recent or last
+        updated more than max_age seconds ago; 0 disables either limit.
+        Returns the number of runs deleted.
+        """
+        conditions, parameters = [], []
+        if self.max_age > 0:
+            conditions.append("updated < ?")
+            parameters.append((now if now is not None else time.time()) - self.max_age)
+        if self.max_runs > 0:
+            conditions.append("run_id NOT IN (SELECT run_id FROM runs ORDER BY created DESC LIMIT ?)")
+            parameters.append(self.max_runs)
+        if not conditions:
+            return 0
+        
+        stale = f"SELECT run_id FROM runs WHERE {' OR '.join(conditions)}"
+        with self._lock:
+            self._db.execute(f"DELETE FROM tasks WHERE run_id IN ({stale})", parameters)
+            deleted = self._db.execute(f"DELETE FROM runs WHERE run_id IN ({stale})", parameters).rowcount
+            self._db.commit()
+        return deleted
+    
+    def save_task(self, run_id: str, task: TaskPlan, position: Optional[int] = None):
+        """Record a task's definition, keeping any status and result it already has"""
+        self._execute(
+            "INSERT INTO tasks (run_id, task_id, position, agent, need, task, status) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (run_id, task_id) DO UPDATE SET "
+            "position = COALESCE(excluded.position, position), agent = excluded.agent, "
+            "need = excluded.need, task = excluded.task",
+            (run_id, task.id, position, task.agent, json.dumps(task.need), task.task, TASK_PENDING)
+        )
+    
+    def save_plan(self, run_id: str, tasks: List[TaskPlan]):
+        """Record every task of a plan in plan order"""
+        for position, task in enumerate(tasks):
+            self.save_task(run_id, task, position)
+    
+    def task_started(self, run_id: str, task: TaskPlan):
+        self.save_task(run_id, task)
+        self._execute(
+            "UPDATE tasks SET status = ?, started = ?, finished = NULL WHERE run_id = ? AND task_id = ?",
+            (TASK_RUNNING, time.time(), run_id, task.id)
+        )
+    
+    def task_finished(self, run_id: str, task_id: str, result: str, failed: bool = False):
+        self._execute(
+            "UPDATE tasks SET status = ?, result = ?, finished = ? WHERE run_id = ? AND task_id = ?",
+            (TASK_FAILED if failed else TASK_DONE, result, time.time(), run_id, task_id)
+        )
+    
+    def finish_run(self, run_id: str, status: str, summary: Optional[str] = None):
+        self._execute(
+            "UPDATE runs SET status = ?, summary = ?, updated = ? WHERE run_id = ?",
+            (status, summary, time.time(), run_id)
+        )
+    
+    def reset_tasks(self, run_id: str, task_ids: Iterable[str]):
+        """Mark tasks pending again so the next resume re-executes them"""
+        for task_id in task_ids:
+            self._execute(
+                "UPDATE tasks SET status = ?, result = NULL, started = NULL, finished = NULL "
+                "WHERE run_id = ? AND task_id = ?",
+                (TASK_PENDING, run_id, task_id)
+            )
+        self._execute("UPDATE runs SET status = ?, updated = ? WHERE run_id = ?", (RUN_RUNNING, time.time(), run_id))
+    
+    def load_run(self, run_id: str) -> Dict[str, Any]:
+        """
+        Return a run's query, status, tasks (in plan order) and the results
+        of its finished tasks. Raises KeyError for an unknown run id.
+        """
+        with self._lock:
+            run = self._db.execute("SELECT query, status, summary FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if run is None:
+                raise KeyError(f"Unknown run id: {run_id}")
+            rows = self._db.execute(
+                "SELECT task_id, agent, need, task, status, result, started, finished FROM tasks "
+                "WHERE run_id = ? ORDER BY position IS NULL, position, started",
+                (run_id,)
+            ).fetchall()
+        
+        tasks, statuses, results, timings = [], {}, {}, {}
+        for task_id, agent, need, task, status, result, started, finished in rows:
+            tasks.append(TaskPlan(agent=agent, id=task_id, need=json.loads(need), task=task))
+            statuses[task_id] = status
+            if status == TASK_DONE:
+                results[task_id] = result
+            if started is not None and finished is not None:
+                timings[task_id] = finished - started
+        return {
+            "run_id": run_id,
+            "query": run[0],
+            "status": run[1],
+            "summary": run[2],
+            "tasks": tasks,
+            "statuses": statuses,
+            "results": results,
+            "timings": timings
+        }
+    
+    def list_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent runs first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT run_id, query, status, created, updated FROM runs ORDER BY created DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"run_id": run_id, "query": query, "status": status, "created": created, "updated": updated}
+            for run_id, query, status, created, updated in rows
+        ]
@@ -0,0 +1,234 @@
+"""
+Compaction of dependency results before they are passed to the next task
+
+A browser page dump or a whole file can be many times larger than what the
+next task needs, and every downstream task would prefill it again. Each
+result is capped at a token budget using one of two modes:
+
+- extractive: keep the head and tail plus the lines sharing the most terms
+  with the next task's text
+- summarize: ask an LLM (ideally a small, cheap one) for a summary, cached
+  per result; falls back to extractive if the call fails
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from backends.tokens import CHARS_PER_TOKEN, estimate_tokens, truncate_to_tokens
+
+
+COMPACTION_MODES = ("extractive", "summarize", "truncate")
+
+OMISSION_MARKER = "[...]"
+MAX_UNIT_CHARS = 400
+HEAD_SHARE = 0.25
+TAIL_SHARE = 0.15
+
+TERM_PATTERN = re.compile(r"[a-z0-9_]{3,}")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset("""
+the and for with that this from into then than are was were have has had not but you your our their them
+they its can could would should will what which when where who how all any each some such use using task
+result results previous context
+""".split())
+
+SUMMARY_PROMPT = """Summarize the following output of an earlier task so a later task can use it.
+Keep every concrete fact, name, number, URL, file path and code identifier. Leave out boilerplate.
+Use at most {max_words} words.
+
+Output of task {source_id}:
+{text}
+
+Summary:"""
+
+
+def _terms(text: str) -> set:
+    return {term for term in TERM_PATTERN.findall(text.lower()) if term not in STOPWORDS}
+
+
+def _split_units(text: str) -> List[str]:
+    """Lines, or sentences for single-paragraph text, with long units cut into pieces"""
+    units = text.splitlines()
+    if len(units) < 4:
+        units = SENTENCE_PATTERN.split(text)
+    pieces = []
+    for unit in units:
+        for start in range(0, max(len(unit), 1), MAX_UNIT_CHARS):
+            pieces.append(unit[start:start + MAX_UNIT_CHARS])
+    return pieces
+
+
+def extract_relevant(text: str, query: str, max_tokens: int) -> str:
+    """
+    Cut text to about max_tokens, keeping its head and tail and the lines
+    most relevant to query, in their original order.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    
+    units = _split_units(text)
+    budget = int(max_tokens * CHARS_PER_TOKEN)
+    chosen = set()
+    used = 0
+    
+    def take(index: int, limit: int) -> bool:
+        nonlocal used
+        cost = len(units[index]) + 1
+        if used + cost > limit:
+            return False
+        chosen.add(index)
+        used += cost
+        return True
+    
+    # Head, then tail: where results usually state what they are and how they ended
+    head_end = 0
+    while head_end < len(units) and take(head_end, budget * HEAD_SHARE):
+        head_end += 1
+    tail_start = len(units)
+    while tail_start - 1 > head_end and take(tail_start - 1, budget * (HEAD_SHARE + TAIL_SHARE)):
+        tail_start -= 1
+    
+    # Middle lines ranked by overlap with the next task, longer lines slightly penalized
+    query_terms = _terms(query)
+    scored: List[Tuple[float, int]] = []
+    for index in range(head_end, tail_start):
+        overlap = len(_terms(units[index]) & query_terms)
+        if overlap:
+            scored.append((overlap / math.log(len(units[index]) + 2), index))
+    for _, index in sorted(scored, key=lambda item: (-item[0], item[1])):
+        take(index, budget)
+    
+    parts = []
+    previous = -1
+    for index in sorted(chosen):
+        if index != previous + 1:
+            parts.append(OMISSION_MARKER)
+        parts.append(units[index])
+        previous = index
+    if previous != len(units) - 1:
+        parts.append(OMISSION_MARKER)
+    
+    return truncate_to_tokens("\n".join(parts), max_tokens, keep="middle")
+
+
+class ContextCompactor:
+    """Caps each dependency result at max_tokens before it is passed on"""
+    
+    def __init__(self, max_tokens: int = 768, mode: str = "extractive", llm: Any = None, cache_size: int = 256):
+        if mode not in COMPACTION_MODES:
+            raise ValueError(f"Unknown compaction mode: {mode} (expected one of {COMPACTION_MODES})")
+        if mode == "summarize" and llm is None:
+            raise ValueError("Summarize compaction needs an llm")
+        self.max_tokens = max_tokens
+        self.mode = mode
+        self.llm = llm
+        self.cache_size = cache_size
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"compacted": 0, "tokens_in": 0, "tokens_out": 0, "summaries": 0, "summary_hits": 0, "summary_failures": 0}
+    
+    @classmethod
+    def from_config(cls, config, llm: Any = None) -> "ContextCompactor":
+        """Build the compactor from the [CONTEXT] section of config.ini"""
+        return cls(
+            max_tokens=config.getint('CONTEXT', 'max_tokens_per_dependency', fallback=768),
+            mode=config.get('CONTEXT', 'mode', fallback='extractive'),
+            llm=llm
+        )
+    
+    def _needs_compaction(self, text: str, max_tokens: int) -> bool:
+        return estimate_tokens(text) > max_tokens
+    
+    def _record(self, text: str, compacted: str):
+        with self._lock:
+            self._stats["compacted"] += 1
+            self._stats["tokens_in"] += estimate_tokens(text)
+            self._stats["tokens_out"] += estimate_tokens(compacted)
+    
+    def _summary_key(self, source_id: str, text: str, max_tokens: int) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{source_id}:{max_tokens}:{digest}"
+    
+    def _cached_summary(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+                self._stats["summary_hits"] += 1
+            return summary
+    
+    def _store_summary(self, key: str, summary: str):
+        with self._lock:
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            self._stats["summaries"] += 1
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+    
+    def _summary_prompt(self, source_id: str, text: str, query: str, max_tokens: int) -> str:
+        # The summarizer's own input is capped too, so a huge result cannot overflow its context
+        source = extract_relevant(text, query, max_tokens * 8)
+        max_words = max(20, int(max_tokens * CHARS_PER_TOKEN / 6))
+        return SUMMARY_PROMPT.format(max_words=max_words, source_id=source_id, text=source)
+    
+    def _fallback(self, text: str, query: str, max_tokens: int) -> str:
+        with self._lock:
+            self._stats["summary_failures"] += 1
+        return extract_relevant(text, query, max_tokens)
+    
+    def compact(self, source_id: str, text: str, query: str, max_tokens: Optional[int] = None) -> str:
+        """Return text capped at max_tokens (default: the configured per-dependency budget)"""
+        max_tokens = min(max_tokens or self.max_tokens, self.max_tokens)
+        if not self._needs_compaction(text, max_tokens):
+            return text
+        
+        if self.mode == "truncate":
+            compacted = truncate_to_tokens(text, max_tokens, keep="middle")
+        elif self.mode == "extractive":
+            compacted = extract_relevant(text, query, max_tokens)
+        else:
+            key = self._summary_key(source_id, text, max_tokens)
+            compacted = self._cached_summary(key)
+            if compacted is None:
+                try:
+                    summary = str(self.llm.invoke(self._summary_prompt(source_id, text, query, max_tokens))).strip()
+                    compacted = truncate_to_tokens(summary, max_tokens)
+                    self._store_summary(key, compacted)
+                except Exception:
+                    compacted = self._fallback(text, query, max_tokens)
+        
+        self._record(text, compacted)
+        return compacted
+    
+    async def acompact(self, source_id: str, text: str, query: str, max_tokens: Optional[int] = None) -> str:
+        """Async version of compact; only the summarize mode awaits anything"""
+        if self.mode != "summarize":
+            return self.compact(source_id, text, query, max_tokens)
+        
+        max_tokens = min(max_tokens or self.max_tokens, self.max_tokens)
+        if not self._needs_compaction(text, max_tokens):
+            return text
+        
+        key = self._summary_key(source_id, text, max_tokens)
+        compacted = self._cached_summary(key)
+        if compacted is None:
+            try:
+                summary = await self.llm.ainvoke(self._summary_prompt(source_id, text, query, max_tokens))
+                compacted = truncate_to_tokens(str(summary).strip(), max_tokens)
+                self._store_summary(key, compacted)
+            except Exception:
+                compacted = self._fallback(text, query, max_tokens)
+        
+        self._record(text, compacted)
+        return compacted
+    
+    def stats(self) -> Dict[str, Any]:
+        """How much dependency context was cut"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["saved_ratio"] = 1 - stats["tokens_out"] / stats["tokens_in"] if stats["tokens_in"] else 0.0
+        return stats
@@ -0,0 +1,159 @@
+"""
+Cache of validated task plans for recurring complex queries
+
+Queries are reduced to a fingerprint: lowercased, punctuation, articles and
+filler words removed, with URLs, file names and numbers replaced by numbered placeholders.
+"Summarize https://a.com into notes.md" and "summarize https://b.org into
+todo.md" share a fingerprint. The cached plan stores the same placeholders in
+its task text, and a hit re-binds them to the new query's values.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .scheduler import PlanValidationError, build_dependency_graph
+from .task_plan import TaskPlan
+
+
+URL_PATTERN = re.compile(r"\bhttps?://[^\s'\"<>]+[^\s'\"<>.,;:!?)]")
+FILENAME_PATTERN = re.compile(r"(?<![\w/.\\-])(?:[\w\-.]+[/\\])*[\w\-]+\.[A-Za-z][A-Za-z0-9]{0,4}\b")
+NUMBER_PATTERN = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.]*\w)")
+PLACEHOLDER_KINDS = (("url", URL_PATTERN), ("file", FILENAME_PATTERN), ("num", NUMBER_PATTERN))
+
+# Only articles and politeness filler: prepositions, conjunctions, quantifiers and
+# pronouns change what a plan does ("to" vs "from", "all" vs "some", "and" vs "or")
+STOPWORDS = frozenset("""
+a an the please kindly just can could would will you i me
+""".split())
+
+
+def fingerprint_query(query: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Normalize a query into (fingerprint, bindings).
+    
+    bindings maps each placeholder (e.g. "url0") to the value it replaced,
+    in order of appearance within its kind.
+    """
+    bindings: List[Tuple[str, str]] = []
+    text = query
+    for kind, pattern in PLACEHOLDER_KINDS:
+        values = pattern.findall(text)
+        for index, value in enumerate(values):
+            bindings.append((f"{kind}{index}", value))
+        counter = iter(range(len(values)))
+        # Replaced before the next kind so e.g. digits inside a URL are not numbers
+        text = pattern.sub(lambda match: f" {kind}{next(counter)}placeholder ", text)
+    
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    fingerprint = " ".join(word for word in words if word not in STOPWORDS)
+    return fingerprint, bindings
+
+
+def _marker(placeholder: str) -> str:
+    return f"<<{placeholder}>>"
+
+
+def _value_pattern(value: str) -> "re.Pattern":
+    return re.compile(rf"(?<![\w.]){re.escape(value)}(?!\w)")
+
+
+class PlanCache:
+    """LRU + TTL cache of task plans keyed by query fingerprint"""
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "rejected": 0, "evictions": 0}
+    
+    @classmethod
+    def from_config(cls, config) -> Optional["PlanCache"]:
+        """Build the cache from the [PLAN_CACHE] section of config.ini (None when disabled)"""
+        if not config.getboolean('PLAN_CACHE', 'enabled', fallback=True):
+            return None
+        ttl = config.getfloat('PLAN_CACHE', 'ttl_seconds', fallback=86400)
+        return cls(
+            max_entries=config.getint('PLAN_CACHE', 'max_entries', fallback=256),
+            ttl_seconds=ttl if ttl > 0 else None
+        )
+    
+    def get(self, query: str) -> Optional[List[TaskPlan]]:
+        """Return the cached plan for a query with its values re-bound, or None on a miss"""
+        fingerprint, bindings = fingerprint_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None and self.ttl_seconds is not None and now - entry[1] > self.ttl_seconds:
+                del self._entries[fingerprint]
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self._stats["hits"] += 1
+            templates = entry[0]
+        
+        tasks = []
+        for template in templates:
+            text = template["task"]
+            for placeholder, value in bindings:
+                text = text.replace(_marker(placeholder), value)
+            tasks.append(TaskPlan(agent=template["agent"], id=template["id"], need=list(template["need"]), task=text))
+        return tasks
+    
+    def put(self, query: str, tasks: List[TaskPlan]) -> bool:
+        """Store a plan for a query; plans that fail validation are not cached"""
+        try:
+            build_dependency_graph(tasks)
+        except PlanValidationError:
+            with self._lock:
+                self._stats["rejected"] += 1
+            return False
+        if not tasks:
+            return False
+        
+        fingerprint, bindings = fingerprint_query(query)
+        # Longest values first so "10" is not replaced inside "100"
+        patterns = [
+            (placeholder, _value_pattern(value))
+            for placeholder, value in sorted(bindings, key=lambda binding: -len(binding[1]))
+        ]
+        templates = []
+        for task in tasks:
+            text = task.task
+            for placeholder, pattern in patterns:
+                text = pattern.sub(_marker(placeholder), text)
+            templates.append({"agent": task.agent, "id": task.id, "need": list(task.need), "task": text})
+        
+        with self._lock:
+            self._entries[fingerprint] = (templates, time.time())
+            self._entries.move_to_end(fingerprint)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return True
+    
+    def invalidate(self, query: str) -> bool:
+        """Drop the plan cached for a query's fingerprint"""
+        fingerprint, _ = fingerprint_query(query)
+        with self._lock:
+            return self._entries.pop(fingerprint, None) is not None
+    
+    def clear(self):
+        """Drop every cached plan"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
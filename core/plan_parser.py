@@ -0,0 +1,219 @@
+"""
+Tolerant parsing of planner output into task plans
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .task_plan import TaskPlan
+
+
+FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*(.*?)(?:```|$)", re.DOTALL)
+LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class PlanParseError(ValueError):
+    """Raised when no usable plan can be recovered from the planner output"""
+
+
+def normalize_agent(name: Any, agents: Optional[Iterable[str]] = None) -> str:
+    """Map 'Search', 'SEARCH' or 'Search Agent' onto the agent key 'search'"""
+    agent = str(name).strip().lower()
+    if agent.endswith(" agent"):
+        agent = agent[:-len(" agent")].strip()
+    if agents is not None and agent not in agents:
+        # e.g. 'web search' -> 'search' when exactly one known agent name appears in it
+        matches = [known for known in agents if re.search(rf"\b{re.escape(known)}\b", agent)]
+        if len(matches) == 1:
+            agent = matches[0]
+    return agent
+
+
+def task_from_dict(task_dict: Dict[str, Any], agents: Optional[Iterable[str]] = None) -> TaskPlan:
+    """Build a TaskPlan from one entry of the planner's JSON"""
+    need = task_dict.get("need") or []
+    if not isinstance(need, list):
+        need = [need]
+    return TaskPlan(
+        agent=normalize_agent(task_dict["agent"], agents),
+        id=str(task_dict["id"]),
+        need=[str(dep) for dep in need],
+        task=task_dict["task"]
+    )
+
+
+def prune_dependencies(tasks: Iterable[TaskPlan]) -> List[Tuple[str, str]]:
+    """Drop dependencies on tasks that are not in the plan and on the task itself; returns the (task, dependency) pairs dropped"""
+    tasks = list(tasks)
+    known = {task.id for task in tasks}
+    dropped = []
+    for task in tasks:
+        kept = [dep for dep in task.need if dep in known and dep != task.id]
+        if len(kept) != len(task.need):
+            dropped += [(task.id, dep) for dep in task.need if dep not in kept]
+            task.need = kept
+    return dropped
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix of the JSON mistakes models commonly make.
+    
+    Handles single-quoted strings, Python literals, trailing commas, raw
+    newlines in strings and truncated output. When the output is cut off
+    inside an array element, that element is dropped rather than guessed.
+    """
+    out: List[str] = []
+    # (closing char, output index where the container opened, opened inside an array)
+    stack = []
+    quote = None
+    escaped = False
+    index = 0
+    
+    while index < len(text):
+        char = text[index]
+        if quote:
+            if escaped:
+                escaped = False
+                if char == "'" and quote == "'":
+                    out[-1] = "'"  # \' is not a JSON escape
+                else:
+                    out.append(char)
+            elif char == "\\":
+                escaped = True
+                out.append(char)
+            elif char == quote:
+                quote = None
+                out.append('"')
+            elif char == '"':
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            else:
+                out.append(char)
+            index += 1
+            continue
+        
+        if char in "\"'":
+            quote = char
+            out.append('"')
+        elif char in "{[":
+            in_array = bool(stack) and stack[-1][0] == "]"
+            stack.append(("}" if char == "{" else "]", len(out), in_array))
+            out.append(char)
+        elif char in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+        else:
+            literal = next((word for word in LITERALS if text.startswith(word, index)), None)
+            if literal and not (index and text[index - 1].isalnum()):
+                out.append(LITERALS[literal])
+                index += len(literal)
+                continue
+            out.append(char)
+        index += 1
+    
+    if quote or stack:
+        # Truncated: drop the array element that was cut off, then close what is still open
+        cut = next((position for position, entry in enumerate(stack) if entry[0] == "}" and entry[2]), None)
+        if cut is not None:
+            del out[stack[cut][1]:]
+            del stack[cut:]
+        elif quote:
+            out.append('"')
+        _strip_trailing_comma(out)
+        if stack and stack[-1][0] == "}":
+            # A key whose value never arrived
+            out = list(re.sub(r'(?:,|(?<=\{))\s*"[^"]*"\s*:?\s*$', "", "".join(out)))
+            _strip_trailing_comma(out)
+        out.extend(entry[0] for entry in reversed(stack))
+    
+    return "".join(out)
+
+
+def _strip_trailing_comma(out: List[str]):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def _candidates(text: str) -> List[str]:
+    """JSON snippets to try, most likely first"""
+    blocks = [block.strip() for block in FENCE_PATTERN.findall(text)]
+    candidates = [block for block in blocks if "plan" in block]
+    candidates += [block for block in blocks if block not in candidates]
+    starts = [position for position in (text.find("{"), text.find("[")) if position != -1]
+    if starts:
+        candidates.append(text[min(starts):])
+    return [candidate for candidate in candidates if candidate]
+
+
+def _decode(text: str) -> Any:
+    """The JSON value at the start of text, ignoring whatever follows it"""
+    text = text.strip()
+    starts = [position for position in (text.find("{"), text.find("[")) if position != -1]
+    return json.JSONDecoder().raw_decode(text[min(starts) if starts else 0:])[0]
+
+
+def _load(candidate: str) -> Any:
+    try:
+        return _decode(candidate)
+    except ValueError:
+        pass
+    try:
+        return _decode(repair_json(candidate))
+    except ValueError:
+        # Prose after the JSON: cut at the last closing brace and retry
+        end = candidate.rfind("}")
+        if end == -1:
+            raise
+        return json.loads(repair_json(candidate[:end + 1]))
+
+
+def _plan_entries(data: Any) -> Optional[List[Any]]:
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key.lower() == "plan" and isinstance(value, list):
+                return value
+    return None
+
+
+def parse_plan_text(text: str, agents: Optional[Iterable[str]] = None) -> List[TaskPlan]:
+    """
+    Recover a task list from planner output, repairing it where needed.
+    
+    Entries without an agent, id or task are skipped and dependencies on
+    tasks that are not in the plan (e.g. cut off by truncation) are dropped.
+    """
+    agents = set(agents) if agents is not None else None
+    errors = []
+    
+    for candidate in _candidates(text):
+        try:
+            entries = _plan_entries(_load(candidate))
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        if entries is None:
+            continue
+        
+        tasks = []
+        for entry in entries:
+            try:
+                tasks.append(task_from_dict(entry, agents))
+            except (KeyError, TypeError, AttributeError, ValueError) as e:
+                errors.append(f"skipped task {entry!r:.80}: {e}")
+        if not tasks:
+            continue
+        
+        prune_dependencies(tasks)
+        return tasks
+    
+    detail = f": {errors[0]}" if errors else ""
+    raise PlanParseError(f"No task plan found in planner output{detail}")
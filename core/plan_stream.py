@@ -0,0 +1,107 @@
+"""
+Incremental parsing of a planner completion while it streams in
+"""
+
+import json
+import re
+from typing import Iterable, List, Optional
+
+from .plan_parser import task_from_dict
+from .task_plan import TaskPlan
+
+
+PLAN_ARRAY_PATTERN = re.compile(r'"plan"\s*:\s*\[')
+
+
+class PlanStreamError(ValueError):
+    """Raised when a streamed plan does not form a complete task list"""
+
+
+class IncrementalPlanParser:
+    """
+    Pulls task objects out of the planner's "plan" array as they complete.
+    
+    feed() takes each streamed chunk and returns the tasks whose closing
+    brace has just arrived, so they can be scheduled before the rest of the
+    plan is written. close() checks that the array was finished.
+    """
+    
+    def __init__(self, agents: Optional[Iterable[str]] = None):
+        self.agents = set(agents) if agents is not None else None
+        self.text = ""
+        self.tasks: List[TaskPlan] = []
+        self._position = None  # scan position once the array has been found
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self._finished = False
+        self._errors: List[str] = []
+    
+    @property
+    def finished(self) -> bool:
+        """True once the closing bracket of the plan array has been seen"""
+        return self._finished
+    
+    def feed(self, chunk: str) -> List[TaskPlan]:
+        """Add a chunk of the completion and return the tasks it completed"""
+        self.text += chunk
+        if self._finished:
+            return []
+        
+        if self._position is None:
+            match = PLAN_ARRAY_PATTERN.search(self.text)
+            if not match:
+                return []
+            self._position = match.end()
+        
+        completed = []
+        text = self.text
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = index
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    task = self._parse_object(text[self._object_start:index + 1])
+                    if task is not None:
+                        completed.append(task)
+                    self._object_start = None
+            elif char == "]" and self._depth == 0:
+                self._finished = True
+                self._position = index + 1
+                break
+        else:
+            self._position = len(text)
+        
+        self.tasks.extend(completed)
+        return completed
+    
+    def _parse_object(self, object_text: str):
+        try:
+            return task_from_dict(json.loads(object_text), self.agents)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._errors.append(f"{e} in {object_text[:80]!r}")
+            return None
+    
+    def close(self) -> List[TaskPlan]:
+        """Return every parsed task, raising PlanStreamError if the plan was incomplete or malformed"""
+        if self._position is None:
+            raise PlanStreamError("No \"plan\" array found in planner output")
+        if self._errors:
+            raise PlanStreamError(f"Invalid task in plan: {self._errors[0]}")
+        if not self._finished:
+            raise PlanStreamError("Planner output ended before the plan array was closed")
+        return list(self.tasks)
@@ -0,0 +1,302 @@
+"""
+Dependency-aware parallel execution of task plans
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .plan_parser import prune_dependencies
+from .task_plan import TaskPlan
+
+
+class PlanValidationError(ValueError):
+    """Raised when a plan has duplicate ids, unknown dependencies or cycles"""
+
+
+def build_dependency_graph(tasks: List[TaskPlan]) -> Dict[str, List[str]]:
+    """Validate a plan and return a map of task id -> ids of the tasks that need it"""
+    ids = [task.id for task in tasks]
+    duplicates = sorted({task_id for task_id in ids if ids.count(task_id) > 1})
+    if duplicates:
+        raise PlanValidationError(f"Duplicate task ids: {duplicates}")
+    
+    known = set(ids)
+    dependents: Dict[str, List[str]] = {task_id: [] for task_id in ids}
+    for task in tasks:
+        missing = [dep for dep in task.need if dep not in known]
+        if missing:
+            raise PlanValidationError(f"Task {task.id} needs unknown tasks: {missing}")
+        for dep in task.need:
+            dependents[dep].append(task.id)
+    
+    # Kahn's algorithm: anything never reaching in-degree 0 sits on a cycle
+    indegree = {task.id: len(set(task.need)) for task in tasks}
+    ready = [task_id for task_id, degree in indegree.items() if degree == 0]
+    visited = 0
+    while ready:
+        task_id = ready.pop()
+        visited += 1
+        for dependent in dependents[task_id]:
+            indegree[dependent] -= 1
+            if indegree[dependent] == 0:
+                ready.append(dependent)
+    if visited != len(tasks):
+        cyclic = sorted(task_id for task_id, degree in indegree.items() if degree > 0)
+        raise PlanValidationError(f"Dependency cycle between tasks: {cyclic}")
+    
+    return dependents
+
+
+class PlanRun:
+    """
+    A plan that is executed while its tasks are still being added.
+    
+    Each task starts as soon as it has been added and every task in its
+    'need' list has finished. close() validates the complete plan and waits
+    for the remaining tasks.
+    """
+    
+    def __init__(
+        self,
+        execute: Callable[[TaskPlan], str],
+        max_workers: int = 4,
+        on_complete: Optional[Callable[[TaskPlan, str], None]] = None,
+        completed: Optional[Dict[str, str]] = None
+    ):
+        self._execute = execute
+        self._on_complete = on_complete
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-task")
+        # Worker threads run tasks in a copy of the caller's context (e.g. its run budget)
+        self._context = contextvars.copy_context()
+        # Reentrant: a future that is already done runs its callback in the submitting thread
+        self._condition = threading.Condition(threading.RLock())
+        self._tasks: Dict[str, TaskPlan] = {}
+        # Tasks finished earlier (e.g. restored from a checkpoint) count as done and are not run again
+        self._results: Dict[str, str] = dict(completed or {})
+        self._started = set(self._results)
+        self._running = 0
+        self._error: Optional[BaseException] = None
+        self._cancelled = False
+    
+    def add(self, task: TaskPlan):
+        """Add a task, starting it right away if its dependencies are done"""
+        with self._condition:
+            if task.id in self._tasks:
+                raise PlanValidationError(f"Duplicate task ids: {[task.id]}")
+            self._tasks[task.id] = task
+            self._start_ready()
+    
+    def _start_ready(self):
+        # Caller holds the lock
+        if self._error is not None or self._cancelled:
+            return
+        for task in self._tasks.values():
+            if task.id not in self._started and all(dep in self._results for dep in task.need):
+                self._started.add(task.id)
+                self._running += 1
+                future = self._executor.submit(self._context.copy().run, self._execute, task)
+                future.add_done_callback(partial(self._finished, task))
+    
+    def prune_dependencies(self) -> List[Tuple[str, str]]:
+        """
+        Once every task has been added, drop dependencies on tasks that never
+        were and on the task itself, and start the tasks they were blocking.
+        Returns the (task, dependency) pairs dropped.
+        """
+        with self._condition:
+            dropped = prune_dependencies(self._tasks.values())
+            self._start_ready()
+        return dropped
+    
+    def _finished(self, task: TaskPlan, future):
+        with self._condition:
+            self._running -= 1
+            error = future.exception()
+            if error is not None:
+                self._error = self._error or error
+            else:
+                self._results[task.id] = future.result()
+                if self._on_complete:
+                    self._on_complete(task, self._results[task.id])
+                self._start_ready()
+            self._condition.notify_all()
+    
+    def _wait_idle(self):
+        with self._condition:
+            while self._running:
+                self._condition.wait()
+        self._executor.shutdown(wait=True)
+    
+    def cancel(self):
+        """Start no further tasks and wait for the running ones"""
+        with self._condition:
+            self._cancelled = True
+        self._wait_idle()
+    
+    def close(self) -> Dict[str, str]:
+        """Validate the complete plan, wait for every task and return results by task id"""
+        try:
+            build_dependency_graph(list(self._tasks.values()))
+        except PlanValidationError:
+            self.cancel()
+            raise
+        
+        with self._condition:
+            while self._running or (self._error is None and len(self._results) < len(self._tasks)):
+                self._condition.wait()
+        self._wait_idle()
+        
+        if self._error is not None:
+            raise self._error
+        return dict(self._results)
+
+
+class AsyncPlanRun:
+    """Async version of PlanRun: tasks are coroutines on the current event loop"""
+    
+    def __init__(
+        self,
+        execute: Callable[[TaskPlan], Awaitable[str]],
+        max_workers: int = 4,
+        on_complete: Optional[Callable[[TaskPlan, str], None]] = None,
+        completed: Optional[Dict[str, str]] = None
+    ):
+        self._execute = execute
+        self._on_complete = on_complete
+        self._slots = asyncio.Semaphore(max_workers)
+        self._tasks: Dict[str, TaskPlan] = {}
+        # Tasks finished earlier (e.g. restored from a checkpoint) count as done and are not run again
+        self._results: Dict[str, str] = dict(completed or {})
+        self._started = set(self._results)
+        self._running = set()
+        self._error: Optional[BaseException] = None
+    
+    def add(self, task: TaskPlan):
+        """Add a task, starting it right away if its dependencies are done"""
+        if task.id in self._tasks:
+            raise PlanValidationError(f"Duplicate task ids: {[task.id]}")
+        self._tasks[task.id] = task
+        self._start_ready()
+    
+    def _start_ready(self):
+        if self._error is not None:
+            return
+        for task in self._tasks.values():
+            if task.id not in self._started and all(dep in self._results for dep in task.need):
+                self._started.add(task.id)
+                self._running.add(asyncio.ensure_future(self._run_task(task)))
+    
+    def prune_dependencies(self) -> List[Tuple[str, str]]:
+        """See PlanRun.prune_dependencies"""
+        dropped = prune_dependencies(self._tasks.values())
+        self._start_ready()
+        return dropped
+    
+    async def _run_task(self, task: TaskPlan):
+        try:
+            async with self._slots:
+                result = await self._execute(task)
+        except Exception as e:
+            # close() sees the error and cancels the other tasks
+            self._error = self._error or e
+            return
+        finally:
+            self._running.discard(asyncio.current_task())
+        
+        self._results[task.id] = result
+        if self._on_complete:
+            self._on_complete(task, result)
+        self._start_ready()
+    
+    def cancel(self):
+        """Cancel every running task"""
+        for running in list(self._running):
+            running.cancel()
+    
+    async def close(self) -> Dict[str, str]:
+        """Validate the complete plan, wait for every task and return results by task id"""
+        try:
+            build_dependency_graph(list(self._tasks.values()))
+        except PlanValidationError:
+            self.cancel()
+            raise
+        
+        try:
+            # Finishing tasks start their dependents, so keep waiting until none are left
+            while self._running and self._error is None:
+                await asyncio.wait(set(self._running), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.cancel()
+        
+        if self._error is not None:
+            raise self._error
+        return dict(self._results)
+
+
+class TaskScheduler:
+    """Runs every task as soon as its dependencies are done, up to max_workers at a time"""
+    
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, max_workers)
+    
+    def start(
+        self,
+        execute: Callable[[TaskPlan], str],
+        on_complete: Optional[Callable[[TaskPlan, str], None]] = None,
+        completed: Optional[Dict[str, str]] = None
+    ) -> PlanRun:
+        """
+        Start an empty plan run that tasks can be added to as they become known.
+        
+        on_complete is called as each task finishes, before any of its
+        dependents are started. Tasks whose ids are in completed are treated
+        as already finished with those results.
+        """
+        return PlanRun(execute, self.max_workers, on_complete, completed)
+    
+    def astart(
+        self,
+        execute: Callable[[TaskPlan], Awaitable[str]],
+        on_complete: Optional[Callable[[TaskPlan, str], None]] = None,
+        completed: Optional[Dict[str, str]] = None
+    ) -> AsyncPlanRun:
+        """Async version of start"""
+        return AsyncPlanRun(execute, self.max_workers, on_complete, completed)
+    
+    def run(
+        self,
+        tasks: List[TaskPlan],
+        execute: Callable[[TaskPlan], str],
+        on_complete: Optional[Callable[[TaskPlan, str], None]] = None,
+        completed: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """Execute a complete plan and return its results by task id"""
+        # Validate up front so an invalid plan starts nothing
+        build_dependency_graph(tasks)
+        plan_run = self.start(execute, on_complete, completed)
+        for task in tasks:
+            plan_run.add(task)
+        return plan_run.close()
+    
+    async def arun(
+        self,
+        tasks: List[TaskPlan],
+        execute: Callable[[TaskPlan], Awaitable[str]],
+        on_complete: Optional[Callable[[TaskPlan, str], None]] = None,
+        completed: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """
+        Async version of run.
+        
+        If a task raises, the others still running are cancelled and the
+        error propagates.
+        """
+        build_dependency_graph(tasks)
+        plan_run = self.astart(execute, on_complete, completed)
+        for task in tasks:
+            plan_run.add(task)
+        return await plan_run.close()
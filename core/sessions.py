@@ -0,0 +1,178 @@
+"""
+Per-session orchestrators with idle and memory-budget eviction
+
+Each session (e.g. one Streamlit browser tab) gets its own orchestrator, so
+its thinking logs, task results and agent memories are not shared with
+other users. The factory is expected to reuse the heavy, shared resources
+(LLM client, browser, caches); a session only owns lightweight state.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from .async_wait import AsyncLock
+
+
+class _Session:
+    __slots__ = ("orchestrator", "lock", "created", "last_used", "busy", "queries")
+    
+    def __init__(self, orchestrator: Any):
+        self.orchestrator = orchestrator
+        # One query at a time per session; different sessions run concurrently
+        self.lock = AsyncLock()
+        self.created = time.time()
+        self.last_used = self.created
+        self.busy = 0
+        self.queries = 0
+
+
+class SessionManager:
+    """Creates, hands out and evicts per-session orchestrators"""
+    
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        max_sessions: int = 64,
+        idle_timeout: Optional[float] = 1800,
+        memory_budget_mb: Optional[float] = 256
+    ):
+        self.factory = factory
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "evicted_idle": 0, "evicted_memory": 0, "evicted_capacity": 0, "closed": 0}
+    
+    @classmethod
+    def from_config(cls, config, factory: Callable[[], Any]) -> "SessionManager":
+        """Build the manager from the [SESSIONS] section of config.ini"""
+        idle_timeout = config.getfloat('SESSIONS', 'idle_timeout', fallback=1800)
+        memory_budget = config.getfloat('SESSIONS', 'memory_budget_mb', fallback=256)
+        return cls(
+            factory,
+            max_sessions=config.getint('SESSIONS', 'max_sessions', fallback=64),
+            idle_timeout=idle_timeout if idle_timeout > 0 else None,
+            memory_budget_mb=memory_budget if memory_budget > 0 else None
+        )
+    
+    def _claim(self, session_id: str) -> Optional[_Session]:
+        # Caller holds the lock
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.time()
+            session.busy += 1
+        return session
+    
+    def _get_or_create(self, session_id: str) -> _Session:
+        with self._lock:
+            session = self._claim(session_id)
+        if session is not None:
+            return session
+        
+        # Building an orchestrator is slow; other sessions must not wait for it
+        created = _Session(self.factory())
+        with self._lock:
+            # Another thread may have created the same session meanwhile; its orchestrator wins
+            session = self._claim(session_id)
+            if session is None:
+                self._sessions[session_id] = created
+                self._stats["created"] += 1
+                session = self._claim(session_id)
+            return session
+    
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Any]:
+        """Hand out a session's orchestrator for one query, creating the session if needed"""
+        session = self._get_or_create(session_id)
+        try:
+            with session.lock:
+                session.queries += 1
+                yield session.orchestrator
+        finally:
+            with self._lock:
+                session.busy -= 1
+                session.last_used = time.time()
+            self.evict()
+    
+    @asynccontextmanager
+    async def asession(self, session_id: str) -> AsyncIterator[Any]:
+        """Async version of session; awaits the session lock instead of blocking the event loop"""
+        session = self._get_or_create(session_id)
+        try:
+            async with session.lock:
+                session.queries += 1
+                yield session.orchestrator
+        finally:
+            with self._lock:
+                session.busy -= 1
+                session.last_used = time.time()
+            self.evict()
+    
+    def peek(self, session_id: str) -> Optional[Any]:
+        """The session's orchestrator if it exists, without creating or touching it"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.orchestrator if session is not None else None
+    
+    def close(self, session_id: str) -> bool:
+        """Drop a session and everything it remembers"""
+        with self._lock:
+            closed = self._sessions.pop(session_id, None) is not None
+            if closed:
+                self._stats["closed"] += 1
+            return closed
+    
+    def _footprint(self, session: _Session) -> int:
+        footprint = getattr(session.orchestrator, "memory_footprint", None)
+        return footprint() if footprint else 0
+    
+    def evict(self) -> List[str]:
+        """
+        Drop sessions idle longer than idle_timeout, then the least recently
+        used ones while over max_sessions or the memory budget. Sessions
+        running a query are never evicted.
+        """
+        evicted = []
+        now = time.time()
+        with self._lock:
+            idle = [session_id for session_id, session in self._sessions.items() if not session.busy]
+            
+            if self.idle_timeout is not None:
+                for session_id in list(idle):
+                    if now - self._sessions[session_id].last_used > self.idle_timeout:
+                        del self._sessions[session_id]
+                        idle.remove(session_id)
+                        evicted.append(session_id)
+                        self._stats["evicted_idle"] += 1
+            
+            # idle is in least-recently-used order
+            while idle and len(self._sessions) > self.max_sessions:
+                session_id = idle.pop(0)
+                del self._sessions[session_id]
+                evicted.append(session_id)
+                self._stats["evicted_capacity"] += 1
+            
+            if self.memory_budget is not None:
+                footprints = {session_id: self._footprint(session) for session_id, session in self._sessions.items()}
+                total = sum(footprints.values())
+                while idle and total > self.memory_budget:
+                    session_id = idle.pop(0)
+                    total -= footprints[session_id]
+                    del self._sessions[session_id]
+                    evicted.append(session_id)
+                    self._stats["evicted_memory"] += 1
+        return evicted
+    
+    def stats(self) -> Dict[str, Any]:
+        """Session counts, eviction counters and the estimated memory held by sessions"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = len(self._sessions)
+            stats["busy"] = sum(1 for session in self._sessions.values() if session.busy)
+            stats["memory_bytes"] = sum(self._footprint(session) for session in self._sessions.values())
+        return stats
@@ -2,7 +2,7 @@
 Task planning structures and utilities
 """
 
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -12,3 +12,35 @@ class TaskPlan(BaseModel):
     id: str = Field(description="Unique ID for this task")
     need: List[str] = Field(default_factory=list, description="IDs of tasks this depends on")
     task: str = Field(description="Detailed description of the task")
+
+
+class ExecutionPlan(BaseModel):
+    """The planner's complete output"""
+    plan: List[TaskPlan] = Field(description="Tasks to execute, in order")
+
+
+def plan_json_schema(agents: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Self-contained JSON schema for ExecutionPlan, for constrained decoding.
+    
+    The task schema is inlined rather than referenced because not every
+    backend grammar converter resolves $defs. When agents are given, the
+    agent field is limited to their (title-cased) names.
+    """
+    # pydantic v2 / v1
+    schema_of = getattr(TaskPlan, "model_json_schema", None) or TaskPlan.schema
+    task_schema = schema_of()
+    task_schema.pop("title", None)
+    task_schema["required"] = ["agent", "id", "need", "task"]
+    task_schema["additionalProperties"] = False
+    if agents is not None:
+        task_schema["properties"]["agent"]["enum"] = sorted(agent.title() for agent in agents)
+    return {
+        "title": "execution_plan",
+        "type": "object",
+        "properties": {
+            "plan": {"type": "array", "items": task_schema, "minItems": 1}
+        },
+        "required": ["plan"],
+        "additionalProperties": False
+    }
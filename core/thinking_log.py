@@ -2,31 +2,55 @@
 Thinking log management for agent visualization
 """
 
+import contextvars
+import threading
 import time
+import weakref
 from typing import Dict, List
 
 
+# Agent each log is logging for in the current thread/async task, keyed weakly by
+# the log's key. One variable for every log: a ContextVar per instance would be
+# kept alive, with its value, by every long-lived context that ever set it.
+_current_agents = contextvars.ContextVar("thinking_log_agents", default=None)
+
+
+class _LogKey:
+    __slots__ = ("__weakref__",)
+
+
 class AgentThinkingLog:
-    """Manages thinking logs for all agents"""
+    """Manages thinking logs for all agents
+    
+    The current agent is tracked per thread/async task, so tasks running in
+    parallel each log under their own agent.
+    """
     def __init__(self):
         self.logs = {}
         self.current_agent = None
+        self._key = _LogKey()
+        self._lock = threading.Lock()
     
     def start_agent(self, agent_name: str):
         """Start logging for an agent"""
         self.current_agent = agent_name
-        if agent_name not in self.logs:
-            self.logs[agent_name] = []
+        self._set_context_agent(agent_name)
+        with self._lock:
+            if agent_name not in self.logs:
+                self.logs[agent_name] = []
     
     def log(self, message: str, level: str = "info"):
         """Log a thinking step"""
-        if self.current_agent:
+        agents = _current_agents.get()
+        agent_name = (agents.get(self._key) if agents is not None else None) or self.current_agent
+        if agent_name:
             timestamp = time.strftime("%H:%M:%S")
-            self.logs[self.current_agent].append({
-                "timestamp": timestamp,
-                "level": level,
-                "message": message
-            })
+            with self._lock:
+                self.logs.setdefault(agent_name, []).append({
+                    "timestamp": timestamp,
+                    "level": level,
+                    "message": message
+                })
     
     def get_logs(self) -> Dict[str, List[Dict]]:
         """Get all thinking logs"""
@@ -34,5 +58,16 @@ class AgentThinkingLog:
     
     def clear(self):
         """Clear all logs"""
-        self.logs = {}
+        with self._lock:
+            self.logs = {}
         self.current_agent = None
+        self._set_context_agent(None)
+    
+    def _set_context_agent(self, agent_name):
+        # Copied, not mutated: contexts copied from this one keep their own view
+        agents = weakref.WeakKeyDictionary(_current_agents.get() or {})
+        if agent_name is None:
+            agents.pop(self._key, None)
+        else:
+            agents[self._key] = agent_name
+        _current_agents.set(agents)
@@ -3,13 +3,25 @@ LangEntiChain - Multi-Agent System with Adaptive Routing
 """
 
 import os
+import sys
+import json
+import asyncio
+import argparse
 import configparser
-from typing import List
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 from langchain_core.language_models.llms import LLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.callbacks import BaseCallbackHandler, StreamingStdOutCallbackHandler
+from langchain_core.outputs import GenerationChunk
 from langchain.agents import Tool
 from multi_agent_system import MultiAgentOrchestrator
+from core import AnswerCache, CheckpointStore, ContextCompactor, PlanCache, SessionManager
 from browser_tool import create_browser_driver
+from backends import (
+	CompletionCache, HttpSettings, LLMSettings, ModelWarmer, PrefixReuseTracker, PromptBudget, ProviderPool,
+	RecordingLLM, ReplayLLM, ResilientCaller, RunBudget, SingleFlight, StopDetector, TokenUsage, Transcript,
+	current_budget, enforce_stop, estimate_tokens, get_session, get_async_client, split_prompt
+)
 
 # Import tools
 from tools.file_operations import read_file, write_file, list_files
@@ -19,6 +31,51 @@ from tools.web_browser import search_web
 config = configparser.ConfigParser()
 config.read('config.ini')
 
+# LLM settings are read once; every CustomLLM call uses this snapshot
+llm_settings = LLMSettings.from_config(config)
+
+# Connection pool and timeouts shared by every CustomLLM call
+http_settings = HttpSettings.from_config(config)
+
+# Requests are balanced across every configured model server
+provider_pool = ProviderPool.from_config(config, llm_settings, http_settings)
+
+# Retries, hedged requests and per-endpoint circuit breakers around every call
+resilient_llm = ResilientCaller.from_config(config, provider_pool)
+
+# Completion cache shared by every CustomLLM call (None when disabled)
+completion_cache = CompletionCache.from_config(config)
+
+# Plans of earlier complex queries, reused for equivalent ones (None when disabled)
+plan_cache = PlanCache.from_config(config)
+
+# Plan execution state persisted per run for resume/rerun (None when disabled)
+checkpoints = CheckpointStore.from_config(config)
+
+# Final answers reused for repeated queries, with per-route TTLs (None when disabled)
+answer_cache = AnswerCache.from_config(config)
+
+# Deadline, LLM-call and token limits each run starts with (None when unbounded)
+run_budget = RunBudget.from_config(config)
+
+# Concurrent identical requests share one backend call (None when disabled)
+inflight_requests = SingleFlight() if config.getboolean('LLM', 'coalesce_requests', fallback=True) else None
+
+# Prompt/completion tokens reported by the backends
+token_usage = TokenUsage()
+
+# How much of each prompt repeats the previous one (server-side KV cache reuse)
+prefix_reuse = PrefixReuseTracker()
+
+# Per-section token budgets derived from the model's context window
+prompt_budget = PromptBudget.from_config(config, llm_settings.context_size, llm_settings.max_tokens)
+
+# Completions never outgrow the part of the window the prompt budget keeps free for them
+max_completion_tokens = min(llm_settings.max_tokens, prompt_budget.completion_reserve)
+
+# Preloads the configured models and keeps them warm (None when disabled)
+model_warmer = ModelWarmer.from_config(config, llm_settings, http_settings)
+
 # Tool definitions for reference
 tools_list = [
 	Tool(
@@ -47,88 +104,424 @@ tools_list = [
 class CustomLLM(LLM):
 	"""Custom LLM wrapper for Ollama or LM Studio"""
 	
+	streaming: bool = False
+	"""Stream tokens from the backend and report each one to the callbacks"""
+	
+	model: Optional[str] = None
+	"""Model to call instead of [LLM] model (e.g. a smaller one for summaries)"""
+	
 	@property
 	def _llm_type(self) -> str:
 		return "custom"
 	
+	@property
+	def active_model(self) -> str:
+		return self.model or llm_settings.model
+	
+	def _build_request(self, address: str, prompt: str, stream: bool, stop: List[str] = None, schema: dict = None):
+		"""
+		Build the chat URL and JSON payload for a completion on one endpoint.
+		
+		The prompt is split into a static system message and a dynamic user
+		message so the server can reuse the KV cache of the shared prefix.
+		A JSON schema, when given, constrains decoding to matching output.
+		"""
+		provider = llm_settings.provider
+		messages = split_prompt(prompt)
+		
+		if provider.name == 'ollama':
+			options = {
+				"temperature": llm_settings.temperature,
+				"num_predict": max_completion_tokens,
+				"num_ctx": llm_settings.context_size_for(self.active_model)
+			}
+			if stop:
+				options["stop"] = list(stop)
+			payload = {
+				"model": self.active_model,
+				"messages": messages,
+				"stream": stream,
+				"options": options
+			}
+			if llm_settings.keep_alive is not None:
+				# Pin the model in memory so idle periods do not unload it
+				payload["keep_alive"] = llm_settings.keep_alive
+			if schema is not None:
+				payload["format"] = schema
+		else:
+			payload = {
+				"messages": messages,
+				"temperature": llm_settings.temperature,
+				"max_tokens": max_completion_tokens,
+				"stream": stream,
+				"cache_prompt": True
+			}
+			if self.model:
+				payload["model"] = self.model
+			if stop:
+				payload["stop"] = list(stop)
+			if stream:
+				payload["stream_options"] = {"include_usage": True}
+			if schema is not None:
+				payload["response_format"] = {
+					"type": "json_schema",
+					"json_schema": {"name": schema.get("title", "response"), "strict": True, "schema": schema}
+				}
+		
+		prefix_reuse.observe(address, messages)
+		return f"{address}{provider.chat_path}", payload
+	
+	def _record_usage(self, prompt: str, completion: str, stats: dict = None):
+		"""Record backend-reported token and prefill statistics, estimating tokens when not reported"""
+		usage = llm_settings.provider.parse_usage(stats) if stats else None
+		if stats:
+			prefix_reuse.record_prefill(llm_settings.provider.parse_prefill(stats))
+		if usage is not None:
+			prompt_tokens, completion_tokens = usage
+			token_usage.record(self.active_model, prompt_tokens, completion_tokens)
+		else:
+			prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+			token_usage.record(self.active_model, prompt_tokens, completion_tokens, estimated=True)
+		budget = current_budget()
+		if budget is not None:
+			budget.charge_tokens(prompt_tokens + completion_tokens)
+	
+	def _request_key(self, prompt: str, stop: List[str] = None, schema: dict = None) -> str:
+		"""Key identifying every parameter that influences the completion"""
+		return CompletionCache.make_key(
+			llm_settings.provider.name,
+			self.active_model,
+			prompt,
+			llm_settings.temperature,
+			stop,
+			max_completion_tokens,
+			schema
+		)
+	
+	def _begin_call(self) -> Optional[RunBudget]:
+		"""Count a backend call against the current run's budget, raising BudgetExceeded when it is used up"""
+		budget = current_budget()
+		if budget is not None:
+			budget.begin_call()
+		return budget
+	
+	def _timeout(self):
+		"""HTTP timeout, cut to what is left of the run's deadline"""
+		budget = current_budget()
+		if budget is None:
+			return http_settings.timeout
+		budget.check()
+		return tuple(max(budget.timeout(seconds), 0.01) for seconds in http_settings.timeout)
+	
+	def _is_cacheable(self) -> bool:
+		return completion_cache is not None and completion_cache.is_cacheable(llm_settings.temperature)
+	
+	def _lookup(self, prompt: str, stop: List[str], kwargs: dict) -> Tuple[str, Optional[dict], Optional[str]]:
+		"""Request key, response schema and cached completion (None on a miss) of a call"""
+		# invoke(..., response_schema=...) asks for output matching a JSON schema
+		schema = kwargs.get("response_schema")
+		request_key = self._request_key(prompt, stop, schema)
+		cached = completion_cache.get(request_key) if self._is_cacheable() else None
+		return request_key, schema, cached
+	
+	def _store(self, request_key: str, completion: str):
+		if self._is_cacheable():
+			completion_cache.put(request_key, completion)
+	
+	def _replays_token(self, run_manager) -> bool:
+		"""Whether a completion that was not generated for this call is still sent to its token callback"""
+		return self.streaming and run_manager is not None
+	
 	def _call(
 		self,
 		prompt: str,
 		stop: List[str] = None,
 		run_manager: CallbackManagerForLLMRun = None,
+		**kwargs
 	) -> str:
-		provider = config.get('LLM', 'provider', fallback='ollama')
+		request_key, schema, completion = self._lookup(prompt, stop, kwargs)
+		if completion is not None:
+			if self._replays_token(run_manager):
+				run_manager.on_llm_new_token(completion)
+			return completion
 		
-		if provider == 'ollama':
-			return self._call_ollama(prompt)
-		elif provider == 'lm_studio':
-			return self._call_lm_studio(prompt)
+		if inflight_requests is not None:
+			# Identical concurrent requests share one backend generation
+			completion, shared = inflight_requests.do(request_key, lambda: self._complete(prompt, stop, run_manager, schema))
+			if shared and self._replays_token(run_manager):
+				run_manager.on_llm_new_token(completion)
 		else:
-			raise ValueError(f"Unknown provider: {provider}")
+			completion = self._complete(prompt, stop, run_manager, schema)
+		
+		self._store(request_key, completion)
+		return completion
+	
+	def _complete(self, prompt: str, stop: List[str] = None, run_manager: CallbackManagerForLLMRun = None, schema: dict = None) -> str:
+		"""Run one completion with retries/hedging, raising LLMCallError on failure"""
+		if self.streaming:
+			return "".join(chunk.text for chunk in self._stream_tokens(prompt, stop, run_manager, schema))
+		self._begin_call()
+		return resilient_llm.call(lambda endpoint: self._post_completion(endpoint, prompt, stop, schema))
+	
+	def _post_completion(self, endpoint, prompt: str, stop: List[str] = None, schema: dict = None) -> str:
+		url, payload = self._build_request(endpoint.address, prompt, stream=False, stop=stop, schema=schema)
+		session = get_session(llm_settings.provider.name, endpoint.address, http_settings)
+		response = session.post(url, json=payload, timeout=self._timeout())
+		response.raise_for_status()
+		data = response.json()
+		completion = enforce_stop(llm_settings.provider.parse_response(data), stop)
+		self._record_usage(prompt, completion, data)
+		return completion
 	
-	def _call_ollama(self, prompt: str) -> str:
-		import requests
+	def _stream_endpoint(self, endpoint, prompt: str, stop: List[str] = None, schema: dict = None) -> Iterator[str]:
+		"""
+		Yield tokens from one endpoint's stream.
 		
-		address = config.get('LLM', 'ollama_address', fallback='http://localhost:11434')
-		model = config.get('LLM', 'ollama_model', fallback='deepseek-coder:33b')
+		Leaving the loop early closes the response, which cancels the generation
+		on the server as soon as a stop sequence or complete action appears.
+		"""
+		provider = llm_settings.provider
+		url, payload = self._build_request(endpoint.address, prompt, stream=True, stop=stop, schema=schema)
+		session = get_session(provider.name, endpoint.address, http_settings)
+		# Only agent calls pass stop sequences; plain generations are never cut after an action
+		detector = StopDetector(stop, stop_after_action=bool(stop))
 		
-		try:
-			response = requests.post(
-				f"{address}/api/generate",
-				json={
-					"model": model,
-					"prompt": prompt,
-					"stream": False,
-					"temperature": config.getfloat('LLM', 'temperature', fallback=0.7),
-					"max_tokens": config.getint('LLM', 'max_tokens', fallback=4096)
-				}
-			)
+		stats = None
+		budget = current_budget()
+		
+		with session.post(url, json=payload, stream=True, timeout=self._timeout()) as response:
 			response.raise_for_status()
-			return response.json()['response']
-		except Exception as e:
-			print(f"Ollama error: {e}")
-			return f"Error calling Ollama: {str(e)}"
+			for line in response.iter_lines():
+				if budget is not None:
+					# Out of budget: leaving the loop closes the response and cancels the generation
+					budget.check()
+				token, done, line_stats = provider.parse_stream_line(line)
+				stats = line_stats or stats
+				text = detector.feed(token) if token else ""
+				if text:
+					yield text
+				if done or detector.stopped:
+					break
+		
+		remainder = detector.flush()
+		if remainder:
+			yield remainder
+		# A cancelled stream never reports usage, so it is estimated
+		self._record_usage(prompt, detector.text, stats)
+	
+	def _stream_tokens(self, prompt: str, stop: List[str] = None, run_manager: CallbackManagerForLLMRun = None, schema: dict = None) -> Iterator[GenerationChunk]:
+		self._begin_call()
+		for token in resilient_llm.stream(lambda endpoint: self._stream_endpoint(endpoint, prompt, stop, schema)):
+			chunk = GenerationChunk(text=token)
+			if run_manager:
+				run_manager.on_llm_new_token(token, chunk=chunk)
+			yield chunk
+	
+	def _stream(
+		self,
+		prompt: str,
+		stop: List[str] = None,
+		run_manager: CallbackManagerForLLMRun = None,
+		**kwargs
+	) -> Iterator[GenerationChunk]:
+		# llm.stream() callers (e.g. the streaming planner) still get cached completions
+		request_key, schema, cached = self._lookup(prompt, stop, kwargs)
+		if cached is not None:
+			chunk = GenerationChunk(text=cached)
+			if run_manager:
+				run_manager.on_llm_new_token(cached, chunk=chunk)
+			yield chunk
+			return
+		
+		completion = ""
+		for chunk in self._stream_tokens(prompt, stop, run_manager, schema):
+			completion += chunk.text
+			yield chunk
+		
+		# Only reached when the caller consumed the whole stream
+		self._store(request_key, completion)
 	
-	def _call_lm_studio(self, prompt: str) -> str:
-		import requests
+	async def _acall(
+		self,
+		prompt: str,
+		stop: List[str] = None,
+		run_manager: AsyncCallbackManagerForLLMRun = None,
+		**kwargs
+	) -> str:
+		request_key, schema, completion = self._lookup(prompt, stop, kwargs)
+		if completion is not None:
+			if self._replays_token(run_manager):
+				await run_manager.on_llm_new_token(completion)
+			return completion
+		
+		if inflight_requests is not None:
+			completion, shared = await inflight_requests.ado(request_key, lambda: self._acomplete(prompt, stop, run_manager, schema))
+			if shared and self._replays_token(run_manager):
+				await run_manager.on_llm_new_token(completion)
+		else:
+			completion = await self._acomplete(prompt, stop, run_manager, schema)
 		
-		address = config.get('LLM', 'lm_studio_address', fallback='http://localhost:1234')
+		self._store(request_key, completion)
+		return completion
+	
+	async def _acomplete(self, prompt: str, stop: List[str] = None, run_manager: AsyncCallbackManagerForLLMRun = None, schema: dict = None) -> str:
+		"""Async counterpart of _complete; the run's deadline cancels the call in flight"""
+		async def complete():
+			if self.streaming:
+				completion = ""
+				async for chunk in self._astream_tokens(prompt, stop, run_manager, schema):
+					completion += chunk.text
+				return completion
+			self._begin_call()
+			return await resilient_llm.acall(lambda endpoint: self._apost_completion(endpoint, prompt, stop, schema))
 		
+		budget = current_budget()
+		remaining = budget.remaining_seconds() if budget is not None else None
+		if remaining is None:
+			return await complete()
 		try:
-			response = requests.post(
-				f"{address}/v1/completions",
-				json={
-					"prompt": prompt,
-					"temperature": config.getfloat('LLM', 'temperature', fallback=0.7),
-					"max_tokens": config.getint('LLM', 'max_tokens', fallback=4096),
-					"stream": False
-				}
-			)
+			return await asyncio.wait_for(complete(), remaining)
+		except asyncio.TimeoutError:
+			budget.check()
+			raise
+	
+	async def _apost_completion(self, endpoint, prompt: str, stop: List[str] = None, schema: dict = None) -> str:
+		url, payload = self._build_request(endpoint.address, prompt, stream=False, stop=stop, schema=schema)
+		response = await get_async_client(http_settings).post(url, json=payload)
+		response.raise_for_status()
+		data = response.json()
+		completion = enforce_stop(llm_settings.provider.parse_response(data), stop)
+		self._record_usage(prompt, completion, data)
+		return completion
+	
+	async def _astream_endpoint(self, endpoint, prompt: str, stop: List[str] = None, schema: dict = None) -> AsyncIterator[str]:
+		"""Async counterpart of _stream_endpoint"""
+		provider = llm_settings.provider
+		url, payload = self._build_request(endpoint.address, prompt, stream=True, stop=stop, schema=schema)
+		# Only agent calls pass stop sequences; plain generations are never cut after an action
+		detector = StopDetector(stop, stop_after_action=bool(stop))
+		
+		stats = None
+		budget = current_budget()
+		
+		async with get_async_client(http_settings).stream("POST", url, json=payload) as response:
 			response.raise_for_status()
-			return response.json()['choices'][0]['text']
-		except Exception as e:
-			print(f"LM Studio error: {e}")
-			return f"Error calling LM Studio: {str(e)}"
+			async for line in response.aiter_lines():
+				if budget is not None:
+					budget.check()
+				token, done, line_stats = provider.parse_stream_line(line)
+				stats = line_stats or stats
+				text = detector.feed(token) if token else ""
+				if text:
+					yield text
+				if done or detector.stopped:
+					break
+		
+		remainder = detector.flush()
+		if remainder:
+			yield remainder
+		self._record_usage(prompt, detector.text, stats)
+	
+	async def _astream_tokens(self, prompt: str, stop: List[str] = None, run_manager: AsyncCallbackManagerForLLMRun = None, schema: dict = None) -> AsyncIterator[GenerationChunk]:
+		self._begin_call()
+		async for token in resilient_llm.astream(lambda endpoint: self._astream_endpoint(endpoint, prompt, stop, schema)):
+			chunk = GenerationChunk(text=token)
+			if run_manager:
+				await run_manager.on_llm_new_token(token, chunk=chunk)
+			yield chunk
+	
+	async def _astream(
+		self,
+		prompt: str,
+		stop: List[str] = None,
+		run_manager: AsyncCallbackManagerForLLMRun = None,
+		**kwargs
+	) -> AsyncIterator[GenerationChunk]:
+		request_key, schema, cached = self._lookup(prompt, stop, kwargs)
+		if cached is not None:
+			chunk = GenerationChunk(text=cached)
+			if run_manager:
+				await run_manager.on_llm_new_token(cached, chunk=chunk)
+			yield chunk
+			return
+		
+		completion = ""
+		async for chunk in self._astream_tokens(prompt, stop, run_manager, schema):
+			completion += chunk.text
+			yield chunk
+		
+		self._store(request_key, completion)
 
 
-def get_llm():
-	"""Get the configured LLM instance"""
-	return CustomLLM()
+def get_llm(callbacks: List[BaseCallbackHandler] = None):
+	"""Get the configured LLM instance
+	
+	[REPLAY] mode = record wraps the model so every call is written to a
+	transcript; mode = replay serves a transcript instead of a model server.
+	"""
+	mode = config.get('REPLAY', 'mode', fallback='off')
+	path = config.get('REPLAY', 'path', fallback='transcripts/session.jsonl')
+	
+	if mode == 'replay':
+		return ReplayLLM(
+			transcript=Transcript(path),
+			latency_scale=config.getfloat('REPLAY', 'latency_scale', fallback=0.0),
+			strict=config.getboolean('REPLAY', 'strict', fallback=True),
+			callbacks=callbacks
+		)
+	
+	streaming = config.getboolean('LLM', 'stream', fallback=False) or bool(callbacks)
+	llm = CustomLLM(streaming=streaming, callbacks=callbacks)
+	
+	if mode == 'record':
+		store_prompts = config.getboolean('REPLAY', 'store_prompts', fallback=True)
+		return RecordingLLM(inner=llm, transcript=Transcript(path, store_prompts), callbacks=callbacks)
+	return llm
+
+
+def get_compactor(llm):
+	"""Get the dependency-context compactor
+	
+	[CONTEXT] summary_model picks a separate (smaller) model for summaries;
+	otherwise, and when replaying, the main LLM summarizes.
+	"""
+	summary_model = config.get('CONTEXT', 'summary_model', fallback='')
+	if summary_model and config.get('REPLAY', 'mode', fallback='off') != 'replay':
+		summary_llm = CustomLLM(model=summary_model)
+	else:
+		summary_llm = llm
+	return ContextCompactor.from_config(config, llm=summary_llm)
 
 
 # Global agent instance
 agent = None
 orchestrator = None
 
+# Per-session orchestrators sharing the LLM client, browser and caches of the global one
+session_manager = None
 
-def initialize_agent():
-	"""Initialize the multi-agent orchestrator"""
-	global agent, orchestrator
+
+def initialize_agent(callbacks: List[BaseCallbackHandler] = None):
+	"""Initialize the multi-agent orchestrator
+	
+	Passing callbacks turns on token streaming and forwards every generated
+	token to them as it arrives.
+	"""
+	global agent, orchestrator, session_manager
 	
 	print("🚀 Initializing Multi-Agent System...")
 	
+	# Replayed runs never reach a model server, so it is neither warmed up nor health checked
+	if config.get('REPLAY', 'mode', fallback='off') != 'replay':
+		provider_pool.start_health_checks()
+		
+		# Load the models before the first query needs them
+		if model_warmer is not None:
+			print("🔥 Warming up models...")
+			model_warmer.start(blocking=config.getboolean('WARMUP', 'blocking', fallback=False))
+	
 	# Get LLM
-	llm = get_llm()
+	llm = get_llm(callbacks)
 	
 	# Create browser driver if enabled
 	browser_driver = None
@@ -142,9 +535,25 @@ def initialize_agent():
 			print(f"⚠️ Browser automation disabled: {e}")
 	
 	# Create orchestrator
-	orchestrator = MultiAgentOrchestrator(llm, browser_driver)
+	orchestrator = MultiAgentOrchestrator(
+		llm,
+		browser_driver,
+		prompt_budget=prompt_budget,
+		max_parallel_tasks=config.getint('AGENT', 'max_parallel_tasks', fallback=4),
+		stream_plan=config.getboolean('AGENT', 'stream_plan', fallback=True),
+		constrained_plan=config.getboolean('AGENT', 'constrained_plan', fallback=True),
+		plan_cache=plan_cache,
+		compactor=get_compactor(llm),
+		checkpoints=checkpoints,
+		answer_cache=answer_cache,
+		max_agent_iterations=config.getint('AGENT', 'max_iterations', fallback=5),
+		run_budget=run_budget
+	)
 	agent = orchestrator
 	
+	# Sessions get clones: their own logs, results and memories, sharing the LLM, browser and caches
+	session_manager = SessionManager.from_config(config, orchestrator.clone)
+	
 	print("✅ Multi-Agent System ready!")
 	print("   - Planner Agent: Handles complex multi-step tasks")
 	print("   - Browser Agent: Web automation and navigation")
@@ -154,26 +563,199 @@ def initialize_agent():
 	print("   - Casual Agent: Conversation and summaries")
 
 
-def run_agent(query: str) -> str:
-	"""Run the agent with a query"""
+def run_agent(query: str, session_id: Optional[str] = None) -> str:
+	"""Run the agent with a query
+	
+	With a session_id the query runs on that session's own orchestrator, so
+	concurrent users do not see or overwrite each other's logs and memories.
+	"""
+	global agent
+	
+	if agent is None:
+		initialize_agent()
+	
+	try:
+		if session_id is None:
+			return agent.run(query)
+		with session_manager.session(session_id) as session_agent:
+			return session_agent.run(query)
+	except Exception as e:
+		return f"Error: {str(e)}"
+
+
+async def arun_agent(query: str, session_id: Optional[str] = None) -> str:
+	"""Async version of run_agent, for callers that already run an event loop
+	
+	Routing, planning and agent steps all run as coroutines. An orchestrator
+	holds the state of one run at a time, so each query runs on its session's
+	orchestrator (one query at a time per session) or, without a session_id,
+	on its own clone of the global one; overlapping queries never share results.
+	"""
+	global agent
+	
+	if agent is None:
+		initialize_agent()
+	
+	try:
+		if session_id is None:
+			return await agent.clone().arun(query)
+		async with session_manager.asession(session_id) as session_agent:
+			return await session_agent.arun(query)
+	except Exception as e:
+		return f"Error: {str(e)}"
+
+
+def resume_run(run_id: str, session_id: Optional[str] = None) -> str:
+	"""Continue a checkpointed run, skipping the tasks that already finished"""
+	global agent
+	
+	if agent is None:
+		initialize_agent()
+	
+	try:
+		if session_id is None:
+			return agent.resume(run_id)
+		with session_manager.session(session_id) as session_agent:
+			return session_agent.resume(run_id)
+	except Exception as e:
+		return f"Error: {str(e)}"
+
+
+def rerun_task(run_id: str, task_id: str, session_id: Optional[str] = None) -> str:
+	"""Re-execute one task of a checkpointed run and everything downstream of it"""
 	global agent
 	
 	if agent is None:
 		initialize_agent()
 	
 	try:
-		result = agent.run(query)
-		return result
+		if session_id is None:
+			return agent.rerun(run_id, task_id)
+		with session_manager.session(session_id) as session_agent:
+			return session_agent.rerun(run_id, task_id)
 	except Exception as e:
 		return f"Error: {str(e)}"
 
 
-def get_thinking_logs():
-	"""Get thinking logs from the orchestrator"""
+def invalidate_answers(query: Optional[str] = None, route: Optional[str] = None) -> int:
+	"""Drop cached answers for a query and/or route (everything when neither is given)"""
+	if answer_cache is None:
+		return 0
+	return answer_cache.invalidate(query, route)
+
+
+def end_session(session_id: str) -> bool:
+	"""Forget a session's logs, results and conversation memory"""
+	if session_manager is None:
+		return False
+	return session_manager.close(session_id)
+
+
+def read_batch_file(path: str) -> List[dict]:
+	"""Queries of a JSONL batch file: {"id": ..., "query": ...} per line, or plain strings (id = line number)
+	
+	A line that is not valid JSON, or neither an object nor a string, becomes
+	an item with an "error", which run_batch reports instead of running.
+	"""
+	items = []
+	with open(path, encoding='utf-8') as batch_file:
+		for line_number, line in enumerate(batch_file, 1):
+			line = line.strip()
+			if not line:
+				continue
+			try:
+				item = json.loads(line)
+			except ValueError as e:
+				item = {"error": f"Invalid batch line: {e}"}
+			if isinstance(item, str):
+				item = {"query": item}
+			elif not isinstance(item, dict):
+				item = {"error": f"Invalid batch line: expected an object or a string, got {type(item).__name__}"}
+			item.setdefault("id", line_number)
+			items.append(item)
+	return items
+
+
+def answered_ids(path: str) -> set:
+	"""Ids already answered in a batch output file; errors and truncated last lines do not count"""
+	if not os.path.exists(path):
+		return set()
+	answered = set()
+	with open(path, encoding='utf-8') as out_file:
+		for line in out_file:
+			try:
+				record = json.loads(line)
+			except ValueError:
+				continue
+			if "answer" in record:
+				answered.add(str(record["id"]))
+	return answered
+
+
+def run_batch_file(in_path: str, out_path: str, concurrency: int = 4) -> dict:
+	"""Answer every query of a JSONL file, appending one JSON line per result as it completes
+	
+	Ids already answered in out_path are skipped, so an interrupted batch
+	continues where it stopped; queries that failed are tried again.
+	"""
+	global agent
+	
+	if agent is None:
+		initialize_agent()
+	
+	items = read_batch_file(in_path)
+	done = answered_ids(out_path)
+	pending = [item for item in items if str(item["id"]) not in done]
+	print(f"📦 {len(items)} queries in {in_path}, {len(items) - len(pending)} already answered in {out_path}")
+	
+	failed = 0
+	with open(out_path, 'a', encoding='utf-8') as out_file:
+		def write_result(record: dict):
+			nonlocal failed
+			if "error" in record:
+				failed += 1
+			out_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+			out_file.flush()
+			status = "❌" if "error" in record else "✅"
+			print(f"{status} {record['id']} ({record['seconds']:.1f}s)")
+		
+		agent.run_batch(pending, concurrency=concurrency, on_result=write_result)
+	
+	return {"total": len(items), "skipped": len(items) - len(pending), "ran": len(pending), "failed": failed}
+
+
+def get_readiness():
+	"""Get model warm-up state so the UI can show when the system is hot"""
+	if model_warmer is None:
+		return {"ready": True, "warming": False, "targets": []}
+	return model_warmer.readiness()
+
+
+def get_llm_metrics():
+	"""Get cache and request-coalescing counters for the LLM client"""
+	return {
+		"cache": completion_cache.stats() if completion_cache is not None else None,
+		"coalescing": inflight_requests.stats() if inflight_requests is not None else None,
+		"endpoints": provider_pool.stats(),
+		"resilience": resilient_llm.stats(),
+		"tokens": token_usage.stats(),
+		"prefix_reuse": prefix_reuse.stats(),
+		"plan_cache": plan_cache.stats() if plan_cache is not None else None,
+		"answer_cache": answer_cache.stats() if answer_cache is not None else None,
+		"context_compaction": orchestrator.compactor.stats() if orchestrator is not None else None,
+		"sessions": session_manager.stats() if session_manager is not None else None
+	}
+
+
+def get_thinking_logs(session_id: Optional[str] = None):
+	"""Get thinking logs from the orchestrator, or from a session's own one"""
 	global orchestrator
 	
-	if orchestrator is not None:
-		return orchestrator.get_thinking_logs()
+	source = orchestrator
+	if session_id is not None:
+		source = session_manager.peek(session_id) if session_manager is not None else None
+	if source is not None:
+		return source.get_thinking_logs()
 	return {"router": [], "agents": {}}
 
 
@@ -184,10 +766,25 @@ if __name__ != "__main__":
 
 # CLI interface
 if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="LangEntiChain - Multi-Agent CLI")
+	parser.add_argument("--batch", metavar="IN_JSONL", help="Answer every query of a JSONL file instead of chatting")
+	parser.add_argument("--out", metavar="OUT_JSONL", help="Where batch results are appended (default: <IN_JSONL>.out.jsonl)")
+	parser.add_argument("--concurrency", type=int, default=config.getint('AGENT', 'batch_concurrency', fallback=4), help="Queries run at the same time in batch mode")
+	args = parser.parse_args()
+	
+	if args.batch:
+		summary = run_batch_file(args.batch, args.out or f"{os.path.splitext(args.batch)[0]}.out.jsonl", args.concurrency)
+		print(f"📦 Batch done: {summary['ran']} run, {summary['skipped']} skipped, {summary['failed']} failed")
+		sys.exit(1 if summary["failed"] else 0)
+	
 	print("🤖 LangEntiChain - Multi-Agent CLI")
-	print("Type 'quit' to exit")
+	print("Type 'quit' to exit, '/resume <run id>' or '/rerun <run id> <task id>' to continue a checkpointed run")
+	print("'/forget [query]' drops the cached answer to a query (or every cached answer)")
 	print()
 	
+	# Stream tokens to the terminal as the model generates them
+	initialize_agent(callbacks=[StreamingStdOutCallbackHandler()])
+	
 	while True:
 		query = input("You: ").strip()
 		
@@ -197,7 +794,16 @@ if __name__ == "__main__":
 		if not query:
 			continue
 		
-		print("\nAgent: ", end="", flush=True)
-		response = run_agent(query)
-		print(response)
+		print()
+		command = query.split()
+		if command[0] == '/resume' and len(command) == 2:
+			response = resume_run(command[1])
+		elif command[0] == '/rerun' and len(command) == 3:
+			response = rerun_task(command[1], command[2])
+		elif command[0] == '/forget':
+			forgotten_query = query[len('/forget'):].strip() or None
+			response = f"Forgot {invalidate_answers(forgotten_query)} cached answer(s)"
+		else:
+			response = run_agent(query)
+		print(f"\n\nAgent: {response}")
 		print()
@@ -2,96 +2,254 @@
 Multi-Agent System with adaptive routing and thinking visualization
 """
 
-import json
-import re
-from typing import Dict, List, Any
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Union
 from langchain_core.language_models.llms import LLM
 from langchain.schema import OutputParserException
 
 # Import our refactored modules
 from routing import AgentRouter
-from core import AgentThinkingLog, TaskPlan
+from core import (
+    AgentThinkingLog, TaskPlan, TaskScheduler, PlanValidationError, PlanCache, ContextCompactor,
+    IncrementalPlanParser, PlanStreamError, PlanParseError, parse_plan_text, plan_json_schema,
+    CheckpointStore, AnswerCache, build_dependency_graph
+)
+from core.async_wait import AsyncLock
+from core.checkpoint import RUN_COMPLETED, RUN_FAILED
 from agents import create_planner_prompt, create_specialist_agents
+from backends.budget import BudgetExceeded, RunBudget
+from backends.tokens import PromptBudget, estimate_tokens, truncate_to_tokens
 from browser_tool import create_browser_driver
 
 
 class MultiAgentOrchestrator:
     """Main orchestrator for the multi-agent system"""
     
-    def __init__(self, llm: LLM, browser_driver=None):
+    def __init__(
+        self,
+        llm: LLM,
+        browser_driver=None,
+        prompt_budget: PromptBudget = None,
+        max_parallel_tasks: int = 4,
+        stream_plan: bool = True,
+        constrained_plan: bool = True,
+        plan_cache: PlanCache = None,
+        compactor: ContextCompactor = None,
+        checkpoints: CheckpointStore = None,
+        answer_cache: AnswerCache = None,
+        max_agent_iterations: int = 5,
+        run_budget: RunBudget = None,
+        browser_lock: AsyncLock = None
+    ):
         self.llm = llm
         self.browser_driver = browser_driver
+        # Held while a browser task or conversation drives the driver; clones share it
+        self.browser_lock = browser_lock or AsyncLock()
+        self.prompt_budget = prompt_budget or PromptBudget()
+        self.max_parallel_tasks = max_parallel_tasks
+        self.max_agent_iterations = max_agent_iterations
+        self.constrained_plan = constrained_plan
         self.thinking_log = AgentThinkingLog()
-        self.agents = create_specialist_agents(llm, self.thinking_log, browser_driver)
+        # One executor pool per agent type, sized so every parallel task can get its own executor
+        self.agents = create_specialist_agents(
+            llm, self.thinking_log, browser_driver, self.prompt_budget, max_parallel_tasks, max_agent_iterations,
+            on_side_effect=self._side_effect, browser_lock=self.browser_lock
+        )
         self.router = AgentRouter(self.agents)
         self.planner_prompt = create_planner_prompt()
+        self.scheduler = TaskScheduler(max_parallel_tasks)
+        self.stream_plan = stream_plan
+        # Extra LLM call arguments for planning: the backend constrains decoding to the plan schema
+        self.plan_kwargs = {"response_schema": plan_json_schema(self.agents)} if constrained_plan else {}
+        self.plan_cache = plan_cache
+        self.compactor = compactor or ContextCompactor()
+        self.checkpoints = checkpoints
+        # Final answers of earlier queries, shared by every session (None when disabled)
+        self.answer_cache = answer_cache
+        # Limits every run starts with (None = unbounded); self.budget is the current run's
+        self.run_budget = run_budget
+        self.budget = None
+        self.run_id = None
         self.task_results = {}
+        self.failed_tasks = set()
+        # Why the current run could not answer (planning failed, budget ran out), returned as its answer
+        self.run_error = None
+        # Tools that changed something during the current run; such runs are never answered from cache
+        self.side_effects = []
+        # Answers of routes that read this orchestrator's conversation memory are cached for it alone
+        self.answer_scope = uuid.uuid4().hex
+    
+    def clone(self) -> "MultiAgentOrchestrator":
+        """
+        A new orchestrator with its own logs, results and agent memories that
+        shares this one's LLM, browser, caches and checkpoint store.
+        """
+        return MultiAgentOrchestrator(
+            self.llm,
+            self.browser_driver,
+            prompt_budget=self.prompt_budget,
+            max_parallel_tasks=self.max_parallel_tasks,
+            stream_plan=self.stream_plan,
+            constrained_plan=self.constrained_plan,
+            plan_cache=self.plan_cache,
+            compactor=self.compactor,
+            checkpoints=self.checkpoints,
+            answer_cache=self.answer_cache,
+            max_agent_iterations=self.max_agent_iterations,
+            run_budget=self.run_budget,
+            browser_lock=self.browser_lock
+        )
     
     def get_thinking_logs(self) -> Dict[str, Any]:
         """Get all thinking logs for UI display"""
         return {
             "router": self.router.get_thinking_log(),
-            "agents": self.thinking_log.get_logs()
+            "agents": self.thinking_log.get_logs(),
+            "budget": self.get_budget_report()
         }
     
+    def memory_footprint(self) -> int:
+        """Rough size in bytes of the text this orchestrator holds: logs, results and agent memories"""
+        texts = list(self.task_results.values())
+        texts += [entry["message"] for entry in self.router.get_thinking_log()]
+        texts += [entry["message"] for entries in list(self.thinking_log.get_logs().values()) for entry in entries]
+        for pool in self.agents.values():
+            for executor in pool.executors():
+                chat_memory = getattr(executor.memory, "chat_memory", None)
+                texts += [str(message.content) for message in getattr(chat_memory, "messages", [])]
+        return sum(len(text) for text in texts if isinstance(text, str))
+    
     def parse_plan(self, plan_text: str) -> List[TaskPlan]:
-        """Parse the JSON plan from LLM output"""
+        """Parse the JSON plan from LLM output, repairing common JSON mistakes"""
         try:
-            # Extract JSON from the response
-            json_match = re.search(r'```json\s*(.*)\s*```', plan_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-            else:
-                # Try to find JSON without code blocks
-                json_str = plan_text
-            
-            plan_data = json.loads(json_str)
-            tasks = []
-            
-            for task_dict in plan_data.get("plan", []):
-                task = TaskPlan(
-                    agent=task_dict["agent"].lower(),
-                    id=task_dict["id"],
-                    need=task_dict.get("need", []),
-                    task=task_dict["task"]
-                )
-                tasks.append(task)
-            
-            return tasks
-        except Exception as e:
+            return parse_plan_text(plan_text, self.agents)
+        except PlanParseError as e:
             raise OutputParserException(f"Failed to parse plan: {str(e)}")
     
+    def _start_task(self, task: TaskPlan):
+        # Start logging for this agent
+        self.thinking_log.start_agent(task.agent.lower())
+        self.thinking_log.log(f"Starting task: {task.task[:100]}...", "start")
+    
+    def _dependency_budget(self, task: TaskPlan) -> int:
+        # Each dependency gets an equal share of the context budget, capped per dependency by the compactor
+        return self.prompt_budget.context_tokens // len(task.need)
+    
+    def _log_compaction(self, dep_id: str, result: str, compacted: str):
+        if compacted is not result:
+            self.thinking_log.log(
+                f"Compacted result of task {dep_id} from ~{estimate_tokens(result)} to ~{estimate_tokens(compacted)} tokens ({self.compactor.mode})",
+                "info"
+            )
+    
+    def _compact_dependencies(self, task: TaskPlan) -> Dict[str, str]:
+        """Results of the task's dependencies, each compacted to its share of the budget"""
+        if not task.need:
+            return {}
+        self.thinking_log.log(f"Gathering context from tasks: {task.need}", "info")
+        budget = self._dependency_budget(task)
+        compacted = {}
+        for dep_id in task.need:
+            if dep_id in self.task_results:
+                result = self.task_results[dep_id]
+                compacted[dep_id] = self.compactor.compact(dep_id, result, task.task, budget)
+                self._log_compaction(dep_id, result, compacted[dep_id])
+        return compacted
+    
+    async def _acompact_dependencies(self, task: TaskPlan) -> Dict[str, str]:
+        """Async version of _compact_dependencies"""
+        if not task.need:
+            return {}
+        self.thinking_log.log(f"Gathering context from tasks: {task.need}", "info")
+        budget = self._dependency_budget(task)
+        compacted = {}
+        for dep_id in task.need:
+            if dep_id in self.task_results:
+                result = self.task_results[dep_id]
+                compacted[dep_id] = await self.compactor.acompact(dep_id, result, task.task, budget)
+                self._log_compaction(dep_id, result, compacted[dep_id])
+        return compacted
+    
+    def _task_prompt(self, task: TaskPlan, dependency_results: Dict[str, str]) -> str:
+        """Build the task's prompt from its text and its (compacted) dependency results"""
+        if dependency_results:
+            context_parts = [f"Result from task {dep_id}: {result}" for dep_id, result in dependency_results.items()]
+            context = "Context from previous tasks:\n" + "\n".join(context_parts) + "\n\n"
+            self.thinking_log.log("Context prepared", "info")
+        else:
+            context = ""
+        
+        task_text = task.task
+        if estimate_tokens(task_text) > self.prompt_budget.task_tokens:
+            self.thinking_log.log(f"Truncating task description to ~{self.prompt_budget.task_tokens} tokens", "warning")
+            task_text = truncate_to_tokens(task_text, self.prompt_budget.task_tokens)
+        return context + task_text
+    
+    def _new_budget(self, budget: RunBudget = None) -> Optional[RunBudget]:
+        return budget or (self.run_budget.renew() if self.run_budget is not None else None)
+    
+    @contextmanager
+    def _budget_scope(self):
+        """Charge every LLM call made in this context to the current run's budget"""
+        if self.budget is None:
+            yield
+        else:
+            with self.budget.activate():
+                yield
+    
+    @contextmanager
+    def _track_budget(self, task: TaskPlan):
+        """Attribute the task's LLM calls and tokens to it and log what it used"""
+        if self.budget is None:
+            yield
+            return
+        with self.budget.track(task.id) as usage:
+            yield
+        self.thinking_log.log(
+            f"Budget used: {usage['llm_calls']} LLM calls, {usage['tokens']} tokens, {usage['seconds']:.1f}s",
+            "info"
+        )
+    
+    def _budget_exhausted(self) -> Optional[str]:
+        return self.budget.exhausted if self.budget is not None else None
+    
+    def _prepare_executor(self, executor):
+        # The agent loop itself stops at the deadline, not only its LLM calls
+        executor.max_execution_time = self.budget.remaining_seconds() if self.budget is not None else None
+        return executor
+    
+    def get_budget_report(self) -> Optional[Dict[str, Any]]:
+        """Consumption of the current run's budget, in total and per task"""
+        return self.budget.report() if self.budget is not None else None
+    
+    def _task_failed(self, task: TaskPlan, error_msg: str) -> str:
+        # The error message still becomes the task's result, but the checkpoint marks it failed
+        self.failed_tasks.add(task.id)
+        self.thinking_log.log(error_msg, "error")
+        return error_msg
+    
     def execute_task(self, task: TaskPlan) -> str:
         """Execute a single task with the appropriate agent"""
         agent_name = task.agent.lower()
-        
-        # Start logging for this agent
-        self.thinking_log.start_agent(agent_name)
-        self.thinking_log.log(f"Starting task: {task.task[:100]}...", "start")
+        self._start_task(task)
         
         if agent_name not in self.agents:
-            error_msg = f"Error: Unknown agent '{agent_name}'"
-            self.thinking_log.log(error_msg, "error")
-            return error_msg
+            return self._task_failed(task, f"Error: Unknown agent '{agent_name}'")
+        
+        # Short-circuit once the run is out of budget; the result says why
+        exhausted = self._budget_exhausted()
+        if exhausted is not None:
+            return self._task_failed(task, f"Skipped: run budget exhausted ({exhausted})")
         
         # Prepare context from dependencies
-        if task.need:
-            self.thinking_log.log(f"Gathering context from tasks: {task.need}", "info")
-            context_parts = []
-            for dep_id in task.need:
-                if dep_id in self.task_results:
-                    context_parts.append(f"Result from task {dep_id}: {self.task_results[dep_id]}")
-            if context_parts:
-                context = "Context from previous tasks:\n" + "\n".join(context_parts) + "\n\n"
-                self.thinking_log.log("Context prepared", "info")
-            else:
-                context = ""
-        else:
-            context = ""
+        full_prompt = self._task_prompt(task, self._compact_dependencies(task))
         
         # Execute the task
-        full_prompt = context + task.task
-        
         try:
             self.thinking_log.log("Executing task", "action")
             
@@ -101,96 +259,595 @@ class MultiAgentOrchestrator:
                 self.thinking_log.log("Code generation complete", "success")
                 return code_result
             else:
-                result = self.agents[agent_name].invoke({"input": full_prompt})
+                with self.agents[agent_name].checkout() as executor:
+                    result = self._prepare_executor(executor).invoke({"input": full_prompt})
                 self.thinking_log.log("Task execution complete", "success")
                 return result.get('output', str(result))
                 
         except Exception as e:
-            error_msg = f"Error executing task: {str(e)}"
-            self.thinking_log.log(error_msg, "error")
-            return error_msg
+            return self._task_failed(task, f"Error executing task: {str(e)}")
     
-    def generate_code(self, prompt: str) -> str:
-        """Generate code using the LLM directly"""
+    async def aexecute_task(self, task: TaskPlan) -> str:
+        """Async version of execute_task"""
+        agent_name = task.agent.lower()
+        self._start_task(task)
+        
+        if agent_name not in self.agents:
+            return self._task_failed(task, f"Error: Unknown agent '{agent_name}'")
+        
+        # Short-circuit once the run is out of budget; the result says why
+        exhausted = self._budget_exhausted()
+        if exhausted is not None:
+            return self._task_failed(task, f"Skipped: run budget exhausted ({exhausted})")
+        
+        full_prompt = self._task_prompt(task, await self._acompact_dependencies(task))
+        
+        try:
+            self.thinking_log.log("Executing task", "action")
+            
+            if agent_name == "coder":
+                code_result = await self.agenerate_code(full_prompt)
+                self.thinking_log.log("Code generation complete", "success")
+                return code_result
+            else:
+                async with self.agents[agent_name].acheckout() as executor:
+                    result = await self._prepare_executor(executor).ainvoke({"input": full_prompt})
+                self.thinking_log.log("Task execution complete", "success")
+                return result.get('output', str(result))
+                
+        except Exception as e:
+            return self._task_failed(task, f"Error executing task: {str(e)}")
+    
+    def _code_prompt(self, prompt: str) -> str:
+        """Wrap a request in the code generation prompt"""
         self.thinking_log.log("Preparing code generation prompt", "think")
         
-        code_prompt = f"""Write complete, working code for the following request:
+        return f"""Write complete, working code for the following request:
 
 {prompt}
 
 Provide the full code implementation with detailed comments explaining each section."""
+    
+    def generate_code(self, prompt: str) -> str:
+        """Generate code using the LLM directly"""
+        code_prompt = self._code_prompt(prompt)
         
         self.thinking_log.log("Generating code with LLM", "action")
-        response = self.llm._call(code_prompt)
+        response = self.llm.invoke(code_prompt)
         
         self.thinking_log.log("Code generation complete", "success")
         return response
     
-    def execute_plan(self, tasks: List[TaskPlan]) -> str:
-        """Execute all tasks in the plan"""
-        results = []
+    async def agenerate_code(self, prompt: str) -> str:
+        """Async version of generate_code"""
+        code_prompt = self._code_prompt(prompt)
         
-        for task in tasks:
-            print(f"\n📋 Executing Task {task.id}: {task.agent} agent")
-            print(f"   Task: {task.task[:100]}...")
-            
-            result = self.execute_task(task)
-            self.task_results[task.id] = result
-            results.append(f"Task {task.id} ({task.agent}): {result}")
-            
-            print(f"   ✅ Completed")
+        self.thinking_log.log("Generating code with LLM", "action")
+        response = await self.llm.ainvoke(code_prompt)
+        
+        self.thinking_log.log("Code generation complete", "success")
+        return response
+    
+    def _run_task(self, task: TaskPlan) -> str:
+        print(f"\n📋 Executing Task {task.id}: {task.agent} agent")
+        print(f"   Task: {task.task[:100]}...")
+        if self._checkpointing:
+            self.checkpoints.task_started(self.run_id, task)
+        with self._track_budget(task):
+            return self.execute_task(task)
+    
+    async def _arun_task(self, task: TaskPlan) -> str:
+        print(f"\n📋 Executing Task {task.id}: {task.agent} agent")
+        print(f"   Task: {task.task[:100]}...")
+        if self._checkpointing:
+            self.checkpoints.task_started(self.run_id, task)
+        with self._track_budget(task):
+            return await self.aexecute_task(task)
+    
+    def _task_done(self, task: TaskPlan, result: str):
+        # Stored before any dependent task is started
+        self.task_results[task.id] = result
+        if self._checkpointing:
+            self.checkpoints.task_finished(self.run_id, task.id, result, failed=task.id in self.failed_tasks)
+        print(f"   ✅ Task {task.id} completed")
+    
+    def _summarize(self, tasks: List[TaskPlan]) -> str:
+        """Combine task results, in plan order whatever order they finished in"""
+        results = [f"Task {task.id} ({task.agent}): {self.task_results[task.id]}" for task in tasks]
         
         # Create final summary
         self.thinking_log.start_agent("summary")
         self.thinking_log.log("Creating final summary", "action")
         summary = "\n\n".join(results)
+        exhausted = self._budget_exhausted()
+        if exhausted is not None and self.failed_tasks:
+            summary += f"\n\nRun budget exhausted ({exhausted}); the results above are partial."
         self.thinking_log.log("Summary complete", "success")
         
         return summary
     
-    def run(self, query: str) -> str:
-        """Main entry point - route and execute the query"""
-        # Clear previous logs
+    def execute_plan(self, tasks: List[TaskPlan], completed: Dict[str, str] = None, budget: RunBudget = None) -> str:
+        """
+        Execute all tasks in the plan, running independent tasks in parallel.
+        
+        Tasks in completed (e.g. restored from a checkpoint) are not run again.
+        A budget replaces the current run's; once it is exhausted the remaining
+        tasks are skipped and the summary holds the partial results.
+        """
+        if budget is not None:
+            self.budget = budget
+        with self._budget_scope():
+            self.scheduler.run(tasks, self._run_task, on_complete=self._task_done, completed=completed)
+        return self._summarize(tasks)
+    
+    async def aexecute_plan(self, tasks: List[TaskPlan], completed: Dict[str, str] = None, budget: RunBudget = None) -> str:
+        """Async version of execute_plan: independent tasks run concurrently on the event loop"""
+        if budget is not None:
+            self.budget = budget
+        with self._budget_scope():
+            await self.scheduler.arun(tasks, self._arun_task, on_complete=self._task_done, completed=completed)
+        return self._summarize(tasks)
+    
+    def _dispatch_streamed_tasks(self, parser: IncrementalPlanParser, plan_run, chunk: str):
+        for task in parser.feed(chunk):
+            self.thinking_log.log(f"Task {task.id} planned for {task.agent} agent, dispatching", "info")
+            plan_run.add(task)
+    
+    def _finish_streamed_plan(self, parser: IncrementalPlanParser, plan_run) -> List[TaskPlan]:
+        """Return the full plan once the planner is done, falling back to parse_plan for malformed output"""
+        try:
+            tasks = parser.close()
+        except PlanStreamError:
+            # Repair the full text and add whatever was not dispatched while streaming
+            dispatched = {task.id for task in parser.tasks}
+            missing = [task for task in self.parse_plan(parser.text) if task.id not in dispatched]
+            for task in missing:
+                plan_run.add(task)
+            tasks = parser.tasks + missing
+        
+        # Dependencies on tasks the planner never wrote would block their tasks forever
+        for task_id, dep in plan_run.prune_dependencies():
+            self.thinking_log.log(f"Task {task_id} needs unknown task {dep}, dropping that dependency", "info")
+        
+        print(f"\n📋 Created plan with {len(tasks)} tasks")
+        self.thinking_log.log(f"Plan created with {len(tasks)} tasks", "success")
+        return tasks
+    
+    def _cached_plan(self, query: str) -> Optional[List[TaskPlan]]:
+        """Look up a plan made earlier for an equivalent query"""
+        if self.plan_cache is None:
+            return None
+        tasks = self.plan_cache.get(query)
+        if tasks is not None:
+            print(f"\n♻️ Reusing cached plan with {len(tasks)} tasks")
+            self.thinking_log.log(f"Reusing cached plan with {len(tasks)} tasks, skipping the planner", "success")
+        return tasks
+    
+    def _plan_ready(self, query: str, tasks: List[TaskPlan]):
+        """Cache a newly made plan for equivalent queries and checkpoint it"""
+        if self.plan_cache is not None:
+            self.plan_cache.put(query, tasks)
+        self._checkpoint_plan(tasks)
+    
+    @property
+    def _checkpointing(self) -> bool:
+        return self.checkpoints is not None and self.run_id is not None
+    
+    def _begin_checkpoint(self, query: str):
+        self.run_id = self.checkpoints.start_run(query) if self.checkpoints is not None else None
+        if self.run_id:
+            print(f"💾 Checkpointing as run {self.run_id}")
+            self.thinking_log.log(f"Checkpointing as run {self.run_id}", "info")
+    
+    def _checkpoint_plan(self, tasks: List[TaskPlan]):
+        if self._checkpointing:
+            self.checkpoints.save_plan(self.run_id, tasks)
+    
+    def _finish_checkpoint(self, summary: str = None):
+        """Mark the run completed, or failed when it raised, produced no results or had a failed task"""
+        if self._checkpointing:
+            succeeded = summary is not None and self.task_results and not self.failed_tasks
+            self.checkpoints.finish_run(self.run_id, RUN_COMPLETED if succeeded else RUN_FAILED, summary)
+    
+    def execute_streamed_plan(self, query: str) -> str:
+        """
+        Stream the plan from the planner and execute it as it arrives.
+        
+        Each task starts as soon as its JSON object and all of its
+        dependencies are complete, while the planner writes the rest.
+        """
+        self.thinking_log.log("Streaming execution plan", "action")
+        parser = IncrementalPlanParser(self.agents)
+        plan_run = self.scheduler.start(self._run_task, on_complete=self._task_done)
+        
+        try:
+            for chunk in self.llm.stream(self.planner_prompt.format(input=query), **self.plan_kwargs):
+                self._dispatch_streamed_tasks(parser, plan_run, chunk)
+            tasks = self._finish_streamed_plan(parser, plan_run)
+            self._plan_ready(query, tasks)
+        except BaseException:
+            plan_run.cancel()
+            raise
+        
+        plan_run.close()
+        return self._summarize(tasks)
+    
+    async def aexecute_streamed_plan(self, query: str) -> str:
+        """Async version of execute_streamed_plan"""
+        self.thinking_log.log("Streaming execution plan", "action")
+        parser = IncrementalPlanParser(self.agents)
+        plan_run = self.scheduler.astart(self._arun_task, on_complete=self._task_done)
+        
+        try:
+            async for chunk in self.llm.astream(self.planner_prompt.format(input=query), **self.plan_kwargs):
+                self._dispatch_streamed_tasks(parser, plan_run, chunk)
+            tasks = self._finish_streamed_plan(parser, plan_run)
+            self._plan_ready(query, tasks)
+        except BaseException:
+            plan_run.cancel()
+            raise
+        
+        await plan_run.close()
+        return self._summarize(tasks)
+    
+    def _plan_failed(self, error: Exception) -> str:
+        """The answer to a query whose plan could not be made or validated"""
+        self.run_error = f"Failed to create plan: {str(error)}"
+        self.thinking_log.log(self.run_error, "error")
+        return self.run_error
+    
+    def _planned_tasks(self, query: str, plan_response: str) -> List[TaskPlan]:
+        """Parse a generated plan, then cache and checkpoint it"""
+        self.thinking_log.log("Parsing execution plan", "action")
+        tasks = self.parse_plan(plan_response)
+        print(f"\n📋 Created plan with {len(tasks)} tasks")
+        self.thinking_log.log(f"Plan created with {len(tasks)} tasks", "success")
+        self._plan_ready(query, tasks)
+        return tasks
+    
+    def _plan_and_execute(self, query: str) -> str:
+        """Get a plan (cached, streamed or generated) and execute it"""
+        cached_tasks = self._cached_plan(query)
+        try:
+            if cached_tasks is not None:
+                self._checkpoint_plan(cached_tasks)
+                return self.execute_plan(cached_tasks)
+            if self.stream_plan:
+                return self.execute_streamed_plan(query)
+            plan_response = self.llm.invoke(self.planner_prompt.format(input=query), **self.plan_kwargs)
+            return self.execute_plan(self._planned_tasks(query, plan_response))
+        except (OutputParserException, PlanValidationError) as e:
+            return self._plan_failed(e)
+    
+    async def _aplan_and_execute(self, query: str) -> str:
+        """Async version of _plan_and_execute"""
+        cached_tasks = self._cached_plan(query)
+        try:
+            if cached_tasks is not None:
+                self._checkpoint_plan(cached_tasks)
+                return await self.aexecute_plan(cached_tasks)
+            if self.stream_plan:
+                return await self.aexecute_streamed_plan(query)
+            plan_response = await self.llm.ainvoke(self.planner_prompt.format(input=query), **self.plan_kwargs)
+            return await self.aexecute_plan(self._planned_tasks(query, plan_response))
+        except (OutputParserException, PlanValidationError) as e:
+            return self._plan_failed(e)
+    
+    def _begin_run(self, query: str, budget: RunBudget = None) -> str:
+        """Reset the per-run state and route the query (pattern matching only, no LLM call)"""
         self.thinking_log.clear()
         self.task_results = {}
+        self.failed_tasks = set()
+        self.side_effects = []
+        self.run_error = None
+        self.run_id = None
+        self.budget = self._new_budget(budget)
+        return self.router.route(query)
+    
+    def _answer_options(self, route: str) -> Dict[str, Any]:
+        """How the answer cache stores and shares answers of this route"""
+        return {
+            "cacheable": lambda answer: self._answer_cacheable(route),
+            "scope": self._answer_scope_for(route)
+        }
+    
+    def _answered(self, route: str, answer: str, reused: bool) -> str:
+        if reused:
+            self._log_reused_answer(route)
+        return answer
+    
+    def run(self, query: str, budget: RunBudget = None) -> str:
+        """Main entry point - route and execute the query
         
-        # Route the query
-        route = self.router.route(query)
+        budget (default: a fresh copy of run_budget) bounds the run's wall
+        time, LLM calls and tokens; get_budget_report() shows what it used.
+        """
+        route = self._begin_run(query, budget)
+        with self._budget_scope():
+            if self.answer_cache is None:
+                return self._execute_route(query, route)
+            answer, reused = self.answer_cache.get_or_compute(
+                query, route, lambda: self._execute_route(query, route), **self._answer_options(route)
+            )
+        return self._answered(route, answer, reused)
+    
+    async def arun(self, query: str, budget: RunBudget = None) -> str:
+        """Async entry point - same as run, but planning and agents run as coroutines
         
-        if route == "planner":
-            print("🧠 Complex task detected - creating execution plan...")
-            
-            # Log planner thinking
-            self.thinking_log.start_agent("planner")
-            self.thinking_log.log("Analyzing complex query", "think")
-            self.thinking_log.log("Identifying required subtasks", "think")
-            self.thinking_log.log("Determining task dependencies", "think")
-            
-            # Generate plan
-            plan_response = self.llm._call(self.planner_prompt.format(input=query))
-            
-            try:
-                self.thinking_log.log("Parsing execution plan", "action")
-                tasks = self.parse_plan(plan_response)
-                print(f"\n📋 Created plan with {len(tasks)} tasks")
-                self.thinking_log.log(f"Plan created with {len(tasks)} tasks", "success")
-                
-                # Execute plan
-                result = self.execute_plan(tasks)
-                return result
-                
-            except OutputParserException as e:
-                error_msg = f"Failed to create plan: {str(e)}"
-                self.thinking_log.log(error_msg, "error")
-                return error_msg
+        Like run, this resets the orchestrator's per-run state (results, logs,
+        budget), so concurrent queries each need their own clone() or session.
         
+        budget (default: a fresh copy of run_budget) bounds the run's wall
+        time, LLM calls and tokens; get_budget_report() shows what it used.
+        """
+        route = self._begin_run(query, budget)
+        with self._budget_scope():
+            if self.answer_cache is None:
+                return await self._aexecute_route(query, route)
+            answer, reused = await self.answer_cache.aget_or_compute(
+                query, route, lambda: self._aexecute_route(query, route), **self._answer_options(route)
+            )
+        return self._answered(route, answer, reused)
+    
+    @contextmanager
+    def _planned_run(self, query: str) -> Iterator[Dict[str, str]]:
+        """
+        Log and checkpoint a planned run around its body, which stores the
+        answer in outcome["result"]. Running out of budget while planning
+        is not an error: the answer becomes whatever finished.
+        """
+        print("🧠 Complex task detected - creating execution plan...")
+        
+        # Log planner thinking
+        self.thinking_log.start_agent("planner")
+        self.thinking_log.log("Analyzing complex query", "think")
+        self.thinking_log.log("Identifying required subtasks", "think")
+        self.thinking_log.log("Determining task dependencies", "think")
+        
+        self._begin_checkpoint(query)
+        outcome: Dict[str, str] = {}
+        try:
+            yield outcome
+        except BudgetExceeded as e:
+            self._finish_checkpoint()
+            outcome["result"] = self._partial_result(e)
+        except BaseException:
+            self._finish_checkpoint()
+            raise
         else:
-            # Simple task - route directly
-            print(f"🎯 Simple task - routing to {route} agent")
-            
-            # Execute with single agent
-            self.thinking_log.start_agent(route)
-            self.thinking_log.log(f"Executing simple task", "start")
-            
-            result = self.agents[route].invoke({"input": query})
+            self._finish_checkpoint(outcome["result"])
+    
+    def _start_direct(self, route: str):
+        """Log a simple query being handed straight to one agent"""
+        print(f"🎯 Simple task - routing to {route} agent")
+        self.thinking_log.start_agent(route)
+        self.thinking_log.log(f"Executing simple task", "start")
+    
+    def _execute_route(self, query: str, route: str) -> str:
+        """Execute a routed query: plan it, or hand it straight to one agent"""
+        if route != "planner":
+            self._start_direct(route)
+            with self.agents[route].converse() as executor:
+                result = self._prepare_executor(executor).invoke({"input": query})
+            return result.get('output', str(result))
+        with self._planned_run(query) as outcome:
+            outcome["result"] = self._plan_and_execute(query)
+        return outcome["result"]
+    
+    async def _aexecute_route(self, query: str, route: str) -> str:
+        """Async version of _execute_route"""
+        if route != "planner":
+            self._start_direct(route)
+            async with self.agents[route].aconverse() as executor:
+                result = await self._prepare_executor(executor).ainvoke({"input": query})
             return result.get('output', str(result))
+        with self._planned_run(query) as outcome:
+            outcome["result"] = await self._aplan_and_execute(query)
+        return outcome["result"]
+    
+    def _side_effect(self, tool_name: str):
+        self.side_effects.append(tool_name)
+    
+    def _answer_cacheable(self, route: str) -> bool:
+        # Repeating a query that wrote a file or submitted a form must do it again
+        if self.side_effects or self._budget_exhausted() is not None:
+            return False
+        # A planned answer is only reused if its run would be checkpointed as completed
+        return route != "planner" or bool(self.task_results) and not self.failed_tasks
+    
+    def run_failure(self) -> Optional[str]:
+        """
+        Why the last run's answer is not a complete one (its plan failed, a
+        task failed or the budget ran out), or None when it is. Such answers
+        are returned as text, so callers that must tell them apart ask here.
+        """
+        if self.run_error is not None:
+            return self.run_error
+        if self.failed_tasks:
+            return f"Tasks failed: {', '.join(sorted(self.failed_tasks))}"
+        exhausted = self._budget_exhausted()
+        if exhausted is not None:
+            return f"Run budget exhausted: {exhausted}"
+        return None
+    
+    def _answer_scope_for(self, route: str) -> str:
+        """Cache scope of a route's answers: planned tasks start with empty memories, so only they are shared"""
+        return "" if route == "planner" else self.answer_scope
+    
+    def _partial_result(self, error: BudgetExceeded) -> str:
+        """Results of the tasks that finished before the budget ran out"""
+        self.run_error = str(error)
+        self.thinking_log.log(self.run_error, "error")
+        results = [f"Task {task_id}: {result}" for task_id, result in self.task_results.items()]
+        return "\n\n".join([f"{error}; the plan did not finish."] + results)
+    
+    def _log_reused_answer(self, route: str):
+        print(f"♻️ Reusing the answer to an identical {route} query")
+        self.thinking_log.start_agent(route)
+        self.thinking_log.log("Answered from the answer cache (or an identical query in flight)", "success")
+    
+    def _restore_run(self, run_id: str) -> Dict[str, Any]:
+        """Load a checkpointed run and make it the current one"""
+        if self.checkpoints is None:
+            raise ValueError("Checkpointing is disabled")
+        state = self.checkpoints.load_run(run_id)
+        
+        self.thinking_log.clear()
+        self.task_results = dict(state["results"])
+        self.failed_tasks = set()
+        self.run_error = None
+        self.run_id = run_id
+        
+        done, total = len(state["results"]), len(state["tasks"])
+        print(f"💾 Resuming run {run_id}: {done} of {total} tasks already done")
+        self.thinking_log.start_agent("planner")
+        self.thinking_log.log(f"Resuming run {run_id} with {done} of {total} tasks restored from checkpoint", "info")
+        return state
+    
+    def _downstream_tasks(self, run_id: str, task_id: str) -> List[str]:
+        """A task and every task that (transitively) needs it"""
+        dependents = build_dependency_graph(self.checkpoints.load_run(run_id)["tasks"])
+        if task_id not in dependents:
+            raise ValueError(f"Run {run_id} has no task {task_id}")
+        selected, pending = [], [task_id]
+        while pending:
+            current = pending.pop()
+            if current not in selected:
+                selected.append(current)
+                pending.extend(dependents[current])
+        return selected
+    
+    def _continue_run(self, state: Dict[str, Any]) -> str:
+        try:
+            result = self.execute_plan(state["tasks"], completed=state["results"], budget=self._new_budget())
+        except BaseException:
+            self._finish_checkpoint()
+            raise
+        self._finish_checkpoint(result)
+        return result
+    
+    async def _acontinue_run(self, state: Dict[str, Any]) -> str:
+        try:
+            result = await self.aexecute_plan(state["tasks"], completed=state["results"], budget=self._new_budget())
+        except BaseException:
+            self._finish_checkpoint()
+            raise
+        self._finish_checkpoint(result)
+        return result
+    
+    def resume(self, run_id: str) -> str:
+        """Continue a checkpointed run, executing only the tasks that did not finish successfully"""
+        return self._continue_run(self._restore_run(run_id))
+    
+    async def aresume(self, run_id: str) -> str:
+        """Async version of resume"""
+        return await self._acontinue_run(self._restore_run(run_id))
+    
+    def rerun(self, run_id: str, task_id: str) -> str:
+        """Re-execute one task of a checkpointed run and every task downstream of it"""
+        if self.checkpoints is None:
+            raise ValueError("Checkpointing is disabled")
+        self.checkpoints.reset_tasks(run_id, self._downstream_tasks(run_id, task_id))
+        return self.resume(run_id)
+    
+    async def arerun(self, run_id: str, task_id: str) -> str:
+        """Async version of rerun"""
+        if self.checkpoints is None:
+            raise ValueError("Checkpointing is disabled")
+        self.checkpoints.reset_tasks(run_id, self._downstream_tasks(run_id, task_id))
+        return await self.aresume(run_id)
+    
+    def forget_conversations(self):
+        """Clear every agent's conversation memory"""
+        for pool in self.agents.values():
+            pool.forget_conversation()
+    
+    @staticmethod
+    def _batch_job(position: int, item: Any) -> tuple:
+        """(id, query, error) of a batch item; error is None when the item can run"""
+        if isinstance(item, str):
+            return position, item, None
+        if not isinstance(item, dict):
+            return position, None, f"Invalid batch item: expected a query string or an object, got {type(item).__name__}"
+        query_id, query = item.get("id", position), item.get("query")
+        if isinstance(query, str) and query.strip():
+            return query_id, query, None
+        return query_id, query, item.get("error") or 'Invalid batch item: no "query" string'
+    
+    def run_batch(
+        self,
+        queries: Iterable[Union[str, Dict[str, Any]]],
+        concurrency: int = 4,
+        on_result: Callable[[Dict[str, Any]], None] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run many queries concurrently on a pool of worker orchestrators.
+        
+        queries are strings or dicts with a "query" and an optional "id"
+        (default: the position). Each worker is a clone of this orchestrator
+        whose conversation memories are cleared before every query, so runs
+        never share logs or history. on_result receives each record as soon
+        as its query finishes, one at a time; the returned records are in
+        input order. A record has the id, query, answer (or error and
+        whatever partial answer the run returned), seconds, run id and budget
+        report. An item without a query string is not run; its record only
+        has the error (an item may also bring its own "error", e.g. a line
+        that could not be decoded).
+        """
+        jobs = [self._batch_job(position, item) for position, item in enumerate(queries)]
+        if not jobs:
+            return []
+        
+        records: Dict[int, Dict[str, Any]] = {}
+        report_lock = threading.Lock()
+        
+        def report(record: Dict[str, Any]):
+            if on_result:
+                with report_lock:
+                    on_result(record)
+        
+        runnable = []
+        for position, (query_id, query, error) in enumerate(jobs):
+            if error is None:
+                runnable.append(position)
+            else:
+                records[position] = {"id": query_id, "query": query, "error": error, "seconds": 0.0}
+                report(records[position])
+        if not runnable:
+            return [records[position] for position in range(len(jobs))]
+        
+        concurrency = max(1, min(concurrency, len(runnable)))
+        workers = queue.Queue()
+        for _ in range(concurrency):
+            workers.put(self.clone())
+        
+        def run_one(query_id: Any, query: str) -> Dict[str, Any]:
+            worker = workers.get()
+            started = time.time()
+            record = {"id": query_id, "query": query}
+            try:
+                worker.forget_conversations()
+                answer = worker.run(query)
+                failure = worker.run_failure()
+                if failure is None:
+                    record["answer"] = answer
+                else:
+                    # Failures returned as text are errors too, so a resumed batch runs them again
+                    record["error"] = failure
+                    record["partial_answer"] = answer
+            except Exception as e:
+                record["error"] = str(e)
+            finally:
+                record["seconds"] = round(time.time() - started, 3)
+                record["run_id"] = worker.run_id
+                record["budget"] = worker.get_budget_report()
+                workers.put(worker)
+            report(record)
+            return record
+        
+        print(f"📦 Running {len(runnable)} queries, {concurrency} at a time")
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-query") as executor:
+            futures = {executor.submit(run_one, *jobs[position][:2]): position for position in runnable}
+            for future in as_completed(futures):
+                records[futures[future]] = future.result()
+        return [records[position] for position in range(len(jobs))]
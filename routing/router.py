@@ -4,6 +4,7 @@ Simplified version without ML dependencies
 """
 
 import os
+import re
 import time
 from typing import List, Dict, Any, Optional
 import logging
@@ -11,6 +12,43 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Complex task indicators
+COMPLEX_INDICATORS = [
+	" and then ",
+	" after that ",
+	" finally ",
+	" first ",
+	" second ",
+	" next ",
+	" create a report",
+	" analyze ",
+	" compare ",
+	" build a ",
+	" develop ",
+	" research ",
+	" multiple ",
+	" comprehensive ",
+	" detailed ",
+	" full "
+]
+
+# Complex task indicators that are regular expressions
+COMPLEX_PATTERNS = [
+	re.compile(r" find .* and .* and ")
+]
+
+# Several of these in one query means it needs a plan
+ACTION_WORDS = ["search", "create", "write", "read", "find", "analyze", "build", "save", "extract"]
+
+# Keywords of each task type for simple queries
+TASK_KEYWORDS = {
+	"browser": ["navigate", "click", "fill form", "website", "webpage", "url", "browser", "screenshot"],
+	"coder": ["code", "script", "function", "debug", "program", "write a", "create a", "python", "javascript", "html"],
+	"file": ["file", "folder", "directory", "read", "write", "save", "list files", "create a file"],
+	"search": ["search", "find online", "web", "look up", "google", "research online", "what is", "weather"],
+}
+
+
 class AgentRouter:
 	"""
 	Simple keyword-based router for agent selection
@@ -44,41 +82,24 @@ class AgentRouter:
 		
 		query_lower = query.lower()
 		
-		# Complex task indicators
-		complex_indicators = [
-			" and then ",
-			" after that ",
-			" finally ",
-			" first ",
-			" second ",
-			" next ",
-			" create a report",
-			" analyze ",
-			" compare ",
-			" build a ",
-			" develop ",
-			" research ",
-			" find .* and .* and ",
-			" multiple ",
-			" comprehensive ",
-			" detailed ",
-			" full "
-		]
-		
 		# Check for multiple actions
-		action_words = ["search", "create", "write", "read", "find", "analyze", "build", "save", "extract"]
-		action_count = sum(1 for word in action_words if word in query_lower)
+		action_count = sum(1 for word in ACTION_WORDS if word in query_lower)
 		
 		if action_count >= 2:
 			self.log_thinking(f"Multiple actions detected ({action_count})", "info")
 			return "HIGH"
 		
 		# Check for complex indicators
-		for indicator in complex_indicators:
+		for indicator in COMPLEX_INDICATORS:
 			if indicator in query_lower:
 				self.log_thinking(f"Complex indicator found: '{indicator}'", "info")
 				return "HIGH"
 		
+		for pattern in COMPLEX_PATTERNS:
+			if pattern.search(query_lower):
+				self.log_thinking(f"Complex indicator found: '{pattern.pattern}'", "info")
+				return "HIGH"
+		
 		# Check query length (longer queries tend to be more complex)
 		if len(query.split()) > 20:
 			self.log_thinking("Long query detected", "info")
@@ -93,17 +114,9 @@ class AgentRouter:
 		
 		query_lower = query.lower()
 		
-		# Define keyword mappings
-		task_keywords = {
-			"browser": ["navigate", "click", "fill form", "website", "webpage", "url", "browser", "screenshot"],
-			"coder": ["code", "script", "function", "debug", "program", "write a", "create a", "python", "javascript", "html"],
-			"file": ["file", "folder", "directory", "read", "write", "save", "list files", "create a file"],
-			"search": ["search", "find online", "web", "look up", "google", "research online", "what is", "weather"],
-		}
-		
 		# Count keyword matches for each category
 		scores = {}
-		for task_type, keywords in task_keywords.items():
+		for task_type, keywords in TASK_KEYWORDS.items():
 			score = sum(1 for keyword in keywords if keyword in query_lower)
 			if score > 0:
 				scores[task_type] = score
@@ -1,8 +1,9 @@
 import streamlit as st
 import configparser
-from main import run_agent, config, tools_list, get_thinking_logs
+from main import run_agent, config, tools_list, get_thinking_logs, get_llm_metrics, get_readiness, end_session
 import re
 import json
+import uuid
 
 # Page config
 st.set_page_config(
@@ -11,6 +12,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Each browser session gets its own orchestrator state (logs, results, memories)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Custom CSS for better styling and thinking visualization
 st.markdown("""
 <style>
@@ -142,6 +147,14 @@ def display_thinking_logs(logs):
                     agent_html += format_log_entry(entry)
                 agent_html += '</div>'
                 st.markdown(agent_html, unsafe_allow_html=True)
+    
+    # Run budget consumption (per task in the agent logs above)
+    if logs.get("budget"):
+        budget = logs["budget"]
+        usage = f"Run budget used: {budget['llm_calls']} LLM calls, {budget['tokens']} tokens, {budget['elapsed_seconds']:.1f}s"
+        if budget["exhausted"]:
+            usage += f" (exhausted: {budget['exhausted']})"
+        st.caption(usage)
 
 # Header
 st.markdown('<h1 class="main-header">🧠 LangEntiChain</h1>', unsafe_allow_html=True)
@@ -162,6 +175,15 @@ with st.sidebar:
     **Server:** {config.get('LLM', f'{provider}_address', fallback='localhost')}
     """)
     
+    # Model warm-up status
+    readiness = get_readiness()
+    if readiness["ready"]:
+        st.success("🔥 Model loaded and ready")
+    elif readiness["warming"]:
+        st.warning("⏳ Loading model... the first answer may be slow")
+    else:
+        st.error("❄️ Model not loaded yet")
+    
     # Available agents
     st.subheader("🤖 Specialized Agents")
     agent_info = {
@@ -201,9 +223,39 @@ with st.sidebar:
         - "Research machine learning libraries and create documentation"
         """)
     
+    # LLM client metrics
+    with st.expander("📈 LLM Metrics"):
+        metrics = get_llm_metrics()
+        if metrics["cache"]:
+            cache = metrics["cache"]
+            st.write(f"Cache hits: {cache['hits']} / misses: {cache['misses']} ({cache['hit_rate']:.0%})")
+        if metrics["plan_cache"]:
+            plans = metrics["plan_cache"]
+            st.write(f"Plan cache hits: {plans['hits']} / misses: {plans['misses']} ({plans['hit_rate']:.0%})")
+        if metrics["answer_cache"]:
+            answers = metrics["answer_cache"]
+            st.write(f"Answer cache hits: {answers['hits']} / misses: {answers['misses']} ({answers['shared']} shared in flight)")
+        if metrics["context_compaction"] and metrics["context_compaction"]["compacted"]:
+            compaction = metrics["context_compaction"]
+            st.write(f"Compacted task results: {compaction['compacted']} ({compaction['saved_ratio']:.0%} of their tokens saved)")
+        if metrics["coalescing"]:
+            coalescing = metrics["coalescing"]
+            st.write(f"Deduplicated calls: {coalescing['deduplicated']} of {coalescing['calls']}")
+        if metrics["sessions"]:
+            sessions = metrics["sessions"]
+            st.write(f"Active sessions: {sessions['active']} ({sessions['memory_bytes'] / 1024:.0f} KB held)")
+        prefix = metrics["prefix_reuse"]
+        st.write(f"Prompt prefix reuse: {prefix['hit_rate']:.0%} of requests, {prefix['reused_ratio']:.0%} of prompt text")
+        if prefix["avg_prefill_ms"] is not None:
+            st.write(f"Average prefill: {prefix['avg_prefill_ms']:.0f} ms")
+        for endpoint in metrics["endpoints"]:
+            status = "🟢" if endpoint["available"] else "🔴"
+            st.write(f"{status} {endpoint['address']}: {endpoint['outstanding']} in flight, {endpoint['requests']} total")
+    
     # Clear chat button
     if st.button("🗑️ Clear Chat History"):
         st.session_state.messages = []
+        end_session(st.session_state.session_id)
         st.rerun()
 
 # Initialize chat history
@@ -252,10 +304,10 @@ if prompt := st.chat_input("Ask your AI assistant..."):
         
         with st.spinner("🤔 Processing your request..."):
             # Run agent
-            response = run_agent(prompt)
+            response = run_agent(prompt, session_id=st.session_state.session_id)
             
             # Get thinking logs
-            thinking_logs = get_thinking_logs()
+            thinking_logs = get_thinking_logs(st.session_state.session_id)
             
             # Clean response
             response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
@@ -0,0 +1,58 @@
+"""
+Randomized equivalence of AgentRouter against the original inline keyword checks
+"""
+
+import random
+import re
+
+from routing.router import ACTION_WORDS, COMPLEX_INDICATORS, TASK_KEYWORDS, AgentRouter
+
+
+AGENTS = {name: object() for name in ("browser", "coder", "file", "search", "casual")}
+
+FILLER = ["the", "a", "please", "config.ini", "report", "paris", "it", "me", "and", "then", "x", "files", "Search", "READ"]
+
+
+def reference_complexity(query):
+	query_lower = query.lower()
+	if sum(1 for word in ACTION_WORDS if word in query_lower) >= 2:
+		return "HIGH"
+	if any(indicator in query_lower for indicator in COMPLEX_INDICATORS):
+		return "HIGH"
+	if re.search(r" find .* and .* and ", query_lower):
+		return "HIGH"
+	return "HIGH" if len(query.split()) > 20 else "LOW"
+
+
+def reference_task_type(query):
+	query_lower = query.lower()
+	scores = {}
+	for task_type, keywords in TASK_KEYWORDS.items():
+		score = sum(1 for keyword in keywords if keyword in query_lower)
+		if score > 0:
+			scores[task_type] = score
+	return max(scores, key=scores.get) if scores else "casual"
+
+
+def random_queries(count, seed=0):
+	keywords = COMPLEX_INDICATORS + ACTION_WORDS + [keyword for keywords in TASK_KEYWORDS.values() for keyword in keywords]
+	vocabulary = [word for phrase in keywords for word in phrase.split()] + FILLER + ["find"] * 5
+	rng = random.Random(seed)
+	for _ in range(count):
+		words = [rng.choice(vocabulary) for _ in range(rng.randint(1, 25))]
+		yield rng.choice(["", " "]) + " ".join(words) + rng.choice(["", " ", "?"])
+
+
+def test_route_matches_reference_on_random_queries():
+	router = AgentRouter(AGENTS)
+	for query in random_queries(20000):
+		complexity = reference_complexity(query)
+		assert router.estimate_complexity(query) == complexity, query
+		assert router.classify_task(query) == reference_task_type(query), query
+		expected = "planner" if complexity == "HIGH" else reference_task_type(query)
+		assert router.route(query) == expected, query
+
+
+def test_unavailable_agent_falls_back_to_casual():
+	router = AgentRouter({"casual": object()})
+	assert router.route("take a screenshot of the website") == "casual"